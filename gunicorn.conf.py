@@ -0,0 +1,36 @@
+"""Configuration gunicorn, lue automatiquement depuis le répertoire de lancement.
+
+Avec ``preload_app``, le processus maître importe l'application une seule fois
+et la préchauffe (``palmares_app.demarrage.precharger``) avant de créer les
+workers : ceux-ci en héritent au fork, démarrent sans rien réimporter et
+partagent ces pages mémoire. Chaque worker ouvre ensuite sa propre connexion à
+la base (``amorcer``) avant d'accepter des requêtes.
+
+L'application (WSGI ou ASGI) et la classe de worker se passent en ligne de
+commande, par exemple :
+``gunicorn palmares.asgi:application --worker-class uvicorn_worker.UvicornWorker``.
+"""
+import os
+
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', '3'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+preload_app = True
+
+
+def when_ready(server):
+    # Maître, application chargée, avant le premier fork
+    from palmares_app.demarrage import precharger
+
+    server.log.info("Préchargement : %s", precharger())
+
+
+def post_worker_init(worker):
+    from palmares_app.demarrage import amorcer
+
+    try:
+        worker.log.info("Amorçage du worker %s : %s", worker.pid, amorcer())
+    except Exception:
+        # Base indisponible : le worker démarre quand même, la première requête réessaiera
+        worker.log.exception("Amorçage du worker %s impossible", worker.pid)
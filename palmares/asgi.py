@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "palmares.settings")
+# Lectures (liste, API, exports) servies par les vues asynchrones (palmares_app/views_async.py)
+os.environ.setdefault("PALMARES_ASGI", "1")
 
 application = get_asgi_application()
@@ -47,6 +47,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "palmares_app.instrumentation.InstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -60,7 +61,8 @@ ROOT_URLCONF = "palmares.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        # DjangoTemplates dont les rendus sont chronométrés (en-tête Server-Timing)
+        "BACKEND": "palmares_app.instrumentation.DjangoTemplatesChronometres",
         "DIRS": [],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -91,6 +93,38 @@ DATABASES = {
     )
 }
 
+# Pool de connexions psycopg 3 (PostgreSQL), recommandé en ASGI : les requêtes
+# s'y exécutent dans des threads différents, dont les connexions persistantes
+# ne seraient jamais refermées. Le pool exclut les connexions persistantes.
+DB_POOL = os.getenv('DB_POOL', 'False').lower() in ('1', 'true', 'yes')
+if DB_POOL and DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+        'min_size': int(os.getenv('DB_POOL_MIN', '2')),
+        'max_size': int(os.getenv('DB_POOL_MAX', '10')),
+        'timeout': int(os.getenv('DB_POOL_TIMEOUT', '10')),
+    }
+
+# Cache
+# Fichiers partagés entre les processus gunicorn et le worker d'import
+# (données de référence : années, classes, sections)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / os.getenv('CACHE_DIR', 'cache'),
+        'TIMEOUT': 24 * 60 * 60,
+    },
+    # Historiques des élèves (palmares_app/historiques.py) : la clé porte la version lue en
+    # base, un cache propre à chaque processus ne sert donc jamais d'historique périmé
+    'historiques': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'historiques',
+        'TIMEOUT': 24 * 60 * 60,
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('HISTORIQUES_CACHE_ENTREES', '5000'))},
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -139,6 +173,36 @@ STATIC_ROOT = BASE_DIR / os.getenv('STATIC_ROOT')
 MEDIA_URL = os.getenv('MEDIA_URL')
 MEDIA_ROOT = BASE_DIR / os.getenv('MEDIA_ROOT')
 
+# Pagination de la liste des résultats : 'curseur' (keyset) ou 'pages' (numéros de page)
+PALMARES_PAGINATION = os.getenv('PALMARES_PAGINATION', 'curseur')
+
+# Déploiement ASGI (posé par palmares/asgi.py) : vues asynchrones pour les lectures
+PALMARES_ASGI = os.getenv('PALMARES_ASGI', 'False').lower() in ('1', 'true', 'yes')
+# Threads par processus pour le rendu déporté hors de la boucle ASGI (gabarits, PDF, XLSX)
+PALMARES_THREADS_RENDU = int(os.getenv('PALMARES_THREADS_RENDU', '4'))
+
+# Cache disque des exports (sous MEDIA_ROOT/exports), en octets
+EXPORT_CACHE_MAX_BYTES = int(os.getenv('EXPORT_CACHE_MAX_BYTES', 500 * 1024 * 1024))
+
+# Téléchargements servis par nginx (X-Accel-Redirect) plutôt que par Django
+USE_X_ACCEL_REDIRECT = os.getenv('USE_X_ACCEL_REDIRECT', 'False').lower() in ('1', 'true', 'yes')
+X_ACCEL_REDIRECT_PREFIX = os.getenv('X_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+
+# Nombre de processus pour le rendu parallèle des palmarès par classe (défaut: nombre de cœurs)
+PDF_PROCESSUS = int(os.getenv('PDF_PROCESSUS', '0')) or None
+
+# Rétention des logs d'erreurs d'import (0 : pas de limite)
+IMPORT_LOGS_RETENTION_JOURS = int(os.getenv('IMPORT_LOGS_RETENTION_JOURS', '365'))
+IMPORT_LOGS_TAILLE_MAX = int(os.getenv('IMPORT_LOGS_TAILLE_MAX', 200 * 1024 * 1024))
+
+# Instrumentation des requêtes : en-tête Server-Timing (SQL, gabarits, total)
+PERF_SERVER_TIMING = os.getenv('PERF_SERVER_TIMING', 'True').lower() in ('1', 'true', 'yes')
+# Requêtes plus lentes que ce seuil (ms) ajoutées au journal des requêtes lentes
+PERF_SEUIL_LENT_MS = int(os.getenv('PERF_SEUIL_LENT_MS', '500'))
+PERF_JOURNAL = BASE_DIR / os.getenv('PERF_JOURNAL', 'logs/requetes_lentes.log')
+PERF_JOURNAL_TAILLE_MAX = int(os.getenv('PERF_JOURNAL_TAILLE_MAX', 5 * 1024 * 1024))
+PERF_JOURNAL_FICHIERS = int(os.getenv('PERF_JOURNAL_FICHIERS', '5'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
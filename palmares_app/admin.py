@@ -1,14 +1,24 @@
+from django.conf import settings
 from django.contrib import admin
-from django.urls import path
-from django.shortcuts import render, redirect
+from django.urls import path, reverse
+from django.db.models import F
+from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
-from .models import AnneeScolaire, Classe, Section, Eleve, Resultat
-import openpyxl
+from django.http import JsonResponse
+from django.utils.html import format_html
+from .models import AnneeScolaire, Classe, Section, Eleve, Resultat, ImportJob, JournalErreurs, MetriquesImport
+from .ingestion import EXTENSIONS_ACCEPTEES, lire_lignes
+from .instrumentation import agreger, lire_journal
+from .jobs import creer_job
+from .simulation import MIS_A_JOUR, REJETE, simuler_import
+from .statistiques import resume
 import os
 
 
+# Nombre maximal de lignes détaillées dans l'aperçu d'une simulation
+LIGNES_APERCU = 500
+
+
 @admin.register(AnneeScolaire)
 class AnneeScolaireAdmin(admin.ModelAdmin):
     list_display = ('annee',)
@@ -32,19 +42,41 @@ class SectionAdmin(admin.ModelAdmin):
 
 @admin.register(Eleve)
 class EleveAdmin(admin.ModelAdmin):
-    list_display = ('nom_complet',)
+    list_display = ('nom_complet', 'historique')
     search_fields = ('nom_complet',)
     ordering = ('nom_complet',)
 
+    @admin.display(description="Historique")
+    def historique(self, obj):
+        # Toutes les années de l'élève sur une page, au lieu d'une liste de résultats par année
+        return format_html('<a href="{}">Voir</a>', obj.get_absolute_url())
+
 
 class ResultatAdmin(admin.ModelAdmin):
-    list_display = ('eleve', 'pourcentage', 'classe', 'section', 'annee_scolaire', 'date_import')
+    list_display = ('eleve', 'pourcentage', 'rang_classe', 'rang_annee', 'classe', 'section', 'annee_scolaire', 'date_import')
     list_filter = ('classe', 'section', 'annee_scolaire', 'date_import')
     search_fields = ('eleve__nom_complet', 'classe__nom', 'section__nom', 'annee_scolaire__annee')
-    ordering = ('-pourcentage', 'eleve__nom_complet')
+    ordering = (F('pourcentage').desc(nulls_last=True), 'eleve__nom_complet')
     readonly_fields = ('date_import',)
     raw_id_fields = ('eleve', 'annee_scolaire', 'classe', 'section')
     change_list_template = 'admin/palmares_app/resultat/change_list.html'
+    # Le total non filtré imposerait un COUNT sur toute la table à chaque affichage
+    show_full_result_count = False
+
+    # Filtres de la liste dont l'effectif se lit dans StatistiqueGroupe
+    FILTRES_STATISTIQUES = {
+        'annee_scolaire__id__exact': 'annee_scolaire_id',
+        'classe__id__exact': 'classe_id',
+        'section__id__exact': 'section_id',
+    }
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        paginator = super().get_paginator(request, queryset, per_page, orphans, allow_empty_first_page)
+        parametres = {k: v for k, v in request.GET.items() if k not in ('o', 'p')}
+        if set(parametres) <= set(self.FILTRES_STATISTIQUES) and all(v.isdigit() for v in parametres.values()):
+            lookups = {self.FILTRES_STATISTIQUES[k]: int(v) for k, v in parametres.items()}
+            paginator.count = resume(**lookups)['nombre']
+        return paginator
 
     def changelist_view(self, request, extra_context=None):
         extra_context = extra_context or {}
@@ -55,6 +87,10 @@ class ResultatAdmin(admin.ModelAdmin):
         urls = super().get_urls()
         custom_urls = [
             path('import-excel/', self.admin_site.admin_view(self.import_excel), name='import_excel'),
+            path('import-jobs/<int:pk>/', self.admin_site.admin_view(self.import_job), name='import_job'),
+            path('import-jobs/<int:pk>/progress/', self.admin_site.admin_view(self.import_job_progress),
+                 name='import_job_progress'),
+            path('performances/', self.admin_site.admin_view(self.performances), name='performances'),
         ]
         return custom_urls + urls
 
@@ -62,178 +98,110 @@ class ResultatAdmin(admin.ModelAdmin):
         if request.method == 'POST' and request.FILES.get('excel_file'):
             excel_file = request.FILES['excel_file']
 
-            if not excel_file.name.endswith(('.xlsx', '.xls')):
-                messages.error(request, "Veuillez sélectionner un fichier Excel valide (.xlsx ou .xls)")
+            if not excel_file.name.lower().endswith(EXTENSIONS_ACCEPTEES):
+                messages.error(request, "Veuillez sélectionner un fichier Excel (.xlsx ou .xls) ou CSV valide")
                 return redirect('admin:palmares_app_resultat_changelist')
 
-            try:
-                # Save file temporarily
-                file_name = default_storage.save('temp_excel.xlsx', ContentFile(excel_file.read()))
-                file_path = default_storage.path(file_name)
-
-                # Process Excel file
-                workbook = openpyxl.load_workbook(file_path)
-                sheet = workbook.active
-
-                imported_count = 0
-                updated_count = 0
-                errors = []
-                error_details = []
-
-                # Skip header row
-                for row_num, row in enumerate(sheet.iter_rows(min_row=2, values_only=True), start=2):
-                    if not row[0]:  # Skip empty rows
-                        continue
-
-                    try:
-                        nom_complet, pourcentage, classe_nom, section_nom, annee_scolaire = row[:5]
-
-                        # Validate required fields (pourcentage is now optional)
-                        if not all([nom_complet, classe_nom, section_nom, annee_scolaire]):
-                            error_msg = f"Ligne {row_num}: Champs requis manquants (Nom complet, Classe, Section, Année scolaire sont obligatoires)"
-                            errors.append(error_msg)
-                            error_details.append({
-                                'ligne': row_num,
-                                'donnees': row,
-                                'erreur': error_msg
-                            })
-                            continue
-
-                        # Validate pourcentage if provided
-                        if pourcentage is not None:
-                            try:
-                                pourcentage_val = float(pourcentage)
-                                if not (0 <= pourcentage_val <= 100):
-                                    error_msg = f"Ligne {row_num}: Pourcentage doit être entre 0 et 100"
-                                    errors.append(error_msg)
-                                    error_details.append({
-                                        'ligne': row_num,
-                                        'donnees': row,
-                                        'erreur': error_msg
-                                    })
-                                    continue
-                            except (ValueError, TypeError):
-                                error_msg = f"Ligne {row_num}: Pourcentage doit être un nombre valide"
-                                errors.append(error_msg)
-                                error_details.append({
-                                    'ligne': row_num,
-                                    'donnees': row,
-                                    'erreur': error_msg
-                                })
-                                continue
-                        else:
-                            pourcentage_val = None
-
-                        # Get or create related objects
-                        annee_obj, created = AnneeScolaire.objects.get_or_create(
-                            annee=str(annee_scolaire).strip()
-                        )
-
-                        classe_obj, created = Classe.objects.get_or_create(
-                            nom=str(classe_nom).strip()
-                        )
-
-                        section_obj, created = Section.objects.get_or_create(
-                            nom=str(section_nom).strip()
-                        )
-
-                        eleve_obj, created = Eleve.objects.get_or_create(
-                            nom_complet=str(nom_complet).strip()
-                        )
-
-                        # Create or update result
-                        resultat, created = Resultat.objects.get_or_create(
-                            eleve=eleve_obj,
-                            annee_scolaire=annee_obj,
-                            defaults={
-                                'classe': classe_obj,
-                                'section': section_obj,
-                                'pourcentage': pourcentage_val
-                            }
-                        )
-
-                        if not created:
-                            # Update existing result
-                            resultat.classe = classe_obj
-                            resultat.section = section_obj
-                            if pourcentage_val is not None:
-                                resultat.pourcentage = pourcentage_val
-                            resultat.save()
-                            updated_count += 1
-                        else:
-                            imported_count += 1
-
-                    except Exception as e:
-                        error_msg = f"Ligne {row_num}: Erreur inattendue - {str(e)}"
-                        errors.append(error_msg)
-                        error_details.append({
-                            'ligne': row_num,
-                            'donnees': row,
-                            'erreur': error_msg
-                        })
-
-                # Create error log file if there are errors
-                error_log_path = None
-                if error_details:
-                    import csv
-                    from datetime import datetime
-
-                    error_log_filename = f'import_errors_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-                    error_log_path = os.path.join('media', 'import_errors', error_log_filename)
-
-                    # Ensure directory exists
-                    os.makedirs(os.path.dirname(error_log_path), exist_ok=True)
-
-                    with open(error_log_path, 'w', newline='', encoding='utf-8') as csvfile:
-                        fieldnames = ['Ligne', 'Nom complet', 'Pourcentage', 'Classe', 'Section', 'Année scolaire', 'Erreur']
-                        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                        writer.writeheader()
-
-                        for error in error_details:
-                            row_data = error['donnees']
-                            writer.writerow({
-                                'Ligne': error['ligne'],
-                                'Nom complet': row_data[0] if len(row_data) > 0 else '',
-                                'Pourcentage': row_data[1] if len(row_data) > 1 else '',
-                                'Classe': row_data[2] if len(row_data) > 2 else '',
-                                'Section': row_data[3] if len(row_data) > 3 else '',
-                                'Année scolaire': row_data[4] if len(row_data) > 4 else '',
-                                'Erreur': error['erreur']
-                            })
-
-                # Clean up temp file
-                os.remove(file_path)
-
-                success_msg = []
-                if imported_count > 0:
-                    success_msg.append(f"{imported_count} résultats importés")
-                if updated_count > 0:
-                    success_msg.append(f"{updated_count} résultats mis à jour")
-
-                if success_msg:
-                    messages.success(request, " | ".join(success_msg))
-
-                if errors:
-                    for error in errors[:3]:  # Show first 3 errors
-                        messages.warning(request, error)
-                    if len(errors) > 3:
-                        messages.warning(request, f"... et {len(errors) - 3} autres erreurs")
-
-                    if error_log_path:
-                        log_filename = os.path.basename(error_log_path)
-                        messages.info(request,
-                            f'Fichier de log des erreurs créé: <a href="/download-log/{log_filename}/" class="underline font-medium">Télécharger {log_filename}</a>',
-                            extra_tags='safe'
-                        )
-
-            except Exception as e:
-                messages.error(request, f"Erreur lors de l'import: {str(e)}")
-
-            return redirect('admin:palmares_app_resultat_changelist')
+            if request.POST.get('simulation'):
+                return self.import_preview(request, excel_file)
+
+            # L'import est traité par le worker (manage.py import_worker)
+            job = creer_job(excel_file, request.user, profiler=bool(request.POST.get('profiler')))
+            messages.info(request, f"Import de {job.nom_fichier} mis en file d'attente")
+            return redirect('admin:import_job', job.pk)
 
         return render(request, 'admin/palmares_app/resultat/import_excel.html', {
             'title': 'Importer depuis Excel'
         })
 
+    def import_preview(self, request, excel_file):
+        """Simulation de l'import : aucune écriture, aperçu des changements"""
+        try:
+            apercu = simuler_import(lire_lignes(excel_file))
+        except Exception as e:
+            messages.error(request, f"Erreur lors de la lecture du fichier: {str(e)}")
+            return redirect('admin:import_excel')
+
+        details = [ligne for ligne in apercu.lignes if ligne['action'] in (REJETE, MIS_A_JOUR)]
+        return render(request, 'admin/palmares_app/resultat/import_preview.html', {
+            'title': f"Simulation de l'import de {excel_file.name}",
+            'apercu': apercu,
+            'details': details[:LIGNES_APERCU],
+            'details_masques': max(len(details) - LIGNES_APERCU, 0),
+        })
+
+    def import_job(self, request, pk):
+        job = get_object_or_404(ImportJob, pk=pk)
+        return render(request, 'admin/palmares_app/resultat/import_job.html', {
+            'title': f"Import de {job.nom_fichier}",
+            'job': job,
+        })
+
+    def import_job_progress(self, request, pk):
+        job = get_object_or_404(ImportJob, pk=pk)
+        log_filename = os.path.basename(job.fichier_erreurs) if job.fichier_erreurs else None
+        return JsonResponse({
+            'id': job.pk,
+            'statut': job.statut,
+            'statut_libelle': job.get_statut_display(),
+            'termine': job.termine,
+            'lignes_traitees': job.lignes_traitees,
+            'lignes_par_seconde': job.lignes_par_seconde,
+            'importes': job.nb_importes,
+            'mis_a_jour': job.nb_mis_a_jour,
+            'inchanges': job.nb_inchanges,
+            'erreurs': job.nb_erreurs,
+            'message': job.message,
+            'log_url': reverse('palmares_app:download_log', args=[log_filename]) if log_filename else None,
+        })
+
+    def performances(self, request):
+        """Requêtes lentes journalisées, agrégées par vue"""
+        vues, motifs = agreger(lire_journal())
+        return render(request, 'admin/palmares_app/resultat/performances.html', {
+            'title': 'Requêtes lentes',
+            'vues': vues,
+            'motifs': motifs,
+            'seuil_ms': settings.PERF_SEUIL_LENT_MS,
+        })
+
 
 admin.site.register(Resultat, ResultatAdmin)
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ('nom_fichier', 'statut', 'lignes_traitees', 'nb_importes', 'nb_mis_a_jour', 'nb_inchanges',
+                    'nb_erreurs',
+                    'cree_par', 'date_creation', 'date_fin')
+    list_filter = ('statut', 'date_creation')
+    search_fields = ('nom_fichier',)
+    ordering = ('-date_creation',)
+    readonly_fields = [f.name for f in ImportJob._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(MetriquesImport)
+class MetriquesImportAdmin(admin.ModelAdmin):
+    list_display = ('job', 'date_creation', 'lignes', 'duree_totale', 'lignes_par_seconde', 'nb_requetes',
+                    'memoire_pic_octets')
+    list_select_related = ('job',)
+    ordering = ('-date_creation',)
+    readonly_fields = [f.name for f in MetriquesImport._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(JournalErreurs)
+class JournalErreursAdmin(admin.ModelAdmin):
+    list_display = ('nom_fichier', 'nom_import', 'date_creation', 'nb_lignes', 'nb_erreurs', 'taille_octets')
+    list_filter = ('date_creation',)
+    search_fields = ('nom_fichier', 'nom_import')
+    ordering = ('-date_creation',)
+    readonly_fields = [f.name for f in JournalErreurs._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
@@ -4,3 +4,17 @@ from django.apps import AppConfig
 class PalmaresAppConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "palmares_app"
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_migrate
+
+        from . import signals
+        from .instrumentation import installer_sur_connexion
+
+        # Mesure des requêtes SQL de chaque requête HTTP (Server-Timing, requêtes lentes)
+        connection_created.connect(installer_sur_connexion, dispatch_uid='palmares_instrumentation')
+
+        post_migrate.connect(signals.initialiser_statistiques, sender=self)
+        post_migrate.connect(signals.initialiser_rangs, sender=self)
+        post_migrate.connect(signals.vider_cache_references, sender=self)
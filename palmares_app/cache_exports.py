@@ -0,0 +1,105 @@
+"""Cache disque des exports, adressé par leur contenu.
+
+Un export est identifié par son format, ses filtres normalisés et la version
+des données : tant qu'aucun import ni aucune modification n'a touché les
+résultats, le même fichier est resservi. Les fichiers vivent sous
+``MEDIA_ROOT/exports`` ; quand leur taille totale dépasse
+``EXPORT_CACHE_MAX_BYTES``, les moins récemment servis sont supprimés.
+
+La date du dernier accès (``atime``) sert à l'éviction ; la date de modification
+reste celle de la génération, dont ``servir_fichier`` tire ``Last-Modified`` :
+un export resservi répond donc 304 à ``If-Modified-Since``.
+
+Les fichiers sont servis par ``telechargements.servir_fichier`` (nginx avec
+``USE_X_ACCEL_REDIRECT``, sinon ``FileResponse`` avec prise en charge de ``Range``).
+"""
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+from django.conf import settings
+
+from .filtres import parametres_filtres
+from .telechargements import servir_fichier
+from .versions import version_courante
+
+
+REPERTOIRE = 'exports'
+
+
+def repertoire_cache():
+    chemin = os.path.join(settings.MEDIA_ROOT, REPERTOIRE)
+    os.makedirs(chemin, exist_ok=True)
+    return chemin
+
+
+def cle_export(format_export, params, version):
+    """Clé stable pour un format, des filtres (ordre et espaces ignorés) et une version"""
+    filtres = {
+        nom: valeur.strip()
+        for nom, valeur in parametres_filtres(params).items()
+        if valeur and valeur.strip()
+    }
+    contenu = json.dumps([format_export, filtres, version], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(contenu.encode()).hexdigest()
+
+
+def preparer_export(params, extension, generer):
+    """Retourne le nom de l'export en cache, après l'avoir généré si nécessaire.
+
+    ``generer`` reçoit un fichier ouvert en écriture binaire et y écrit l'export.
+    """
+    version, _ = version_courante()
+    nom_fichier = f"{cle_export(extension, params, version)}.{extension}"
+    chemin = os.path.join(repertoire_cache(), nom_fichier)
+
+    if os.path.exists(chemin):
+        # Marque l'entrée comme récemment utilisée (éviction LRU), sans toucher
+        # à la date de modification qui donne Last-Modified
+        os.utime(chemin, (time.time(), os.stat(chemin).st_mtime))
+    else:
+        _generer_atomiquement(chemin, generer)
+        evincer()
+
+    return nom_fichier
+
+
+def servir_export(request, params, extension, content_type, filename, generer):
+    """Renvoie l'export depuis le cache, en le générant d'abord si nécessaire"""
+    nom_fichier = preparer_export(params, extension, generer)
+    return servir_fichier(request, f"{REPERTOIRE}/{nom_fichier}", filename, content_type)
+
+
+def _generer_atomiquement(chemin, generer):
+    """Écrit dans un fichier temporaire puis le renomme : jamais d'export partiel servi"""
+    descripteur, temporaire = tempfile.mkstemp(dir=os.path.dirname(chemin), suffix='.tmp')
+    try:
+        with os.fdopen(descripteur, 'wb') as fichier:
+            generer(fichier)
+        os.replace(temporaire, chemin)
+    except BaseException:
+        os.unlink(temporaire)
+        raise
+
+
+def evincer(taille_max=None):
+    """Supprime les exports les moins récemment servis au-delà du budget disque"""
+    taille_max = settings.EXPORT_CACHE_MAX_BYTES if taille_max is None else taille_max
+    entrees = []
+    for entree in os.scandir(repertoire_cache()):
+        if entree.is_file() and not entree.name.endswith('.tmp'):
+            stat = entree.stat()
+            entrees.append((stat.st_atime, stat.st_size, entree.path))
+
+    total = sum(taille for _, taille, _ in entrees)
+    for _, taille, chemin in sorted(entrees):
+        if total <= taille_max:
+            break
+        try:
+            os.remove(chemin)
+        except FileNotFoundError:
+            pass
+        total -= taille
+
@@ -0,0 +1,367 @@
+"""Essai de charge de bout en bout : des parents consultent le palmarès pendant un ré-import.
+
+Des utilisateurs virtuels (threads) se connectent puis enchaînent, selon un
+mélange pondéré, des pages de la liste filtrées, des recherches, des exports
+PDF et de nouvelles connexions, par de vraies requêtes HTTP. Pendant ce temps,
+un import de corrections est exécuté une fois, comme le ferait le worker.
+
+L'application est servie :
+
+- dans le processus, par un serveur WSGI multi-thread (``wsgiref``) ;
+- par gunicorn, lancé localement avec le nombre de workers voulu ;
+- ou par n'importe quel serveur déjà démarré (``url``).
+
+Chaque requête est chronométrée ; le rapport donne par point d'accès le nombre
+de requêtes, les erreurs, les latences p50/p95/p99 et le débit.
+"""
+import http.cookiejar
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from dataclasses import dataclass, field
+from decimal import Decimal
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from django.db import connections
+
+from .donnees_synthetiques import ecrire_xlsx
+from .ingestion import LigneFichier
+from .models import Eleve, Resultat
+from .references import listes_filtres
+
+
+MIX_DEFAUT = {'home': 70, 'recherche': 15, 'export_pdf': 10, 'login': 5}
+
+
+def lire_mix(texte):
+    """« home=70,recherche=15 » -> {'home': 70, 'recherche': 15}"""
+    mix = {}
+    for element in texte.split(','):
+        nom, _, poids = element.partition('=')
+        nom = nom.strip()
+        if nom not in MIX_DEFAUT:
+            raise ValueError(f"Point d'accès inconnu: {nom} (attendus: {', '.join(MIX_DEFAUT)})")
+        mix[nom] = float(poids)
+    return mix
+
+
+def centile(valeurs_triees, rang):
+    """Centile par rang le plus proche sur des valeurs déjà triées"""
+    if not valeurs_triees:
+        return None
+    indice = max(math.ceil(rang / 100 * len(valeurs_triees)) - 1, 0)
+    return valeurs_triees[indice]
+
+
+@dataclass
+class Mesures:
+    """Latences et erreurs par point d'accès, partagées entre les threads"""
+    latences: dict = field(default_factory=dict)
+    erreurs: dict = field(default_factory=dict)
+    verrou: threading.Lock = field(default_factory=threading.Lock)
+
+    def ajouter(self, point, duree, erreur):
+        with self.verrou:
+            self.latences.setdefault(point, []).append(duree)
+            if erreur:
+                self.erreurs.setdefault(point, []).append(erreur)
+
+    def rapport(self, duree_totale):
+        points = {}
+        for point, latences in sorted(self.latences.items()):
+            triees = sorted(latences)
+            erreurs = self.erreurs.get(point, [])
+            points[point] = {
+                'requetes': len(triees),
+                'erreurs': len(erreurs),
+                'taux_erreur': round(len(erreurs) / len(triees), 4),
+                'p50_ms': round(centile(triees, 50) * 1000, 1),
+                'p95_ms': round(centile(triees, 95) * 1000, 1),
+                'p99_ms': round(centile(triees, 99) * 1000, 1),
+                'debit_rps': round(len(triees) / duree_totale, 2),
+                'exemples_erreurs': sorted(set(erreurs))[:5],
+            }
+        total = sum(len(latences) for latences in self.latences.values())
+        return {
+            'duree_s': round(duree_totale, 2),
+            'requetes': total,
+            'debit_rps': round(total / duree_totale, 2) if duree_totale else None,
+            'points': points,
+        }
+
+
+class _ServeurMultiThread(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class _GestionnaireSilencieux(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def _fermer_connexions(application):
+    """Ferme les connexions à la base ouvertes par chaque thread du serveur"""
+    def app(environ, start_response):
+        resultat = application(environ, start_response)
+        try:
+            yield from resultat
+        finally:
+            if hasattr(resultat, 'close'):
+                resultat.close()
+            connections.close_all()
+    return app
+
+
+def demarrer_serveur_interne(application):
+    """Sert l'application WSGI dans un thread ; retourne ``(url, arreter)``"""
+    serveur = make_server(
+        '127.0.0.1', 0, _fermer_connexions(application),
+        server_class=_ServeurMultiThread, handler_class=_GestionnaireSilencieux,
+    )
+    thread = threading.Thread(target=serveur.serve_forever, daemon=True)
+    thread.start()
+
+    def arreter():
+        serveur.shutdown()
+        serveur.server_close()
+
+    return f"http://127.0.0.1:{serveur.server_port}", arreter
+
+
+def demarrer_gunicorn(workers, delai=30):
+    """Lance gunicorn sur un port libre ; retourne ``(url, arreter)``"""
+    with socket.socket() as sonde:
+        sonde.bind(('127.0.0.1', 0))
+        port = sonde.getsockname()[1]
+
+    environnement = dict(os.environ)
+    environnement['ALLOWED_HOSTS'] = ','.join(filter(None, [environnement.get('ALLOWED_HOSTS', ''), '127.0.0.1']))
+    processus = subprocess.Popen(
+        [
+            sys.executable, '-m', 'gunicorn', 'palmares.wsgi:application',
+            '--bind', f'127.0.0.1:{port}', '--workers', str(workers), '--timeout', '120',
+        ],
+        env=environnement,
+    )
+
+    limite = time.monotonic() + delai
+    while True:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            break
+        except OSError:
+            if processus.poll() is not None or time.monotonic() > limite:
+                processus.kill()
+                raise RuntimeError("gunicorn n'a pas démarré")
+            time.sleep(0.2)
+
+    def arreter():
+        processus.terminate()
+        try:
+            processus.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            processus.kill()
+
+    return f"http://127.0.0.1:{port}", arreter
+
+
+class UtilisateurVirtuel:
+    """Un parent : sa propre session (cookies) et une suite d'actions tirées au hasard"""
+
+    def __init__(self, url, identifiants, valeurs, mesures, aleatoire, timeout=60):
+        self.url = url.rstrip('/')
+        self.identifiants = identifiants
+        self.valeurs = valeurs
+        self.mesures = mesures
+        self.aleatoire = aleatoire
+        self.timeout = timeout
+        self.ouvreur = None
+
+    def _appeler(self, point, chemin, params=None, donnees=None):
+        url = f"{self.url}{chemin}"
+        if params:
+            url = f"{url}?{urllib.parse.urlencode(params)}"
+        corps = urllib.parse.urlencode(donnees).encode() if donnees is not None else None
+        erreur = None
+        reponse_url = None
+        debut = time.perf_counter()
+        try:
+            with self.ouvreur.open(url, data=corps, timeout=self.timeout) as reponse:
+                reponse.read()
+                reponse_url = reponse.geturl()
+        except urllib.error.HTTPError as e:
+            e.read()
+            erreur = f"HTTP {e.code}"
+        except (urllib.error.URLError, OSError) as e:
+            erreur = type(e).__name__
+        duree = time.perf_counter() - debut
+        return duree, erreur, reponse_url
+
+    def connecter(self):
+        """Nouvelle session : formulaire de connexion puis envoi des identifiants"""
+        jar = http.cookiejar.CookieJar()
+        self.ouvreur = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+        duree_formulaire, erreur, _ = self._appeler('login', '/login/')
+        jeton = next((cookie.value for cookie in jar if cookie.name == 'csrftoken'), '')
+        duree, erreur_envoi, url_finale = self._appeler('login', '/login/', donnees={
+            'username': self.identifiants[0],
+            'password': self.identifiants[1],
+            'csrfmiddlewaretoken': jeton,
+        })
+        erreur = erreur or erreur_envoi
+        if not erreur and url_finale and urllib.parse.urlparse(url_finale).path.startswith('/login'):
+            erreur = "Connexion refusée"
+        self.mesures.ajouter('login', duree_formulaire + duree, erreur)
+
+    def home(self):
+        filtres = {}
+        for nom in ('classe', 'section', 'annee'):
+            if self.valeurs[nom] and self.aleatoire.random() < 0.5:
+                filtres[nom] = self.aleatoire.choice(self.valeurs[nom])
+        duree, erreur, _ = self._appeler('home', '/', filtres)
+        self.mesures.ajouter('home', duree, erreur)
+
+    def recherche(self):
+        nom = self.aleatoire.choice(self.valeurs['noms'] or ['a'])
+        # Recherche sur le nom de famille ou le nom complet
+        terme = nom if self.aleatoire.random() < 0.5 else nom.split()[0]
+        duree, erreur, _ = self._appeler('recherche', '/', {'q': terme})
+        self.mesures.ajouter('recherche', duree, erreur)
+
+    def export_pdf(self):
+        filtres = {}
+        if self.valeurs['annee']:
+            filtres['annee'] = self.aleatoire.choice(self.valeurs['annee'])
+        if self.valeurs['classe'] and self.aleatoire.random() < 0.7:
+            filtres['classe'] = self.aleatoire.choice(self.valeurs['classe'])
+        duree, erreur, _ = self._appeler('export_pdf', '/export-pdf/', filtres)
+        self.mesures.ajouter('export_pdf', duree, erreur)
+
+    def login(self):
+        self.connecter()
+
+    def executer(self, mix, fin, pause):
+        self.connecter()
+        actions, poids = zip(*mix.items())
+        while time.monotonic() < fin:
+            action = self.aleatoire.choices(actions, poids)[0]
+            getattr(self, action)()
+            if pause:
+                time.sleep(self.aleatoire.uniform(0, 2 * pause))
+
+
+def valeurs_de_test(nombre_noms=200):
+    """Filtres et noms d'élèves existants, pour des requêtes qui trouvent des résultats"""
+    listes = listes_filtres()
+    noms = list(Eleve.objects.order_by('?').values_list('nom_complet', flat=True)[:nombre_noms])
+    return {
+        'classe': listes['classes'],
+        'section': listes['sections'],
+        'annee': listes['annees'],
+        'noms': noms,
+    }
+
+
+def fichier_corrections(dossier, proportion=0.05, graine=0):
+    """Fichier Excel de corrections : l'année la plus récente, quelques pourcentages modifiés"""
+    annees = listes_filtres()['annees']
+    if not annees:
+        return None
+    aleatoire = random.Random(graine)
+    lignes = []
+    for numero, (nom, pourcentage, classe, section, annee) in enumerate(
+        Resultat.objects.filter(annee_scolaire__annee=annees[0]).values_list(
+            'eleve__nom_complet', 'pourcentage', 'classe__nom', 'section__nom', 'annee_scolaire__annee'
+        ).order_by('pk').iterator(),
+        start=2,
+    ):
+        if pourcentage is not None and aleatoire.random() < proportion:
+            pourcentage = min(pourcentage + Decimal('1.5'), Decimal(100))
+        lignes.append(LigneFichier(numero, nom, None if pourcentage is None else float(pourcentage), classe, section, annee))
+    chemin = os.path.join(dossier, f"corrections_{annees[0]}.xlsx")
+    ecrire_xlsx(lignes, chemin)
+    return chemin
+
+
+def importer_en_parallele(chemin, mesures, resultat):
+    """Exécute un import comme le worker (à lancer dans un thread)"""
+    from django.core.files import File
+
+    from .jobs import creer_job, executer_job
+
+    debut = time.perf_counter()
+    try:
+        with open(chemin, 'rb') as fichier:
+            job = executer_job(creer_job(File(fichier, name=os.path.basename(chemin))))
+        resultat.update({
+            'statut': job.statut,
+            'lignes': job.lignes_traitees,
+            'mis_a_jour': job.nb_mis_a_jour,
+            'erreurs': job.nb_erreurs,
+            'message': job.message,
+        })
+        erreur = None if job.statut == job.TERMINE else job.message or job.statut
+    except Exception as e:
+        erreur = f"{type(e).__name__}: {e}"
+        resultat['statut'] = 'exception'
+        resultat['message'] = erreur
+    finally:
+        connections.close_all()
+    duree = time.perf_counter() - debut
+    resultat['duree_s'] = round(duree, 3)
+    mesures.ajouter('import', duree, erreur)
+
+
+def lancer(url, identifiants, utilisateurs=20, duree=30, mix=None, pause=0.0, avec_import=True,
+           delai_import=5.0, fichier_import=None, graine=0):
+    """Exécute l'essai de charge contre ``url`` et retourne le rapport"""
+    mix = mix or MIX_DEFAUT
+    valeurs = valeurs_de_test()
+    mesures = Mesures()
+    import_resultat = {}
+
+    with tempfile.TemporaryDirectory(prefix='palmares_charge_') as dossier:
+        chemin_import = None
+        if avec_import:
+            chemin_import = fichier_import or fichier_corrections(dossier, graine=graine)
+
+        debut = time.monotonic()
+        fin = debut + duree
+        threads = [
+            threading.Thread(
+                target=UtilisateurVirtuel(url, identifiants, valeurs, mesures, random.Random(graine + numero)).executer,
+                args=(mix, fin, pause),
+                daemon=True,
+            )
+            for numero in range(utilisateurs)
+        ]
+        for thread in threads:
+            thread.start()
+
+        thread_import = None
+        if chemin_import:
+            time.sleep(min(delai_import, duree))
+            thread_import = threading.Thread(
+                target=importer_en_parallele, args=(chemin_import, mesures, import_resultat), daemon=True
+            )
+            thread_import.start()
+
+        for thread in threads:
+            thread.join()
+        if thread_import:
+            thread_import.join()
+        duree_totale = time.monotonic() - debut
+
+    rapport = mesures.rapport(duree_totale)
+    rapport['import'] = import_resultat or None
+    return rapport
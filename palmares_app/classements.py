@@ -0,0 +1,71 @@
+"""Rangs matérialisés des résultats.
+
+Chaque résultat noté porte deux rangs, calculés par pourcentage décroissant :
+
+- ``rang_classe`` dans son groupe (année scolaire, classe, section) ;
+- ``rang_annee`` parmi tous les résultats de l'année scolaire.
+
+Les ex æquo partagent le même rang et le suivant est décalé d'autant
+(1, 2, 2, 4). Un résultat sans pourcentage n'a pas de rang.
+
+Les rangs sont recalculés après un import ou une modification, uniquement pour
+les années des groupes touchés : une seule requête à fonctions de fenêtre lit
+les nouveaux rangs et seules les lignes dont le rang change sont réécrites. Les
+pages et exports lisent ensuite des colonnes, sans calcul à chaque requête.
+"""
+from django.db.models import F, Q, Window
+from django.db.models.functions import Rank
+
+from . import historiques
+from .models import Resultat
+
+
+def recalculer_rangs(groupes, taille_lot=1000):
+    """Recalcule les rangs des années des groupes ``(annee_id, classe_id, section_id)`` donnés.
+
+    Retourne le nombre de résultats dont le rang a changé.
+    """
+    annees = {annee_id for annee_id, _, _ in groupes if annee_id is not None}
+    if not annees:
+        return 0
+
+    ordre = F('pourcentage').desc()
+    rangs = Resultat.objects.filter(
+        annee_scolaire_id__in=annees, pourcentage__isnull=False
+    ).annotate(
+        nouveau_rang_classe=Window(Rank(), partition_by=[F('annee_scolaire'), F('classe'), F('section')], order_by=ordre),
+        nouveau_rang_annee=Window(Rank(), partition_by=[F('annee_scolaire')], order_by=ordre),
+    ).order_by().values_list(
+        'pk', 'eleve_id', 'rang_classe', 'rang_annee', 'nouveau_rang_classe', 'nouveau_rang_annee'
+    )
+
+    modifies, eleves = [], set()
+    for pk, eleve_id, ancien_classe, ancien_annee, rang_classe, rang_annee in rangs:
+        if (ancien_classe, ancien_annee) != (rang_classe, rang_annee):
+            modifies.append(Resultat(pk=pk, rang_classe=rang_classe, rang_annee=rang_annee))
+            eleves.add(eleve_id)
+    Resultat.objects.bulk_update(modifies, ['rang_classe', 'rang_annee'], batch_size=taille_lot)
+
+    # Pourcentage effacé : plus de rang
+    sans_note = Resultat.objects.filter(
+        Q(rang_classe__isnull=False) | Q(rang_annee__isnull=False),
+        annee_scolaire_id__in=annees,
+        pourcentage__isnull=True,
+    )
+    eleves.update(sans_note.values_list('eleve_id', flat=True))
+    nombre_sans_note = sans_note.update(rang_classe=None, rang_annee=None)
+
+    # Camarades compris : leur historique montre leurs rangs
+    historiques.invalider(eleves)
+    return len(modifies) + nombre_sans_note
+
+
+def recalculer_tous_les_rangs():
+    """Recalcule les rangs de toutes les années ; retourne le nombre de résultats modifiés"""
+    annees = Resultat.objects.order_by().values_list('annee_scolaire_id', flat=True).distinct()
+    return recalculer_rangs({(annee_id, None, None) for annee_id in annees})
+
+
+def rangs_manquants():
+    """Vrai si des résultats notés n'ont pas encore de rang (premier déploiement)"""
+    return Resultat.objects.filter(pourcentage__isnull=False, rang_classe__isnull=True).exists()
@@ -0,0 +1,74 @@
+"""Démarrage des processus web : préchargement puis amorçage.
+
+Les bibliothèques lourdes (reportlab, openpyxl) ne sont importées que par le
+code qui s'en sert : le worker d'import, les commandes et les tests ne les
+paient pas inutilement. Sous gunicorn (``gunicorn.conf.py``, ``preload_app``) :
+
+- le processus maître charge l'application puis appelle ``precharger`` :
+  bibliothèques d'export importées, gabarits compilés (chargeur en cache) et
+  styles PDF construits une seule fois, puis hérités par chaque worker au fork ;
+- chaque worker appelle ``amorcer`` avant sa première requête : connexion à la
+  base (ou ouverture du pool) et cache des données de référence.
+
+Le maître n'ouvre aucune connexion : elle serait partagée par tous les
+workers après le fork.
+"""
+import time
+
+from django.db import close_old_connections, connection, connections
+from django.template.loader import get_template
+from django.urls import get_resolver
+
+
+GABARITS = (
+    'palmares_app/home.html',
+    'palmares_app/login.html',
+    'palmares_app/import_logs.html',
+    'palmares_app/historique.html',
+    'palmares_app/evolution.html',
+)
+
+
+def _chronometrer(durees, nom, fonction):
+    debut = time.perf_counter()
+    fonction()
+    durees[nom] = round((time.perf_counter() - debut) * 1000, 1)
+
+
+def _importer_exports():
+    # Importés ici une fois pour toutes : les workers les trouvent déjà chargés
+    import openpyxl
+    import reportlab.platypus
+
+    from . import pdf
+
+    pdf.feuille_styles()
+    pdf.style_tableau()
+
+
+def _compiler_gabarits():
+    for nom in GABARITS:
+        get_template(nom)
+
+
+def precharger():
+    """Prépare le processus sans toucher à la base ; retourne la durée (ms) de chaque étape"""
+    durees = {}
+    _chronometrer(durees, 'urls', lambda: get_resolver().url_patterns)
+    _chronometrer(durees, 'exports', _importer_exports)
+    _chronometrer(durees, 'gabarits', _compiler_gabarits)
+    # Par précaution : rien de ce qui précède ne doit laisser de connexion ouverte
+    connections.close_all()
+    return durees
+
+
+def amorcer():
+    """Ouvre la connexion du worker et remplit le cache des données de référence ; durées en ms"""
+    from .references import listes_filtres
+
+    durees = {}
+    _chronometrer(durees, 'connexion', connection.ensure_connection)
+    _chronometrer(durees, 'references', listes_filtres)
+    # Connexion persistante gardée ; avec le pool, elle y retourne (pool déjà ouvert)
+    close_old_connections()
+    return durees
@@ -0,0 +1,109 @@
+"""Jeux de données synthétiques pour les essais de performance.
+
+Les lignes produites ont la forme des fichiers d'import (``LigneFichier``) :
+noms français accentués, classes « 6ème A », sections usuelles et années
+scolaires consécutives. Les mêmes élèves sont répartis chaque année dans une
+classe et une section ; environ 3 % des pourcentages sont laissés vides.
+
+La génération est déterministe pour une graine donnée : deux exécutions avec
+les mêmes paramètres produisent exactement les mêmes fichiers.
+"""
+import random
+from datetime import date
+
+import openpyxl
+
+from .exports import ENTETES_IMPORT
+from .ingestion import LigneFichier
+
+
+PRENOMS = [
+    'Amélie', 'André', 'Anaïs', 'Béatrice', 'Benoît', 'Céline', 'Chloé', 'Clément', 'Désiré', 'Éloïse',
+    'Émile', 'Étienne', 'Fabrice', 'Françoise', 'François', 'Gaël', 'Gérard', 'Hélène', 'Inès', 'Jérôme',
+    'Joël', 'Léa', 'Léon', 'Loïc', 'Maëlle', 'Mathéo', 'Michèle', 'Noé', 'Noémie', 'Océane',
+    'Pénélope', 'Raphaël', 'Régis', 'Renée', 'Sébastien', 'Séverine', 'Siméon', 'Thérèse', 'Valérie', 'Zoé',
+]
+
+NOMS = [
+    'Bélanger', 'Béranger', 'Bérubé', 'Boileau', 'Chéry', 'Côté', 'Dubé', 'Duchêne', 'Dufrêne', 'Fénelon',
+    'Gagné', 'Gérin', 'Hébert', 'Kaboré', 'Lafrenière', 'Lefèbvre', 'Lemaître', 'Léveillé', 'Maréchal', 'Ménard',
+    'Mukendi', 'Ngoïe', 'Pelletier', 'Pétrin', 'Poirier', 'Quévillon', 'Rhéaume', 'Sénéchal', 'Thériault', 'Vézina',
+]
+
+SECTIONS = ['Générale', 'Scientifique', 'Littéraire', 'Commerciale', 'Pédagogique', 'Technique', 'Électricité', 'Mécanique']
+
+NIVEAUX = ['1ère', '2ème', '3ème', '4ème', '5ème', '6ème']
+
+
+def annees_scolaires(nombre, derniere=None):
+    """``nombre`` années scolaires consécutives se terminant par ``derniere`` (année de fin)"""
+    if derniere is None:
+        aujourdhui = date.today()
+        derniere = aujourdhui.year + (1 if aujourdhui.month >= 9 else 0)
+    return [f"{fin - 1}-{fin}" for fin in range(derniere - nombre + 1, derniere + 1)]
+
+
+def noms_classes(nombre):
+    """« 1ère A », « 2ème A »... puis « 1ère B »... jusqu'à ``nombre`` classes"""
+    noms = []
+    for indice in range(nombre):
+        lettre = chr(ord('A') + indice // len(NIVEAUX))
+        noms.append(f"{NIVEAUX[indice % len(NIVEAUX)]} {lettre}")
+    return noms
+
+
+def noms_sections(nombre):
+    noms = SECTIONS[:nombre]
+    noms += [f"Option {numero}" for numero in range(1, nombre - len(noms) + 1)]
+    return noms
+
+
+def noms_eleves(nombre, aleatoire):
+    """``nombre`` noms complets distincts (nom, post-nom éventuel, prénom)"""
+    noms = set()
+    while len(noms) < nombre:
+        nom = aleatoire.choice(NOMS)
+        if aleatoire.random() < 0.5:
+            nom = f"{nom} {aleatoire.choice(NOMS)}"
+        prenom = aleatoire.choice(PRENOMS)
+        candidat = f"{nom} {prenom}"
+        if candidat in noms:
+            candidat = f"{nom} {prenom}-{aleatoire.choice(PRENOMS)}"
+        noms.add(candidat)
+    return sorted(noms)
+
+
+def generer_jeu(annees=3, classes=6, sections=3, eleves=40, graine=0):
+    """Lignes d'import par année scolaire : ``{annee: [LigneFichier, ...]}``.
+
+    ``eleves`` est le nombre d'élèves par couple (classe, section) : chaque
+    année compte ``classes × sections × eleves`` résultats.
+    """
+    aleatoire = random.Random(graine)
+    groupes = [(classe, section) for classe in noms_classes(classes) for section in noms_sections(sections)]
+    effectif = len(groupes) * eleves
+    noms = noms_eleves(effectif, aleatoire)
+
+    jeu = {}
+    for annee in annees_scolaires(annees):
+        aleatoire.shuffle(noms)
+        lignes = []
+        for indice, nom in enumerate(noms):
+            classe, section = groupes[indice // eleves]
+            if aleatoire.random() < 0.03:
+                pourcentage = None
+            else:
+                pourcentage = round(min(max(aleatoire.gauss(62, 14), 0), 100), 2)
+            lignes.append(LigneFichier(indice + 2, nom, pourcentage, classe, section, annee))
+        jeu[annee] = lignes
+    return jeu
+
+
+def ecrire_xlsx(lignes, destination):
+    """Écrit les lignes dans un classeur au format d'import (mode écriture seule)"""
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet('Résultats')
+    sheet.append(ENTETES_IMPORT)
+    for ligne in lignes:
+        sheet.append(list(ligne.donnees))
+    workbook.save(destination)
@@ -0,0 +1,159 @@
+"""Exports des résultats filtrés (PDF, CSV, XLSX)"""
+import csv
+import multiprocessing
+import os
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.text import get_valid_filename
+
+from .models import PALMARES, Resultat
+from .pdf import ecrire_pdf, rendre_fichier
+
+
+# Nombre de lignes lues par aller-retour avec la base pendant un export
+TAILLE_CURSEUR = 2000
+
+
+@lru_cache(maxsize=None)
+def contexte_rendu():
+    """Contexte des processus de rendu, créé au premier ZIP et non à l'import du module.
+
+    Processus issus d'un serveur neuf (forkserver), jamais d'un fork du worker
+    web : ses threads et les connexions de son pool y seraient dupliqués. Le
+    serveur précharge le module PDF et reportlab une fois pour toutes.
+    """
+    contexte = multiprocessing.get_context('forkserver')
+    contexte.set_forkserver_preload(['palmares_app.pdf', 'reportlab.platypus'])
+    return contexte
+
+
+def lignes_export(records):
+    """Lignes à six colonnes (rang, nom, pourcentage, classe, section, année) lues par paquets"""
+    for rang, nom, pourcentage, classe, section, annee in records.values_list(
+        'rang_classe', 'eleve__nom_complet', 'pourcentage', 'classe__nom', 'section__nom', 'annee_scolaire__annee'
+    ).iterator(chunk_size=TAILLE_CURSEUR):
+        yield [
+            rang or "-",
+            nom,
+            f"{pourcentage}%" if pourcentage is not None else "-",
+            classe,
+            section,
+            annee,
+        ]
+
+
+def generer_pdf(records, destination):
+    """Écrit le PDF des résultats dans un fichier ouvert en écriture binaire"""
+    ecrire_pdf(destination, lignes_export(records))
+
+
+# En-têtes identiques au fichier d'import : les exports peuvent être réimportés
+ENTETES_IMPORT = ['Nom complet', 'Pourcentage', 'Classe', 'Section', 'Année scolaire']
+
+
+COLONNES_IMPORT = ('eleve__nom_complet', 'pourcentage', 'classe__nom', 'section__nom', 'annee_scolaire__annee')
+
+
+def lignes_import(records):
+    """Lignes au format du fichier d'import (pourcentage numérique), lues par paquets"""
+    return records.values_list(*COLONNES_IMPORT).iterator(chunk_size=TAILLE_CURSEUR)
+
+
+class _Tampon:
+    """Pseudo-fichier dont ``write`` retourne la valeur écrite (pour csv.writer)"""
+
+    def write(self, valeur):
+        return valeur
+
+
+def _ligne_csv(writer, nom, pourcentage, classe, section, annee):
+    return writer.writerow([nom, '' if pourcentage is None else pourcentage, classe, section, annee])
+
+
+def flux_csv(records):
+    """Produit le CSV ligne par ligne, sans jamais le construire en mémoire"""
+    writer = csv.writer(_Tampon())
+    # BOM : Excel reconnaît ainsi l'UTF-8 (ignoré à l'import)
+    yield '\ufeff' + writer.writerow(ENTETES_IMPORT)
+    for ligne in lignes_import(records):
+        yield _ligne_csv(writer, *ligne)
+
+
+async def aflux_csv(records):
+    """Version asynchrone de ``flux_csv`` : lignes lues par ``aiterator``, sans bloquer la boucle"""
+    writer = csv.writer(_Tampon())
+    yield '\ufeff' + writer.writerow(ENTETES_IMPORT)
+    # values() et non values_list() : l'itérable de values_list() exécute sa requête
+    # dès sa création, hors du thread où aiterator() fait travailler l'ORM
+    async for ligne in records.values(*COLONNES_IMPORT).aiterator(chunk_size=TAILLE_CURSEUR):
+        yield _ligne_csv(writer, *(ligne[colonne] for colonne in COLONNES_IMPORT))
+
+
+def generer_xlsx(records, destination):
+    """Écrit le classeur des résultats avec le mode écriture seule d'openpyxl"""
+    import openpyxl
+
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet('Résultats')
+    sheet.append(ENTETES_IMPORT)
+    for nom, pourcentage, classe, section, annee in lignes_import(records):
+        sheet.append([nom, None if pourcentage is None else float(pourcentage), classe, section, annee])
+    workbook.save(destination)
+
+
+def groupes_classes(annee):
+    """Lignes de l'année regroupées par (classe, section), lues en une seule requête"""
+    groupes = {}
+    for classe, section, rang, nom, pourcentage in Resultat.objects.filter(
+        annee_scolaire__annee=annee
+    ).values_list(
+        'classe__nom', 'section__nom', 'rang_classe', 'eleve__nom_complet', 'pourcentage'
+    ).order_by('classe__nom', 'section__nom', PALMARES, 'eleve__nom_complet').iterator(
+        chunk_size=TAILLE_CURSEUR
+    ):
+        groupes.setdefault((classe, section), []).append([
+            rang or "-",
+            nom,
+            f"{pourcentage}%" if pourcentage is not None else "-",
+            classe,
+            section,
+            annee,
+        ])
+    return groupes
+
+
+def generer_zip_palmares(annee, destination, processus=None):
+    """Écrit un ZIP contenant un PDF par (classe, section) de l'année.
+
+    Le rendu des PDF est réparti sur un pool de processus ; chaque processus
+    reçoit les lignes de son groupe déjà chargées et ne touche pas à la base
+    (ni à Django : ``pdf.rendre_fichier`` n'en dépend pas). Il écrit son PDF
+    dans un fichier temporaire, ajouté à l'archive dès qu'il est terminé puis
+    supprimé : les PDF ne sont jamais tous en mémoire à la fois.
+    """
+    groupes = groupes_classes(annee)
+    processus = processus or settings.PDF_PROCESSUS or os.cpu_count()
+
+    with zipfile.ZipFile(destination, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        if not groupes:
+            return
+        with tempfile.TemporaryDirectory(prefix='palmares_zip_') as repertoire, ProcessPoolExecutor(
+            max_workers=min(processus, len(groupes)), mp_context=contexte_rendu()
+        ) as executor:
+            taches = [
+                executor.submit(rendre_fichier, (
+                    get_valid_filename(f"palmares_{classe}_{section}_{annee}") + '.pdf',
+                    f"Palmarès {classe} - {section} ({annee})",
+                    lignes,
+                    os.path.join(repertoire, f"{numero}.pdf"),
+                ))
+                for numero, ((classe, section), lignes) in enumerate(groupes.items())
+            ]
+            for tache in as_completed(taches):
+                nom_fichier, chemin = tache.result()
+                archive.write(chemin, nom_fichier)
+                os.remove(chemin)
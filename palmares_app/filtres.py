@@ -0,0 +1,60 @@
+"""Filtres communs à la liste des résultats et aux exports"""
+from .models import Resultat
+from .recherche import filtrer_recherche
+
+
+def parametres_filtres(params):
+    """Extrait les filtres (recherche, classe, section, année, top N) d'un QueryDict"""
+    return {
+        'search_query': params.get('q', ''),
+        'classe_filter': params.get('classe', ''),
+        'section_filter': params.get('section', ''),
+        'annee_filter': params.get('annee', ''),
+        'top_filter': params.get('top', ''),
+    }
+
+
+def rang_maximum(filtres):
+    """Rang maximal du filtre « top N par classe », ou None s'il est absent ou invalide"""
+    valeur = filtres['top_filter'].strip()
+    return int(valeur) if valeur.isdigit() and int(valeur) > 0 else None
+
+
+def filtrer_resultats(params):
+    """Résultats correspondant aux filtres de la requête, triés comme le palmarès (ou par pertinence)"""
+    filtres = parametres_filtres(params)
+    records = Resultat.objects.select_related('eleve', 'classe', 'section', 'annee_scolaire')
+
+    if filtres['classe_filter']:
+        records = records.filter(classe__nom=filtres['classe_filter'])
+
+    if filtres['section_filter']:
+        records = records.filter(section__nom=filtres['section_filter'])
+
+    if filtres['annee_filter']:
+        records = records.filter(annee_scolaire__annee=filtres['annee_filter'])
+
+    # Top N de chaque classe : lecture du rang matérialisé
+    top = rang_maximum(filtres)
+    if top:
+        records = records.filter(rang_classe__lte=top)
+
+    # Recherche sur la colonne indexée, résultats classés par pertinence
+    if filtres['search_query']:
+        records = filtrer_recherche(records, filtres['search_query'])
+
+    return records
+
+
+def lookups_statistiques(filtres):
+    """Lookups sur StatistiqueGroupe équivalents aux filtres, ou None si une recherche ou un top N est actif"""
+    if filtres['search_query'] or rang_maximum(filtres):
+        return None
+    lookups = {}
+    if filtres['classe_filter']:
+        lookups['classe__nom'] = filtres['classe_filter']
+    if filtres['section_filter']:
+        lookups['section__nom'] = filtres['section_filter']
+    if filtres['annee_filter']:
+        lookups['annee_scolaire__annee'] = filtres['annee_filter']
+    return lookups
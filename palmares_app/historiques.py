@@ -0,0 +1,109 @@
+"""Historique des résultats d'un élève, d'une année scolaire à l'autre.
+
+Pour chaque année : classe, section, pourcentage et rangs, avec l'évolution
+depuis l'année précédente de l'élève (points de pourcentage, places gagnées
+ou perdues). Pour un ou plusieurs centaines d'élèves, la lecture coûte deux
+requêtes : les élèves (nom et version), puis les résultats de ceux qui ne sont
+pas en cache, avec année, classe et section en jointure.
+
+Chaque historique calculé est gardé dans le cache ``historiques`` sous une clé
+qui inclut ``Eleve.version_historique``. Cette version est incrémentée dans la
+transaction même des écritures qui changent l'historique : résultats écrits
+par l'import ou l'admin, rangs recalculés (y compris ceux des camarades de
+classe), renommages. La version étant lue avant les résultats, un historique
+périmé n'est jamais servi, et le cache peut rester propre à chaque processus.
+"""
+from django.core.cache import caches
+from django.db.models import F
+
+from .models import Eleve, Resultat
+from .utils import par_lots
+
+
+# Élèves lus ou invalidés par requête (taille de la liste ``IN``)
+TAILLE_LOT = 500
+
+
+def _cle(eleve_id, version):
+    return f'historique:{eleve_id}:{version}'
+
+
+def invalider(eleve_ids, taille_lot=TAILLE_LOT):
+    """Rend caducs les historiques des élèves donnés (nouvelle version, dans la transaction en cours)"""
+    for lot in par_lots(set(eleve_ids), taille_lot):
+        Eleve.objects.filter(pk__in=lot).update(version_historique=F('version_historique') + 1)
+
+
+def _evolution(actuel, precedent, cle):
+    if precedent is None or actuel[cle] is None or precedent[cle] is None:
+        return None
+    if cle == 'pourcentage':
+        return actuel[cle] - precedent[cle]
+    # Rang : positif quand l'élève gagne des places
+    return precedent[cle] - actuel[cle]
+
+
+def calculer(eleve_id, nom_complet, resultats):
+    """Historique à partir des résultats ``(annee, classe, section, pourcentage, rang_classe, rang_annee)``
+    triés par année"""
+    annees = []
+    precedent = None
+    for annee_scolaire, classe, section, pourcentage, rang_classe, rang_annee in resultats:
+        annee = {
+            'annee_scolaire': annee_scolaire,
+            'classe': classe,
+            'section': section,
+            'pourcentage': pourcentage,
+            'rang_classe': rang_classe,
+            'rang_annee': rang_annee,
+        }
+        for cle in ('pourcentage', 'rang_classe', 'rang_annee'):
+            annee[f'evolution_{cle}'] = _evolution(annee, precedent, cle)
+        annees.append(annee)
+        precedent = annee
+    return {'id': eleve_id, 'nom_complet': nom_complet, 'annees': annees}
+
+
+def _resultats(eleve_ids):
+    """Résultats des élèves donnés, par élève puis par année, en une requête par lot"""
+    for lot in par_lots(eleve_ids, TAILLE_LOT):
+        yield from Resultat.objects.filter(eleve_id__in=lot).order_by('eleve_id', 'annee_scolaire__annee').values_list(
+            'eleve_id', 'annee_scolaire__annee', 'classe__nom', 'section__nom',
+            'pourcentage', 'rang_classe', 'rang_annee',
+        )
+
+
+def historiques(eleve_ids):
+    """Historiques des élèves demandés : ``{id: historique}`` dans l'ordre demandé, sans les élèves inexistants"""
+    eleve_ids = list(dict.fromkeys(eleve_ids))
+    # Versions lues avant les résultats : une écriture validée entre les deux
+    # laisse au pire un historique récent sous une version déjà dépassée
+    eleves = {}
+    for lot in par_lots(eleve_ids, TAILLE_LOT):
+        eleves.update(
+            (pk, (nom_complet, version))
+            for pk, nom_complet, version in Eleve.objects.filter(pk__in=lot).values_list(
+                'pk', 'nom_complet', 'version_historique'
+            )
+        )
+
+    cache = caches['historiques']
+    cles = {pk: _cle(pk, version) for pk, (_, version) in eleves.items()}
+    en_cache = cache.get_many(cles.values())
+    trouves = {pk: en_cache[cle] for pk, cle in cles.items() if cle in en_cache}
+
+    manquants = [pk for pk in cles if pk not in trouves]
+    if manquants:
+        resultats = {pk: [] for pk in manquants}
+        for eleve_id, *ligne in _resultats(manquants):
+            resultats[eleve_id].append(ligne)
+        calcules = {pk: calculer(pk, eleves[pk][0], resultats[pk]) for pk in manquants}
+        cache.set_many({cles[pk]: historique for pk, historique in calcules.items()})
+        trouves.update(calcules)
+
+    return {pk: trouves[pk] for pk in eleve_ids if pk in trouves}
+
+
+def historique(eleve_id):
+    """Historique d'un élève, ou None s'il n'existe pas"""
+    return historiques([eleve_id]).get(eleve_id)
@@ -0,0 +1,348 @@
+"""Moteur d'import des résultats par lots.
+
+Les lignes du fichier sont traitées par lots : les années, classes, sections et
+élèves référencés sont résolus en une requête par lot (les référentiels partent
+du cache des données de référence, voir ``references``), les éléments manquants sont créés avec ``bulk_create``
+et les résultats sont insérés ou mis à jour en masse sur la clé unique
+``(eleve, annee_scolaire)``.
+
+Un lot dont l'écriture échoue est réessayé une fois, caches vidés, puis écrit
+ligne par ligne dans des points de sauvegarde : seules les lignes fautives
+sont rejetées.
+"""
+import math
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Optional
+
+from django.db import DatabaseError, connection, transaction
+
+from .models import AnneeScolaire, Classe, Section, Eleve, Resultat, arrondir_pourcentage
+from . import historiques, references
+from .classements import recalculer_rangs
+from .recherche import texte_recherche
+from .statistiques import rafraichir_groupes
+from .utils import par_lots
+from .versions import incrementer_version
+
+
+TAILLE_LOT = 1000
+
+ERREUR_CHAMPS_REQUIS = "Ligne {}: Champs requis manquants (Nom complet, Classe, Section, Année scolaire sont obligatoires)"
+ERREUR_POURCENTAGE_INVALIDE = "Ligne {}: Pourcentage doit être un nombre valide"
+ERREUR_POURCENTAGE_HORS_BORNES = "Ligne {}: Pourcentage doit être entre 0 et 100"
+ERREUR_TROP_LONG = "Ligne {}: {} dépasse {} caractères"
+
+# Colonnes texte (attribut de LigneValide, modèle, champ) et leur longueur maximale en base
+CHAMPS_TEXTE = (
+    ('nom_complet', Eleve, 'nom_complet'),
+    ('classe', Classe, 'nom'),
+    ('section', Section, 'nom'),
+    ('annee', AnneeScolaire, 'annee'),
+)
+
+
+def controler_pourcentage(valeur):
+    """Pourcentage d'une cellule : ``(Decimal arrondi, None)``, ou ``(None, gabarit d'erreur)`` s'il est rejeté.
+
+    Une cellule vide donne ``(None, None)``. « nan » n'est pas un nombre valide
+    (``float`` l'accepte, mais il n'est ni dans les bornes ni en dehors).
+    Partagé avec la simulation, pour que l'aperçu annonce les mêmes rejets que l'import.
+    """
+    if valeur is None:
+        return None, None
+    try:
+        pourcentage = float(valeur)
+    except (ValueError, TypeError):
+        return None, ERREUR_POURCENTAGE_INVALIDE
+    if math.isnan(pourcentage):
+        return None, ERREUR_POURCENTAGE_INVALIDE
+    if not (0 <= pourcentage <= 100):
+        return None, ERREUR_POURCENTAGE_HORS_BORNES
+    # Arrondi fait ici et non par la base : l'aperçu annonce la valeur enregistrée
+    return arrondir_pourcentage(pourcentage), None
+
+
+@dataclass
+class RapportImport:
+    """Compteurs et erreurs d'un import"""
+    lignes_traitees: int = 0
+    imported_count: int = 0
+    updated_count: int = 0
+    unchanged_count: int = 0
+    errors: list = field(default_factory=list)
+    error_details: list = field(default_factory=list)
+
+    def ajouter_erreur(self, row_num, row, error_msg):
+        self.errors.append(error_msg)
+        self.error_details.append({
+            'ligne': row_num,
+            'donnees': row,
+            'erreur': error_msg
+        })
+
+
+@dataclass
+class LigneValide:
+    """Ligne validée, prête à être écrite"""
+    row_num: int
+    donnees: tuple
+    nom_complet: str
+    pourcentage: Optional[Decimal]
+    classe: str
+    section: str
+    annee: str
+
+
+class ImportateurResultats:
+    """Importe des LigneFichier par lots avec un nombre constant de requêtes"""
+
+    def __init__(self, taille_lot=TAILLE_LOT, progression=None, profil=None):
+        self.taille_lot = taille_lot
+        # Appelée avec le rapport après chaque lot (suivi des imports en arrière-plan)
+        self.progression = progression
+        # ProfilImport facultatif : durée et requêtes de chaque phase
+        self.profil = profil
+        self.rapport = RapportImport()
+        # Caches nom -> id des référentiels, conservés d'un lot à l'autre
+        self._annees = {}
+        self._classes = {}
+        self._sections = {}
+        # Groupes modifiés pendant l'import : leurs rangs sont recalculés à la fin
+        self._groupes_modifies = set()
+
+    def importer(self, lignes):
+        """Importe toutes les lignes et retourne le rapport"""
+        if self.profil:
+            lignes = self.profil.iterer('lecture', lignes)
+        for lot in par_lots(lignes, self.taille_lot):
+            self.traiter_lot(lot)
+            self.rapport.lignes_traitees += len(lot)
+            if self.progression:
+                self.progression(self.rapport)
+        if self._groupes_modifies:
+            with self._phase('classement'):
+                recalculer_rangs(self._groupes_modifies, self.taille_lot)
+                incrementer_version()
+        return self.rapport
+
+    def _phase(self, nom):
+        return self.profil.phase(nom) if self.profil else nullcontext()
+
+    def valider(self, ligne_fichier):
+        """Valide une LigneFichier ; retourne une LigneValide ou None (erreur enregistrée)"""
+        row_num, row = ligne_fichier.numero, ligne_fichier.donnees
+        nom_complet, pourcentage, classe_nom, section_nom, annee_scolaire = row
+
+        # Validate required fields (pourcentage is now optional)
+        if not all([nom_complet, classe_nom, section_nom, annee_scolaire]):
+            self.rapport.ajouter_erreur(row_num, row, ERREUR_CHAMPS_REQUIS.format(row_num))
+            return None
+
+        pourcentage_val, erreur = controler_pourcentage(pourcentage)
+        if erreur:
+            self.rapport.ajouter_erreur(row_num, row, erreur.format(row_num))
+            return None
+
+        ligne = LigneValide(
+            row_num=row_num,
+            donnees=row,
+            nom_complet=str(nom_complet).strip(),
+            pourcentage=pourcentage_val,
+            classe=str(classe_nom).strip(),
+            section=str(section_nom).strip(),
+            annee=str(annee_scolaire).strip(),
+        )
+
+        # Les dépassements de longueur feraient échouer tout le lot à l'écriture
+        for attribut, modele, champ in CHAMPS_TEXTE:
+            model_field = modele._meta.get_field(champ)
+            if len(getattr(ligne, attribut)) > model_field.max_length:
+                self.rapport.ajouter_erreur(
+                    row_num, row,
+                    ERREUR_TROP_LONG.format(row_num, model_field.verbose_name, model_field.max_length)
+                )
+                return None
+
+        return ligne
+
+    def traiter_lot(self, lot):
+        """Valide puis écrit un lot de LigneFichier"""
+        with self._phase('validation'):
+            valides = [ligne for ligne in map(self.valider, lot) if ligne]
+        if not valides:
+            return
+
+        try:
+            comptes = self._ecrire_lot(valides)
+        except DatabaseError:
+            # Le lot est annulé : un id mis en cache (d'un lot précédent ou du cache des
+            # références) peut ne plus exister. Nouvel essai avec des caches vides.
+            self._vider_caches()
+            try:
+                comptes = self._ecrire_lot(valides)
+            except DatabaseError:
+                self._vider_caches()
+                comptes = self._ecrire_par_ligne(valides)
+
+        imported_count, updated_count, unchanged_count = comptes
+        self.rapport.imported_count += imported_count
+        self.rapport.updated_count += updated_count
+        self.rapport.unchanged_count += unchanged_count
+
+    def _ecrire_lot(self, valides):
+        with self._phase('ecriture'), transaction.atomic():
+            return self._ecrire(valides)
+
+    def _ecrire_par_ligne(self, valides):
+        """Écrit le lot ligne par ligne, chacune dans son point de sauvegarde : seules les lignes fautives sont rejetées"""
+        comptes = [0, 0, 0]
+        with self._phase('ecriture'), transaction.atomic():
+            if connection.vendor == 'postgresql':
+                # Clés étrangères vérifiées à chaque requête, et non à la validation :
+                # une référence disparue est rejetée avec sa ligne
+                with connection.cursor() as cursor:
+                    cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+            for ligne in valides:
+                try:
+                    with transaction.atomic():
+                        resultat = self._ecrire([ligne])
+                except DatabaseError as e:
+                    # Références créées par la ligne annulées avec elle
+                    self._vider_caches()
+                    self.rapport.ajouter_erreur(
+                        ligne.row_num, ligne.donnees,
+                        f"Ligne {ligne.row_num}: Erreur inattendue - {str(e)}"
+                    )
+                    continue
+                comptes = [total + nombre for total, nombre in zip(comptes, resultat)]
+        return comptes
+
+    def _vider_caches(self):
+        self._annees.clear()
+        self._classes.clear()
+        self._sections.clear()
+        references.invalider()
+
+    def _ecrire(self, valides):
+        with self._phase('resolution'):
+            annees = self._resoudre(AnneeScolaire, 'annee', {l.annee for l in valides}, self._annees)
+            classes = self._resoudre(Classe, 'nom', {l.classe for l in valides}, self._classes)
+            sections = self._resoudre(Section, 'nom', {l.section for l in valides}, self._sections)
+            eleves = self._resoudre(Eleve, 'nom_complet', {l.nom_complet for l in valides}, {})
+
+            existants = {
+                (r.eleve_id, r.annee_scolaire_id): r
+                for r in Resultat.objects.filter(
+                    eleve_id__in=set(eleves.values()),
+                    annee_scolaire_id__in=set(annees.values()),
+                )
+            }
+
+        a_creer = {}
+        a_modifier = {}
+        # Groupes (année, classe, section) dont les statistiques changent
+        groupes = set()
+        imported_count = 0
+        updated_count = 0
+        unchanged_count = 0
+
+        for ligne in valides:
+            cle = (eleves[ligne.nom_complet], annees[ligne.annee])
+            recherche = texte_recherche(ligne.nom_complet, ligne.classe, ligne.section, ligne.annee)
+            resultat = a_creer.get(cle) or a_modifier.get(cle) or existants.get(cle)
+
+            if resultat is None:
+                resultat = Resultat(
+                    eleve_id=cle[0],
+                    annee_scolaire_id=cle[1],
+                    classe_id=classes[ligne.classe],
+                    section_id=sections[ligne.section],
+                    pourcentage=ligne.pourcentage,
+                )
+                resultat.empreinte = resultat.calculer_empreinte()
+                resultat.recherche = recherche
+                a_creer[cle] = resultat
+                groupes.add(resultat.groupe)
+                imported_count += 1
+                continue
+
+            # Update existing result (a null pourcentage keeps the current value)
+            empreinte_actuelle = resultat.empreinte or resultat.calculer_empreinte()
+            groupe_actuel = resultat.groupe
+            resultat.classe_id = classes[ligne.classe]
+            resultat.section_id = sections[ligne.section]
+            if ligne.pourcentage is not None:
+                resultat.pourcentage = ligne.pourcentage
+            resultat.empreinte = resultat.calculer_empreinte()
+            recherche_actuelle, resultat.recherche = resultat.recherche, recherche
+
+            if resultat.empreinte == empreinte_actuelle and recherche == recherche_actuelle:
+                unchanged_count += 1
+                continue
+            if cle not in a_creer:
+                a_modifier[cle] = resultat
+            groupes.update((groupe_actuel, resultat.groupe))
+            updated_count += 1
+
+        self._inserer(list(a_creer.values()))
+        if a_modifier:
+            Resultat.objects.bulk_update(
+                list(a_modifier.values()),
+                ['classe', 'section', 'pourcentage', 'empreinte', 'recherche'],
+                batch_size=self.taille_lot,
+            )
+        if a_creer or a_modifier:
+            rafraichir_groupes(groupes)
+            incrementer_version()
+            # Les camarades dont seul le rang change le sont par recalculer_rangs
+            historiques.invalider(eleve_id for eleve_id, _ in (*a_creer, *a_modifier))
+            self._groupes_modifies.update(groupes)
+
+        return imported_count, updated_count, unchanged_count
+
+    def _inserer(self, nouveaux):
+        """Insère les nouveaux résultats ; un conflit concurrent devient une mise à jour"""
+        avec_pourcentage = [r for r in nouveaux if r.pourcentage is not None]
+        sans_pourcentage = [r for r in nouveaux if r.pourcentage is None]
+        # En cas de conflit le pourcentage existant est conservé : l'empreinte
+        # calculée ne serait plus juste, elle est donc vidée (recalculée au besoin)
+        for resultat in sans_pourcentage:
+            resultat.empreinte = ''
+
+        for objets, champs in (
+            (avec_pourcentage, ['classe', 'section', 'pourcentage', 'empreinte', 'recherche']),
+            # Un pourcentage vide ne doit jamais écraser une valeur existante
+            (sans_pourcentage, ['classe', 'section', 'empreinte', 'recherche']),
+        ):
+            if objets:
+                Resultat.objects.bulk_create(
+                    objets,
+                    batch_size=self.taille_lot,
+                    update_conflicts=True,
+                    unique_fields=['eleve', 'annee_scolaire'],
+                    update_fields=champs,
+                )
+
+    @staticmethod
+    def _resoudre(modele, champ, noms, cache):
+        """Complète ``cache`` (nom -> id) pour ``noms`` en créant les entrées manquantes"""
+        if not cache and modele in references.CHAMPS_NOM:
+            cache.update(references.identifiants(modele))
+        manquants = noms - cache.keys()
+        if manquants:
+            filtre = f'{champ}__in'
+            cache.update(modele.objects.filter(**{filtre: manquants}).values_list(champ, 'id'))
+            absents = manquants - cache.keys()
+            if absents:
+                modele.objects.bulk_create(
+                    [modele(**{champ: nom}) for nom in absents],
+                    ignore_conflicts=True,
+                )
+                cache.update(modele.objects.filter(**{filtre: absents}).values_list(champ, 'id'))
+                if modele in references.CHAMPS_NOM:
+                    # bulk_create n'envoie pas de signal
+                    transaction.on_commit(references.invalider)
+        return cache
+
@@ -0,0 +1,122 @@
+"""Lecture en flux des fichiers de résultats (Excel ou CSV).
+
+Le fichier envoyé est lu directement depuis l'objet ``UploadedFile`` de Django,
+sans copie intermédiaire : openpyxl est utilisé en mode lecture seule et le CSV
+est décodé ligne par ligne. Les lignes sont produites une à une par des
+générateurs, la mémoire consommée ne dépend donc pas du nombre de lignes.
+"""
+import codecs
+import csv
+from typing import NamedTuple, Optional
+
+
+EXTENSIONS_EXCEL = ('.xlsx', '.xls')
+EXTENSIONS_CSV = ('.csv',)
+EXTENSIONS_ACCEPTEES = EXTENSIONS_EXCEL + EXTENSIONS_CSV
+
+
+class FormatNonSupporte(ValueError):
+    """Le fichier n'est ni un classeur Excel ni un CSV"""
+
+
+class LigneFichier(NamedTuple):
+    """Ligne du fichier aux cinq colonnes attendues"""
+    numero: int
+    nom_complet: Optional[str]
+    pourcentage: object
+    classe: Optional[str]
+    section: Optional[str]
+    annee_scolaire: Optional[str]
+
+    @property
+    def donnees(self):
+        """Valeurs de la ligne, dans l'ordre des colonnes du fichier"""
+        return tuple(self[1:])
+
+
+def lire_lignes(fichier, nom=None):
+    """Produit les lignes de données (en-tête exclu) d'un fichier Excel ou CSV"""
+    nom = (nom or getattr(fichier, 'name', '') or '').lower()
+    if nom.endswith(EXTENSIONS_CSV):
+        valeurs = _lire_csv(fichier)
+    elif nom.endswith(EXTENSIONS_EXCEL):
+        valeurs = _lire_excel(fichier)
+    else:
+        raise FormatNonSupporte(nom)
+    return _typer(valeurs)
+
+
+def _lire_excel(fichier):
+    """Parcourt la feuille active en mode lecture seule (sans construire le DOM)"""
+    # Import différé : seuls le worker d'import et la simulation lisent de l'Excel
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(fichier, read_only=True, data_only=True)
+    try:
+        sheet = workbook.active
+        # Skip header row
+        yield from enumerate(sheet.iter_rows(min_row=2, values_only=True), start=2)
+    finally:
+        workbook.close()
+
+
+def _decoder(lignes):
+    """Décode en UTF-8 et se rabat sur cp1252 (CSV exportés par Excel) ligne par ligne"""
+    for ligne in lignes:
+        try:
+            yield ligne.decode('utf-8')
+        except UnicodeDecodeError:
+            yield ligne.decode('cp1252', errors='replace')
+
+
+def _lire_csv(fichier):
+    """Parcourt un CSV séparé par des virgules, points-virgules ou tabulations"""
+    lignes = iter(fichier)
+    premiere = next(lignes, b'')
+    if premiere.startswith(codecs.BOM_UTF8):
+        premiere = premiere[len(codecs.BOM_UTF8):]
+    entete = next(_decoder([premiere]))
+    # Seul le séparateur est déduit de l'en-tête : sans guillemets, il ne dit rien
+    # de leur échappement (les "" du CSV exporté resteraient doublés)
+    try:
+        separateur = csv.Sniffer().sniff(entete, delimiters=';,\t').delimiter
+    except csv.Error:
+        separateur = csv.excel.delimiter
+
+    reader = csv.reader(_decoder(lignes), csv.excel, delimiter=separateur)
+    # La ligne d'en-tête a déjà été consommée
+    yield from enumerate(reader, start=2)
+
+
+def _nettoyer(valeur):
+    if isinstance(valeur, str):
+        valeur = valeur.strip()
+        return valeur or None
+    return valeur
+
+
+def _convertir_nombre(valeur):
+    """Convertit un pourcentage textuel ("12,5") en nombre ; laisse la valeur sinon"""
+    if isinstance(valeur, str):
+        try:
+            return float(valeur.replace(',', '.'))
+        except ValueError:
+            return valeur
+    return valeur
+
+
+def _typer(valeurs):
+    for numero, row in valeurs:
+        cellules = [_nettoyer(v) for v in tuple(row)[:5]]
+        cellules += [None] * (5 - len(cellules))
+        if not cellules[0]:  # Skip empty rows
+            continue
+        nom_complet, pourcentage, classe, section, annee_scolaire = cellules
+        yield LigneFichier(
+            numero=numero,
+            nom_complet=nom_complet,
+            pourcentage=_convertir_nombre(pourcentage),
+            classe=classe,
+            section=section,
+            annee_scolaire=annee_scolaire,
+        )
@@ -0,0 +1,274 @@
+"""Instrumentation des requêtes : SQL, gabarits, temps total.
+
+``InstrumentationMiddleware`` mesure chaque requête :
+
+- nombre et durée des requêtes SQL, via un ``execute_wrapper`` posé sur chaque
+  connexion à son ouverture (``installer_sur_connexion``, signal
+  ``connection_created``) : en ASGI, les requêtes SQL d'une même requête HTTP
+  s'exécutent dans d'autres threads que le middleware ;
+- durée du rendu des gabarits, via le moteur ``DjangoTemplatesChronometres``
+  (à déclarer comme ``BACKEND`` dans ``TEMPLATES``) ;
+- durée totale de la vue (hors envoi d'un corps en flux).
+
+La mesure en cours est portée par une ``ContextVar``, recopiée par asgiref dans
+les threads où s'exécutent l'ORM et les rendus déportés. Le middleware
+fonctionne en WSGI comme en ASGI.
+
+Les mesures sont renvoyées dans l'en-tête ``Server-Timing`` (visible dans les
+outils de développement du navigateur). Les requêtes plus lentes que
+``PERF_SEUIL_LENT_MS`` sont ajoutées, une ligne JSON chacune, au journal
+``PERF_JOURNAL`` (fichier à rotation), avec les requêtes SQL répétées qui
+trahissent un motif N+1. La page « Requêtes lentes » de l'admin agrège ce
+journal.
+"""
+import contextvars
+import json
+import logging
+import os
+import re
+import statistics
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from logging.handlers import RotatingFileHandler
+
+from django.conf import settings
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+# Nombre minimal d'exécutions d'une même requête SQL pour la signaler (N+1)
+REPETITIONS_SIGNALEES = 3
+
+_mesure_courante = contextvars.ContextVar('mesure_requete', default=None)
+
+
+def motif_sql(sql):
+    """Forme normalisée d'une requête : espaces réduits, listes ``IN (...)`` repliées"""
+    sql = ' '.join(sql.split())
+    return re.sub(r'IN \((?:%s, )*%s\)', 'IN (...)', sql)
+
+
+@dataclass
+class MesureRequete:
+    """Mesures d'une requête HTTP en cours"""
+    sql_nombre: int = 0
+    sql_duree: float = 0.0
+    gabarits_duree: float = 0.0
+    total: float = 0.0
+    motifs: Counter = field(default_factory=Counter)
+
+    def executer(self, execute, sql, params, many, context):
+        debut = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_duree += time.perf_counter() - debut
+            self.sql_nombre += 1
+            self.motifs[motif_sql(sql)] += 1
+
+    def repetitions(self):
+        """Requêtes SQL exécutées plusieurs fois : ``[(motif, nombre), ...]``"""
+        return [
+            (motif, nombre) for motif, nombre in self.motifs.most_common(5)
+            if nombre >= REPETITIONS_SIGNALEES
+        ]
+
+    def server_timing(self):
+        # Valeur d'en-tête HTTP : descriptions sans accents
+        return ", ".join([
+            f'sql;dur={self.sql_duree * 1000:.1f};desc="SQL ({self.sql_nombre} requetes)"',
+            f'tpl;dur={self.gabarits_duree * 1000:.1f};desc="Gabarits"',
+            f'total;dur={self.total * 1000:.1f};desc="Vue"',
+        ])
+
+
+def _executer(execute, sql, params, many, context):
+    mesure = _mesure_courante.get()
+    if mesure is None:
+        return execute(sql, params, many, context)
+    return mesure.executer(execute, sql, params, many, context)
+
+
+def installer_sur_connexion(sender, connection, **kwargs):
+    """Receveur de ``connection_created`` : mesure les requêtes SQL de la connexion"""
+    # Une connexion rouverte (ou rendue par le pool) garde ses wrappers
+    if _executer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_executer)
+
+
+class InstrumentationMiddleware:
+    """Mesure chaque requête ; en-tête Server-Timing et journal des requêtes lentes"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        mesure = MesureRequete()
+        jeton = _mesure_courante.set(mesure)
+        debut = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _mesure_courante.reset(jeton)
+        if self._terminer(response, mesure, debut):
+            journaliser(request, response, mesure)
+        return response
+
+    async def __acall__(self, request):
+        mesure = MesureRequete()
+        jeton = _mesure_courante.set(mesure)
+        debut = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _mesure_courante.reset(jeton)
+        if self._terminer(response, mesure, debut):
+            # Écriture dans le fichier journal hors de la boucle d'événements
+            await sync_to_async(journaliser, thread_sensitive=False)(request, response, mesure)
+        return response
+
+    def _terminer(self, response, mesure, debut):
+        """Durée totale et en-tête Server-Timing ; vrai si la requête est à journaliser"""
+        mesure.total = time.perf_counter() - debut
+        if settings.PERF_SERVER_TIMING:
+            response['Server-Timing'] = mesure.server_timing()
+        return mesure.total * 1000 >= settings.PERF_SEUIL_LENT_MS
+
+
+class TemplateChronometre(Template):
+    def render(self, context=None, request=None):
+        mesure = _mesure_courante.get()
+        if mesure is None:
+            return super().render(context, request)
+        debut = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            mesure.gabarits_duree += time.perf_counter() - debut
+
+
+class DjangoTemplatesChronometres(DjangoTemplates):
+    """Moteur de gabarits Django dont les rendus sont chronométrés pour la requête en cours"""
+
+    def from_string(self, template_code):
+        return TemplateChronometre(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TemplateChronometre(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+_verrou_journal = threading.Lock()
+_journal = (None, None)
+
+
+def _journal_requetes_lentes():
+    """Logger du journal des requêtes lentes, créé au premier usage (et si PERF_JOURNAL change)"""
+    global _journal
+    chemin = str(settings.PERF_JOURNAL)
+    with _verrou_journal:
+        chemin_actuel, journal = _journal
+        if chemin_actuel != chemin:
+            journal = logging.getLogger('palmares_app.requetes_lentes')
+            for ancien in list(journal.handlers):
+                journal.removeHandler(ancien)
+                ancien.close()
+            os.makedirs(os.path.dirname(chemin), exist_ok=True)
+            gestionnaire = RotatingFileHandler(
+                chemin,
+                maxBytes=settings.PERF_JOURNAL_TAILLE_MAX,
+                backupCount=settings.PERF_JOURNAL_FICHIERS,
+                encoding='utf-8',
+            )
+            gestionnaire.setFormatter(logging.Formatter('%(message)s'))
+            journal.setLevel(logging.INFO)
+            journal.propagate = False
+            journal.addHandler(gestionnaire)
+            _journal = (chemin, journal)
+    return journal
+
+
+def journaliser(request, response, mesure):
+    """Ajoute la requête au journal des requêtes lentes ; une erreur d'écriture est
+    consignée sans jamais faire échouer la réponse mesurée"""
+    correspondance = getattr(request, 'resolver_match', None)
+    entree = {
+        'date': timezone.now().isoformat(timespec='seconds'),
+        'methode': request.method,
+        'chemin': request.path,
+        'vue': correspondance.view_name if correspondance else request.path,
+        'statut': response.status_code,
+        'total_ms': round(mesure.total * 1000, 1),
+        'sql_ms': round(mesure.sql_duree * 1000, 1),
+        'sql_nombre': mesure.sql_nombre,
+        'gabarits_ms': round(mesure.gabarits_duree * 1000, 1),
+        'repetitions': mesure.repetitions(),
+    }
+    try:
+        _journal_requetes_lentes().info(json.dumps(entree, ensure_ascii=False))
+    except Exception:
+        logger.exception("Journal des requêtes lentes inaccessible : %s", settings.PERF_JOURNAL)
+
+
+def lire_journal():
+    """Entrées du journal des requêtes lentes, fichiers archivés compris"""
+    fichiers = [settings.PERF_JOURNAL] + [
+        f"{settings.PERF_JOURNAL}.{numero}" for numero in range(1, settings.PERF_JOURNAL_FICHIERS + 1)
+    ]
+    for chemin in fichiers:
+        try:
+            with open(chemin, encoding='utf-8') as fichier:
+                for ligne in fichier:
+                    try:
+                        yield json.loads(ligne)
+                    except ValueError:
+                        continue
+        except FileNotFoundError:
+            continue
+
+
+def agreger(entrees):
+    """Pires points d'accès et motifs N+1, à partir des entrées du journal"""
+    par_vue = {}
+    for entree in entrees:
+        par_vue.setdefault(entree['vue'], []).append(entree)
+
+    vues = []
+    motifs = {}
+    for vue, liste in par_vue.items():
+        totaux = sorted(entree['total_ms'] for entree in liste)
+        vues.append({
+            'vue': vue,
+            'nombre': len(liste),
+            'cumul_ms': round(sum(totaux), 1),
+            'median_ms': round(statistics.median(totaux), 1),
+            'p95_ms': totaux[max(int(len(totaux) * 0.95 + 0.5) - 1, 0)],
+            'max_ms': totaux[-1],
+            'sql_nombre_moyen': round(statistics.mean(entree['sql_nombre'] for entree in liste), 1),
+            'sql_ms_moyen': round(statistics.mean(entree['sql_ms'] for entree in liste), 1),
+            'gabarits_ms_moyen': round(statistics.mean(entree['gabarits_ms'] for entree in liste), 1),
+            'dernier': max(entree['date'] for entree in liste),
+        })
+        for entree in liste:
+            for motif, nombre in entree.get('repetitions', []):
+                cle = (vue, motif)
+                courant = motifs.setdefault(cle, {'vue': vue, 'motif': motif, 'requetes': 0, 'max_repetitions': 0})
+                courant['requetes'] += 1
+                courant['max_repetitions'] = max(courant['max_repetitions'], nombre)
+
+    vues.sort(key=lambda vue: vue['cumul_ms'], reverse=True)
+    return vues, sorted(motifs.values(), key=lambda motif: motif['max_repetitions'], reverse=True)
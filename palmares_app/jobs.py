@@ -0,0 +1,187 @@
+"""File d'attente des imports, stockée en base de données.
+
+Les jobs sont réclamés avec ``SELECT ... FOR UPDATE SKIP LOCKED`` : plusieurs
+workers peuvent tourner en parallèle sans broker ni Redis, chaque job n'étant
+traité qu'une seule fois.
+
+Pendant le traitement, un thread du worker rafraîchit ``date_maj`` à intervalle
+fixe (``Battement``), indépendamment de l'avancement des lots : seul un job dont
+le worker a disparu reste sans activité assez longtemps pour être remis en file.
+"""
+import logging
+import threading
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .importer import ImportateurResultats
+from .ingestion import lire_lignes
+from .journaux import ecrire_journal_erreurs, purger
+from .models import ImportJob, MetriquesImport
+from .profilage import ProfilImport
+
+
+logger = logging.getLogger(__name__)
+
+# Un job "en cours" sans activité depuis ce délai est considéré comme abandonné
+DELAI_ABANDON = timedelta(minutes=10)
+
+# Intervalle du battement d'un job en cours, très inférieur à DELAI_ABANDON
+INTERVALLE_BATTEMENT = timedelta(seconds=30)
+
+
+def creer_job(fichier, utilisateur=None, profiler=False):
+    """Enregistre le fichier envoyé et place l'import en file d'attente"""
+    return ImportJob.objects.create(
+        fichier=fichier,
+        nom_fichier=fichier.name,
+        cree_par=utilisateur if utilisateur and utilisateur.is_authenticated else None,
+        profiler=profiler,
+    )
+
+
+def reclamer_job():
+    """Réserve le plus ancien job en attente, ou retourne None"""
+    with transaction.atomic():
+        job = (
+            ImportJob.objects.select_for_update(skip_locked=True)
+            .filter(statut=ImportJob.EN_ATTENTE)
+            .order_by('date_creation')
+            .first()
+        )
+        if job is None:
+            return None
+        job.statut = ImportJob.EN_COURS
+        job.date_debut = timezone.now()
+        job.save(update_fields=['statut', 'date_debut', 'date_maj'])
+    return job
+
+
+def remettre_jobs_abandonnes():
+    """Remet en attente les jobs dont le worker a disparu en cours de traitement"""
+    return ImportJob.objects.filter(
+        statut=ImportJob.EN_COURS,
+        date_maj__lt=timezone.now() - DELAI_ABANDON,
+    ).update(
+        statut=ImportJob.EN_ATTENTE,
+        date_debut=None,
+        lignes_traitees=0,
+        nb_importes=0,
+        nb_mis_a_jour=0,
+        nb_inchanges=0,
+        nb_erreurs=0,
+        message='',
+    )
+
+
+class Battement:
+    """Signale qu'un job est toujours traité : ``date_maj`` rafraîchie par un thread
+    tant que le bloc ``with`` s'exécute"""
+
+    def __init__(self, job, intervalle=INTERVALLE_BATTEMENT):
+        self.job = job
+        self.intervalle = intervalle.total_seconds()
+        self._arret = threading.Event()
+        self._thread = threading.Thread(target=self._battre, name=f'battement-import-{job.pk}', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._arret.set()
+        self._thread.join()
+
+    def battre(self):
+        """Rafraîchit ``date_maj`` si le job est toujours en cours"""
+        ImportJob.objects.filter(pk=self.job.pk, statut=ImportJob.EN_COURS).update(date_maj=timezone.now())
+
+    def _battre(self):
+        try:
+            while not self._arret.wait(self.intervalle):
+                try:
+                    self.battre()
+                except Exception:
+                    logger.exception("Battement de l'import %s non enregistré", self.job.pk)
+        finally:
+            # Connexion propre à ce thread
+            connection.close()
+
+
+def executer_job(job):
+    """Exécute l'import d'un job réclamé et enregistre son résultat"""
+    with Battement(job):
+        return _executer(job)
+
+
+def _executer(job):
+
+    def progression(rapport):
+        ImportJob.objects.filter(pk=job.pk).update(
+            lignes_traitees=rapport.lignes_traitees,
+            nb_importes=rapport.imported_count,
+            nb_mis_a_jour=rapport.updated_count,
+            nb_inchanges=rapport.unchanged_count,
+            nb_erreurs=len(rapport.errors),
+            date_maj=timezone.now(),
+        )
+
+    profil = ProfilImport(profiler=job.profiler)
+    try:
+        with profil.mesurer(), job.fichier.open('rb') as fichier:
+            rapport = ImportateurResultats(progression=progression, profil=profil).importer(
+                lire_lignes(fichier, job.nom_fichier)
+            )
+    except Exception as e:
+        logger.exception("Échec de l'import %s", job.pk)
+        job.refresh_from_db(fields=['lignes_traitees', 'nb_importes', 'nb_mis_a_jour', 'nb_inchanges', 'nb_erreurs'])
+        job.statut = ImportJob.ECHOUE
+        job.message = f"Erreur lors de l'import: {str(e)}"
+        job.date_fin = timezone.now()
+        job.save()
+        enregistrer_metriques(job, profil)
+        return job
+
+    job.lignes_traitees = rapport.lignes_traitees
+    job.nb_importes = rapport.imported_count
+    job.nb_mis_a_jour = rapport.updated_count
+    job.nb_inchanges = rapport.unchanged_count
+    job.nb_erreurs = len(rapport.errors)
+    if rapport.error_details:
+        job.fichier_erreurs = ecrire_journal_erreurs(rapport.error_details, job).nom_fichier
+        purger()
+    job.message = "\n".join(rapport.errors[:3])
+    job.statut = ImportJob.TERMINE
+    job.date_fin = timezone.now()
+
+    # Le fichier source n'est plus utile une fois l'import terminé
+    job.fichier.delete(save=False)
+    job.fichier = ''
+    job.save()
+    enregistrer_metriques(job, profil)
+    return job
+
+
+def marquer_echec(job, erreur):
+    """Termine en échec un job dont le traitement s'est interrompu"""
+    ImportJob.objects.filter(pk=job.pk).update(
+        statut=ImportJob.ECHOUE,
+        message=f"Erreur lors de l'import: {str(erreur)}",
+        date_fin=timezone.now(),
+        date_maj=timezone.now(),
+    )
+
+
+def enregistrer_metriques(job, profil):
+    """Enregistre les mesures de l'import (et son profil cProfile s'il a été demandé)"""
+    duree = profil.duree_totale
+    return MetriquesImport.objects.update_or_create(job=job, defaults={
+        'lignes': job.lignes_traitees,
+        'duree_totale': round(duree, 3),
+        'lignes_par_seconde': round(job.lignes_traitees / duree, 1) if duree > 0 else 0.0,
+        'nb_requetes': profil.nb_requetes,
+        'memoire_pic_octets': profil.memoire_pic,
+        'phases': profil.phases(),
+        'fichier_profil': profil.ecrire_profil(f'import_{job.pk}.prof'),
+    })[0]
@@ -0,0 +1,134 @@
+"""Logs des erreurs d'import : CSV compressés en gzip, indexés en base.
+
+Chaque log est un fichier ``MEDIA_ROOT/import_errors/*.csv.gz`` décrit par un
+``JournalErreurs`` (import, date, nombre de lignes et d'erreurs, taille) : la
+page des logs interroge la table au lieu de parcourir le répertoire. La
+rétention (``IMPORT_LOGS_RETENTION_JOURS``, ``IMPORT_LOGS_TAILLE_MAX``)
+supprime les plus anciens après chaque nouvel import en erreur, ou à la
+demande (``manage.py purger_journaux``).
+"""
+import csv
+import gzip
+import io
+import os
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+from .models import JournalErreurs
+
+
+REPERTOIRE = 'import_errors'
+
+COLONNES = ['Ligne', 'Nom complet', 'Pourcentage', 'Classe', 'Section', 'Année scolaire', 'Erreur']
+
+
+def ecrire_journal_erreurs(error_details, job=None):
+    """Écrit le détail des erreurs dans un CSV compressé et l'enregistre ; retourne le JournalErreurs"""
+    maintenant = timezone.now()
+    suffixe = job.pk if job is not None else get_random_string(6).lower()
+    nom_fichier = f'import_errors_{timezone.localtime(maintenant).strftime("%Y%m%d_%H%M%S")}_{suffixe}.csv.gz'
+    chemin = os.path.join(REPERTOIRE, nom_fichier)
+    destination = os.path.join(settings.MEDIA_ROOT, chemin)
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+
+    with gzip.open(destination, 'wt', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=COLONNES)
+        writer.writeheader()
+
+        for error in error_details:
+            row_data = error['donnees']
+            writer.writerow({
+                'Ligne': error['ligne'],
+                'Nom complet': row_data[0] if len(row_data) > 0 else '',
+                'Pourcentage': row_data[1] if len(row_data) > 1 else '',
+                'Classe': row_data[2] if len(row_data) > 2 else '',
+                'Section': row_data[3] if len(row_data) > 3 else '',
+                'Année scolaire': row_data[4] if len(row_data) > 4 else '',
+                'Erreur': error['erreur']
+            })
+
+    return JournalErreurs.objects.create(
+        job=job,
+        nom_fichier=nom_fichier,
+        nom_import=job.nom_fichier if job is not None else '',
+        chemin=chemin,
+        date_creation=maintenant,
+        nb_lignes=job.lignes_traitees if job is not None else 0,
+        nb_erreurs=len(error_details),
+        taille_octets=os.path.getsize(destination),
+    )
+
+
+def purger(jours=None, taille_max=None):
+    """Supprime les logs plus vieux que ``jours`` puis les plus anciens au-delà de ``taille_max`` octets.
+
+    Sans argument, applique la rétention des réglages. Retourne le nombre de logs supprimés.
+    """
+    jours = settings.IMPORT_LOGS_RETENTION_JOURS if jours is None else jours
+    taille_max = settings.IMPORT_LOGS_TAILLE_MAX if taille_max is None else taille_max
+    supprimes = 0
+
+    if jours:
+        supprimes += _supprimer(JournalErreurs.objects.filter(
+            date_creation__lt=timezone.now() - timedelta(days=jours)
+        ))
+
+    if taille_max:
+        total = JournalErreurs.objects.aggregate(total=Sum('taille_octets'))['total'] or 0
+        if total > taille_max:
+            a_supprimer = []
+            for pk, taille in JournalErreurs.objects.order_by('date_creation').values_list('pk', 'taille_octets'):
+                if total <= taille_max:
+                    break
+                a_supprimer.append(pk)
+                total -= taille
+            supprimes += _supprimer(JournalErreurs.objects.filter(pk__in=a_supprimer))
+
+    return supprimes
+
+
+def _supprimer(journaux):
+    """Supprime les fichiers puis les lignes ; un fichier déjà absent est ignoré"""
+    chemins = [os.path.join(settings.MEDIA_ROOT, chemin) for chemin in journaux.values_list('chemin', flat=True)]
+    for chemin in chemins:
+        try:
+            os.remove(chemin)
+        except FileNotFoundError:
+            pass
+    journaux.delete()
+    return len(chemins)
+
+
+def indexer_anciens():
+    """Compresse et enregistre les CSV laissés dans import_errors par les versions précédentes"""
+    repertoire = os.path.join(settings.MEDIA_ROOT, REPERTOIRE)
+    if not os.path.isdir(repertoire):
+        return 0
+    connus = set(JournalErreurs.objects.values_list('nom_fichier', flat=True))
+    indexes = 0
+    for entree in os.scandir(repertoire):
+        if not entree.is_file() or not entree.name.endswith('.csv'):
+            continue
+        nom_fichier = f'{entree.name}.gz'
+        if nom_fichier in connus:
+            continue
+        destination = os.path.join(repertoire, nom_fichier)
+        with open(entree.path, 'rb') as source:
+            contenu = source.read()
+        with gzip.open(destination, 'wb') as cible:
+            cible.write(contenu)
+        lignes = csv.reader(io.StringIO(contenu.decode('utf-8', errors='replace'), newline=''))
+        JournalErreurs.objects.create(
+            nom_fichier=nom_fichier,
+            chemin=os.path.join(REPERTOIRE, nom_fichier),
+            date_creation=datetime.fromtimestamp(entree.stat().st_mtime, tz=dt_timezone.utc),
+            nb_erreurs=max(sum(1 for _ in lignes) - 1, 0),  # sans l'en-tête
+            taille_octets=os.path.getsize(destination),
+        )
+        os.remove(entree.path)
+        indexes += 1
+    return indexes
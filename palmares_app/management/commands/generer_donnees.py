@@ -0,0 +1,67 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from palmares_app.donnees_synthetiques import ecrire_xlsx, generer_jeu
+from palmares_app.importer import ImportateurResultats
+
+
+def ajouter_arguments_echelle(parser):
+    """Paramètres d'échelle communs à la génération et aux mesures de performance"""
+    parser.add_argument('--annees', type=int, default=3, help="Nombre d'années scolaires (défaut: 3)")
+    parser.add_argument('--classes', type=int, default=6, help="Nombre de classes (défaut: 6)")
+    parser.add_argument('--sections', type=int, default=3, help="Nombre de sections (défaut: 3)")
+    parser.add_argument(
+        '--eleves', type=int, default=40,
+        help="Élèves par classe et section (défaut: 40)",
+    )
+    parser.add_argument('--graine', type=int, default=0, help="Graine du générateur aléatoire (défaut: 0)")
+
+
+def echelle(options):
+    return {nom: options[nom] for nom in ('annees', 'classes', 'sections', 'eleves', 'graine')}
+
+
+class Command(BaseCommand):
+    help = (
+        "Génère un jeu de données synthétique (années × classes × sections × élèves) : "
+        "fichiers Excel au format d'import et/ou import direct dans la base configurée."
+    )
+
+    def add_arguments(self, parser):
+        ajouter_arguments_echelle(parser)
+        parser.add_argument(
+            '--dossier',
+            help="Écrit un fichier Excel par année scolaire dans ce dossier",
+        )
+        parser.add_argument(
+            '--sans-import',
+            action='store_true',
+            help="N'écrit que les fichiers, sans toucher à la base",
+        )
+
+    def handle(self, *args, **options):
+        if options['sans_import'] and not options['dossier']:
+            raise CommandError("--sans-import nécessite --dossier")
+        if min(options['annees'], options['classes'], options['sections'], options['eleves']) < 1:
+            raise CommandError("Les paramètres d'échelle doivent être strictement positifs")
+
+        jeu = generer_jeu(**echelle(options))
+
+        if options['dossier']:
+            os.makedirs(options['dossier'], exist_ok=True)
+            for annee, lignes in jeu.items():
+                chemin = os.path.join(options['dossier'], f"resultats_{annee}.xlsx")
+                ecrire_xlsx(lignes, chemin)
+                self.stdout.write(f"{chemin} ({len(lignes)} lignes)")
+
+        if not options['sans_import']:
+            for annee, lignes in jeu.items():
+                rapport = ImportateurResultats().importer(lignes)
+                self.stdout.write(
+                    f"{annee}: {rapport.imported_count} importés, {rapport.updated_count} mis à jour, "
+                    f"{len(rapport.errors)} erreurs"
+                )
+
+        total = sum(len(lignes) for lignes in jeu.values())
+        self.stdout.write(self.style.SUCCESS(f"Jeu synthétique de {total} résultats généré"))
@@ -0,0 +1,36 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from palmares_app.cache_exports import preparer_export, repertoire_cache
+from palmares_app.exports import generer_zip_palmares
+from palmares_app.models import AnneeScolaire
+
+
+class Command(BaseCommand):
+    help = (
+        "Génère en arrière-plan le ZIP des palmarès par classe d'une année scolaire. "
+        "Le fichier est placé dans le cache des exports : le téléchargement depuis le site est ensuite immédiat."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('annee', help="Année scolaire (ex: 2023-2024)")
+        parser.add_argument(
+            '--processus',
+            type=int,
+            default=None,
+            help="Nombre de processus de rendu (défaut: PDF_PROCESSUS ou nombre de cœurs)",
+        )
+
+    def handle(self, *args, **options):
+        annee = options['annee']
+        if not AnneeScolaire.objects.filter(annee=annee).exists():
+            raise CommandError(f"Année scolaire inconnue: {annee}")
+
+        nom_fichier = preparer_export(
+            {'annee': annee}, 'zip',
+            lambda fichier: generer_zip_palmares(annee, fichier, options['processus']),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Palmarès {annee} disponible: {os.path.join(repertoire_cache(), nom_fichier)}"
+        ))
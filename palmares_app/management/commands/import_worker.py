@@ -0,0 +1,62 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from palmares_app.jobs import executer_job, marquer_echec, reclamer_job, remettre_jobs_abandonnes
+
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Traite les imports en file d'attente (plusieurs workers peuvent tourner en parallèle)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--intervalle',
+            type=float,
+            default=2.0,
+            help="Secondes d'attente quand la file est vide (défaut: 2)",
+        )
+        parser.add_argument(
+            '--une-fois',
+            action='store_true',
+            help="Traite les jobs en attente puis s'arrête",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Worker d'import démarré")
+        while True:
+            close_old_connections()
+            remis = remettre_jobs_abandonnes()
+            if remis:
+                self.stdout.write(self.style.WARNING(f"{remis} job(s) abandonné(s) remis en attente"))
+
+            job = reclamer_job()
+            if job is None:
+                if options['une_fois']:
+                    return
+                time.sleep(options['intervalle'])
+                continue
+
+            self.stdout.write(f"Import {job.pk} ({job.nom_fichier}) en cours...")
+            try:
+                job = executer_job(job)
+            except Exception as e:
+                # Journal, métriques ou statut final non enregistrés : le job ne doit pas rester
+                # en cours, il serait réclamé après DELAI_ABANDON et importé une seconde fois
+                logger.exception("Échec du traitement de l'import %s", job.pk)
+                self.stderr.write(self.style.ERROR(f"Import {job.pk} échoué: {e}"))
+                try:
+                    close_old_connections()
+                    marquer_echec(job, e)
+                except Exception:
+                    logger.exception("Impossible de marquer l'import %s en échec", job.pk)
+                continue
+            self.stdout.write(
+                f"Import {job.pk} {job.get_statut_display().lower()}: "
+                f"{job.nb_importes} importés, {job.nb_mis_a_jour} mis à jour, "
+                f"{job.nb_inchanges} inchangés, {job.nb_erreurs} erreurs"
+            )
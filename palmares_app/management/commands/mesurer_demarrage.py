@@ -0,0 +1,146 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from .mesurer_performances import Command as MesurerPerformances
+
+
+# Exécuté dans un interpréteur neuf : démarrage d'un worker, préchargement éventuel, deux requêtes
+SCRIPT_WORKER = """
+import json, sys, time
+debut = time.perf_counter()
+import django
+django.setup()
+from django.urls import get_resolver, reverse
+get_resolver().url_patterns
+mesures = {'demarrage_ms': (time.perf_counter() - debut) * 1000}
+
+if sys.argv[1] == '1':
+    from palmares_app.demarrage import amorcer, precharger
+    debut = time.perf_counter()
+    precharger()
+    mesures['prechargement_ms'] = (time.perf_counter() - debut) * 1000
+    debut = time.perf_counter()
+    amorcer()
+    mesures['amorcage_ms'] = (time.perf_counter() - debut) * 1000
+
+from django.conf import settings
+from django.test import Client
+from django.test.utils import override_settings
+with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+    client = Client()
+    for nom in ('premiere_requete_ms', 'deuxieme_requete_ms'):
+        debut = time.perf_counter()
+        client.get(reverse('palmares_app:login'))
+        mesures[nom] = (time.perf_counter() - debut) * 1000
+mesures['modules_lourds'] = sorted(m for m in ('reportlab', 'openpyxl') if m in sys.modules)
+print(json.dumps(mesures))
+"""
+
+# Imports du démarrage seul, pour ``-X importtime``
+SCRIPT_IMPORTS = """
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure le démarrage d'un worker (imports, configuration, URL) et sa première requête, "
+        "avec et sans le préchargement de gunicorn.conf.py, dans des interpréteurs neufs. "
+        "Écrit les mesures en JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repetitions', type=int, default=5,
+            help="Démarrages mesurés par scénario (défaut: %(default)s)",
+        )
+        parser.add_argument(
+            '--imports', type=int, default=15,
+            help="Nombre de paquets les plus coûteux à l'import à rapporter (défaut: %(default)s)",
+        )
+        parser.add_argument(
+            '--sortie',
+            help="Fichier JSON des mesures (défaut: demarrage_<date>.json)",
+        )
+
+    def handle(self, *args, **options):
+        sortie = options['sortie'] or f"demarrage_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        repetitions = options['repetitions']
+
+        scenarios = []
+        for nom, precharge in (('sans_prechargement', False), ('avec_prechargement', True)):
+            self.stdout.write(f"  {nom}...", ending='')
+            self.stdout.flush()
+            executions = [self.demarrer(precharge) for _ in range(repetitions)]
+            scenario = {'nom': nom, **self.resumer(executions)}
+            scenarios.append(scenario)
+            self.stdout.write(
+                f" démarrage {scenario['demarrage_ms']} ms, première requête {scenario['premiere_requete_ms']} ms"
+            )
+
+        imports = self.imports(options['imports'])
+        self.stdout.write("Paquets les plus coûteux à l'import (ms) :")
+        for entree in imports:
+            self.stdout.write(f"  {entree['module']:<30} {entree['propre_ms']:>8}")
+
+        rapport = {
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'commit': MesurerPerformances.commit(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'repetitions': repetitions,
+            'scenarios': scenarios,
+            'imports': imports,
+        }
+        with open(sortie, 'w', encoding='utf-8') as fichier:
+            json.dump(rapport, fichier, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Mesures écrites dans {sortie}"))
+
+    def executer(self, *arguments):
+        resultat = subprocess.run(
+            [sys.executable, *arguments],
+            capture_output=True, text=True, cwd=settings.BASE_DIR,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'palmares.settings')},
+        )
+        if resultat.returncode:
+            raise CommandError(f"Échec du processus de mesure :\n{resultat.stderr}")
+        return resultat
+
+    def demarrer(self, precharge):
+        sortie = self.executer('-c', SCRIPT_WORKER, '1' if precharge else '0').stdout
+        return json.loads(sortie.strip().splitlines()[-1])
+
+    @staticmethod
+    def resumer(executions):
+        """Médiane de chaque durée sur les démarrages"""
+        resume = {
+            nom: round(statistics.median(execution[nom] for execution in executions), 1)
+            for nom in executions[0] if nom.endswith('_ms')
+        }
+        resume['modules_lourds'] = executions[0]['modules_lourds']
+        return resume
+
+    def imports(self, nombre):
+        """Paquets les plus coûteux, d'après ``python -X importtime`` (temps propre de leurs modules)"""
+        sortie = self.executer('-X', 'importtime', '-c', SCRIPT_IMPORTS).stderr
+        durees = {}
+        for ligne in sortie.splitlines():
+            if not ligne.startswith('import time:') or 'cumulative' in ligne:
+                continue
+            propre, _, module = (partie.strip() for partie in ligne.split(':', 1)[1].split('|'))
+            paquet = module.split('.')[0]
+            durees[paquet] = durees.get(paquet, 0) + int(propre)
+        classement = sorted(durees.items(), key=lambda entree: entree[1], reverse=True)[:nombre]
+        return [{'module': paquet, 'propre_ms': round(duree / 1000, 1)} for paquet, duree in classement]
@@ -0,0 +1,161 @@
+import itertools
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+from datetime import datetime
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from palmares_app.cache_exports import REPERTOIRE
+from palmares_app.donnees_synthetiques import ecrire_xlsx, generer_jeu
+from palmares_app.jobs import creer_job, executer_job
+from palmares_app.mesures import mesurer
+
+from .generer_donnees import ajouter_arguments_echelle, echelle
+
+
+class Annulation(Exception):
+    """Annule la transaction d'une mesure d'import (base remise en l'état)"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure l'import Excel, la liste (chaque combinaison de filtres), la recherche et l'export PDF "
+        "sur un jeu synthétique, dans une base de test jetable. Écrit les mesures en JSON."
+    )
+
+    def add_arguments(self, parser):
+        ajouter_arguments_echelle(parser)
+        parser.add_argument(
+            '--repetitions', type=int, default=3,
+            help="Exécutions chronométrées par scénario (défaut: 3)",
+        )
+        parser.add_argument(
+            '--sortie',
+            help="Fichier JSON des mesures (défaut: benchmark_<date>.json)",
+        )
+
+    def handle(self, *args, **options):
+        sortie = options['sortie'] or f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        dossier = tempfile.mkdtemp(prefix='palmares_benchmark_')
+        try:
+            with override_settings(
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                MEDIA_ROOT=dossier,
+                USE_X_ACCEL_REDIRECT=False,
+                PERF_JOURNAL=os.path.join(dossier, 'requetes_lentes.log'),
+                CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+            ):
+                # Base de test jetable : la base configurée n'est jamais modifiée
+                nom_base = connection.settings_dict['NAME']
+                connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+                try:
+                    scenarios = self.executer(options, dossier)
+                finally:
+                    connection.creation.destroy_test_db(nom_base, verbosity=0)
+        finally:
+            shutil.rmtree(dossier, ignore_errors=True)
+
+        rapport = {
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'commit': self.commit(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'base': connection.vendor,
+            'echelle': echelle(options),
+            'repetitions': options['repetitions'],
+            'scenarios': scenarios,
+        }
+        with open(sortie, 'w', encoding='utf-8') as fichier:
+            json.dump(rapport, fichier, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Mesures écrites dans {sortie}"))
+
+    def executer(self, options, dossier):
+        repetitions = options['repetitions']
+        jeu = generer_jeu(**echelle(options))
+        lignes = [ligne for lignes_annee in jeu.values() for ligne in lignes_annee]
+        chemin_xlsx = os.path.join(dossier, 'resultats.xlsx')
+        ecrire_xlsx(lignes, chemin_xlsx)
+        self.stdout.write(f"Jeu synthétique : {len(lignes)} résultats")
+
+        scenarios = []
+
+        def ajouter(nom, operation, preparer=None):
+            self.stdout.write(f"  {nom}...", ending='')
+            self.stdout.flush()
+            mesure = {'nom': nom, **mesurer(operation, repetitions, preparer)}
+            scenarios.append(mesure)
+            self.stdout.write(f" {mesure['temps_median_s']} s, {mesure['requetes']} requêtes")
+
+        def importer():
+            with open(chemin_xlsx, 'rb') as fichier:
+                job = executer_job(creer_job(File(fichier, name='resultats.xlsx')))
+            assert job.nb_erreurs == 0, job.message
+
+        def importer_puis_annuler():
+            try:
+                with transaction.atomic():
+                    importer()
+                    raise Annulation
+            except Annulation:
+                pass
+
+        ajouter('import_xlsx', importer_puis_annuler)
+        importer()
+        ajouter('reimport_xlsx_identique', importer_puis_annuler)
+
+        utilisateur = User.objects.create_superuser('benchmark', 'benchmark@example.com', None)
+        client = Client()
+        client.force_login(utilisateur)
+
+        def page(url, params):
+            def operation():
+                response = client.get(url, params)
+                assert response.status_code == 200, (url, params, response.status_code)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            return operation
+
+        premiere = lignes[0]
+        valeurs = {'classe': premiere.classe, 'section': premiere.section, 'annee': premiere.annee_scolaire}
+        home = reverse('palmares_app:home')
+        for taille in range(len(valeurs) + 1):
+            for noms in itertools.combinations(valeurs, taille):
+                params = {nom: valeurs[nom] for nom in noms}
+                ajouter(f"home[{'+'.join(noms) or 'sans filtre'}]", page(home, params))
+        ajouter('home[pages, page 10]', page(home, {'pagination': 'pages', 'page': 10}))
+
+        nom_famille = premiere.nom_complet.split()[0]
+        ajouter(f"recherche[{nom_famille}]", page(home, {'q': nom_famille}))
+        ajouter(f"recherche[{premiere.nom_complet}]", page(home, {'q': premiere.nom_complet}))
+
+        def vider_cache_exports():
+            shutil.rmtree(os.path.join(dossier, REPERTOIRE), ignore_errors=True)
+
+        export = reverse('palmares_app:export_pdf')
+        ajouter('export_pdf[annee]', page(export, {'annee': valeurs['annee']}), vider_cache_exports)
+        ajouter('export_pdf[sans filtre]', page(export, {}), vider_cache_exports)
+        ajouter('export_pdf[cache]', page(export, {'annee': valeurs['annee']}))
+
+        return scenarios
+
+    @staticmethod
+    def commit():
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                capture_output=True, text=True, check=True, cwd=settings.BASE_DIR,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from palmares_app.journaux import indexer_anciens, purger
+
+
+class Command(BaseCommand):
+    help = (
+        "Supprime les logs d'erreurs d'import trop anciens, puis les plus anciens au-delà de la taille "
+        "maximale (rétention des réglages par défaut)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--jours', type=int, default=settings.IMPORT_LOGS_RETENTION_JOURS,
+            help="Âge maximal des logs en jours, 0 pour ne pas limiter (défaut: %(default)s)",
+        )
+        parser.add_argument(
+            '--taille-max', type=int, default=settings.IMPORT_LOGS_TAILLE_MAX,
+            help="Taille totale maximale des logs en octets, 0 pour ne pas limiter (défaut: %(default)s)",
+        )
+        parser.add_argument(
+            '--indexer-anciens', action='store_true',
+            help="Compresse et enregistre d'abord les CSV non indexés laissés dans media/import_errors",
+        )
+
+    def handle(self, *args, **options):
+        if options['indexer_anciens']:
+            indexes = indexer_anciens()
+            self.stdout.write(f"{indexes} ancien(s) log(s) indexé(s)")
+        supprimes = purger(jours=options['jours'], taille_max=options['taille_max'])
+        self.stdout.write(self.style.SUCCESS(f"{supprimes} log(s) supprimé(s)"))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from palmares_app.classements import recalculer_tous_les_rangs
+from palmares_app.statistiques import reconstruire
+from palmares_app.versions import incrementer_version
+
+
+class Command(BaseCommand):
+    help = "Reconstruit entièrement les statistiques et les rangs par année, classe et section"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total = reconstruire()
+            rangs = recalculer_tous_les_rangs()
+            incrementer_version()
+        self.stdout.write(self.style.SUCCESS(f"{total} groupes recalculés, {rangs} rangs modifiés"))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from palmares_app.models import Resultat
+from palmares_app.recherche import reindexer
+
+
+class Command(BaseCommand):
+    help = "Recalcule la colonne de recherche de tous les résultats"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--manquants',
+            action='store_true',
+            help="Ne traite que les résultats dont la colonne de recherche est vide",
+        )
+
+    def handle(self, *args, **options):
+        resultats = Resultat.objects.all()
+        if options['manquants']:
+            resultats = resultats.filter(recherche='')
+        total = reindexer(resultats)
+        self.stdout.write(self.style.SUCCESS(f"{total} résultats réindexés"))
@@ -0,0 +1,118 @@
+import json
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.test.utils import override_settings
+
+from palmares_app.charge import MIX_DEFAUT, demarrer_gunicorn, demarrer_serveur_interne, lancer, lire_mix
+
+
+class Command(BaseCommand):
+    help = (
+        "Essai de charge : utilisateurs simultanés (connexion, liste filtrée, recherche, export PDF) "
+        "pendant un import de corrections. À lancer sur une base de test remplie "
+        "(voir generer_donnees) : l'import et l'utilisateur de test y sont écrits."
+    )
+
+    def add_arguments(self, parser):
+        serveur = parser.add_mutually_exclusive_group()
+        serveur.add_argument(
+            '--gunicorn', type=int, metavar='WORKERS',
+            help="Lance palmares.wsgi:application sous gunicorn avec ce nombre de workers",
+        )
+        serveur.add_argument(
+            '--url',
+            help="Vise un serveur déjà démarré (ex: http://127.0.0.1:8000) au lieu du serveur interne",
+        )
+        parser.add_argument('--utilisateurs', type=int, default=20, help="Utilisateurs simultanés (défaut: 20)")
+        parser.add_argument('--duree', type=float, default=30, help="Durée de l'essai en secondes (défaut: 30)")
+        parser.add_argument(
+            '--mix',
+            default=','.join(f"{nom}={poids}" for nom, poids in MIX_DEFAUT.items()),
+            help="Poids des actions (défaut: %(default)s)",
+        )
+        parser.add_argument(
+            '--pause', type=float, default=0.0,
+            help="Temps de réflexion moyen entre deux requêtes, en secondes (défaut: 0)",
+        )
+        parser.add_argument('--sans-import', action='store_true', help="Pas d'import pendant l'essai")
+        parser.add_argument(
+            '--delai-import', type=float, default=5.0,
+            help="Secondes avant le lancement de l'import (défaut: 5)",
+        )
+        parser.add_argument(
+            '--fichier-import',
+            help="Fichier à importer (défaut: corrections générées sur l'année la plus récente)",
+        )
+        parser.add_argument('--utilisateur', default='charge', help="Compte utilisé (créé au besoin)")
+        parser.add_argument('--mot-de-passe', default='charge', help="Mot de passe du compte")
+        parser.add_argument('--graine', type=int, default=0, help="Graine des tirages aléatoires")
+        parser.add_argument('--sortie', help="Écrit aussi le rapport en JSON dans ce fichier")
+
+    def handle(self, *args, **options):
+        try:
+            mix = lire_mix(options['mix'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        utilisateur, cree = User.objects.get_or_create(username=options['utilisateur'])
+        if cree or not utilisateur.check_password(options['mot_de_passe']):
+            utilisateur.set_password(options['mot_de_passe'])
+            utilisateur.save()
+
+        parametres = {
+            'identifiants': (options['utilisateur'], options['mot_de_passe']),
+            'utilisateurs': options['utilisateurs'],
+            'duree': options['duree'],
+            'mix': mix,
+            'pause': options['pause'],
+            'avec_import': not options['sans_import'],
+            'delai_import': options['delai_import'],
+            'fichier_import': options['fichier_import'],
+            'graine': options['graine'],
+        }
+
+        if options['url']:
+            rapport = lancer(options['url'], **parametres)
+            serveur = options['url']
+        elif options['gunicorn']:
+            url, arreter = demarrer_gunicorn(options['gunicorn'])
+            try:
+                rapport = lancer(url, **parametres)
+            finally:
+                arreter()
+            serveur = f"gunicorn ({options['gunicorn']} workers)"
+        else:
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, '127.0.0.1']):
+                url, arreter = demarrer_serveur_interne(get_wsgi_application())
+                try:
+                    rapport = lancer(url, **parametres)
+                finally:
+                    arreter()
+            serveur = "wsgiref multi-thread (dans le processus)"
+
+        rapport['serveur'] = serveur
+        rapport['utilisateurs'] = options['utilisateurs']
+        self.afficher(rapport)
+        if options['sortie']:
+            with open(options['sortie'], 'w', encoding='utf-8') as fichier:
+                json.dump(rapport, fichier, ensure_ascii=False, indent=2)
+            self.stdout.write(f"Rapport écrit dans {options['sortie']}")
+
+    def afficher(self, rapport):
+        self.stdout.write(
+            f"{rapport['serveur']}, {rapport['utilisateurs']} utilisateurs, {rapport['duree_s']} s : "
+            f"{rapport['requetes']} requêtes, {rapport['debit_rps']} req/s"
+        )
+        self.stdout.write(f"{'Point':<12}{'Requêtes':>10}{'Erreurs':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>9}")
+        for point, mesure in rapport['points'].items():
+            self.stdout.write(
+                f"{point:<12}{mesure['requetes']:>10}{mesure['erreurs']:>9}{mesure['p50_ms']:>10}"
+                f"{mesure['p95_ms']:>10}{mesure['p99_ms']:>10}{mesure['debit_rps']:>9}"
+            )
+            for exemple in mesure['exemples_erreurs']:
+                self.stdout.write(self.style.WARNING(f"    {exemple}"))
+        if rapport['import']:
+            self.stdout.write(f"Import : {rapport['import']}")
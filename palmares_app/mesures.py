@@ -0,0 +1,49 @@
+"""Mesure d'une opération : temps, nombre de requêtes SQL et pic mémoire.
+
+Le pic mémoire est relevé avec ``tracemalloc``, qui ralentit fortement
+l'exécution : il est mesuré lors d'une passe séparée, non chronométrée, qui
+compte aussi les requêtes. Les passes chronométrées suivent, sans
+instrumentation.
+"""
+import statistics
+import time
+import tracemalloc
+
+from django.db import connection, reset_queries
+from django.test.utils import CaptureQueriesContext
+
+
+def mesurer(operation, repetitions=3, preparer=None):
+    """Exécute ``operation`` ``1 + repetitions`` fois et retourne ses mesures.
+
+    ``preparer``, s'il est fourni, est appelé avant chaque exécution sans être
+    chronométré (remise à zéro d'un cache, par exemple).
+    """
+    if preparer:
+        preparer()
+    # Une requête HTTP simulée vide le journal des requêtes en démarrant :
+    # il doit être vide au départ pour que le décompte reste juste
+    reset_queries()
+    tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as requetes:
+            operation()
+        _, pic = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    temps = []
+    for _ in range(repetitions):
+        if preparer:
+            preparer()
+        debut = time.perf_counter()
+        operation()
+        temps.append(time.perf_counter() - debut)
+
+    return {
+        'temps_median_s': round(statistics.median(temps), 6) if temps else None,
+        'temps_min_s': round(min(temps), 6) if temps else None,
+        'temps_s': [round(t, 6) for t in temps],
+        'requetes': len(requetes),
+        'memoire_pic_octets': pic,
+    }
@@ -0,0 +1,189 @@
+# Generated by Django 5.2.5 on 2026-10-17 22:21
+
+import django.db.models.deletion
+import django.utils.timezone
+import palmares_app.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnneeScolaire',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('annee', models.CharField(help_text='Format: 2023-2024', max_length=9, unique=True, verbose_name='Année scolaire')),
+            ],
+            options={
+                'verbose_name': 'Année scolaire',
+                'verbose_name_plural': 'Années scolaires',
+                'ordering': ['-annee'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Classe',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nom', models.CharField(help_text='Nom de la classe (ex: 6ème A, Terminale S)', max_length=100, unique=True, verbose_name='Classe')),
+            ],
+            options={
+                'verbose_name': 'Classe',
+                'verbose_name_plural': 'Classes',
+                'ordering': ['nom'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Eleve',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nom_complet', models.CharField(db_index=True, help_text="Nom et prénom complet de l'élève", max_length=255, unique=True, verbose_name='Nom complet')),
+                ('version_historique', models.PositiveIntegerField(default=0, editable=False, help_text="Incrémentée à chaque écriture qui change l'historique de l'élève (clé de son cache)", verbose_name="Version de l'historique")),
+            ],
+            options={
+                'verbose_name': 'Élève',
+                'verbose_name_plural': 'Élèves',
+                'ordering': ['nom_complet'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Section',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nom', models.CharField(help_text='Nom de la section (ex: Scientifique, Littéraire, Economique)', max_length=100, unique=True, verbose_name='Section')),
+            ],
+            options={
+                'verbose_name': 'Section',
+                'verbose_name_plural': 'Sections',
+                'ordering': ['nom'],
+            },
+        ),
+        migrations.CreateModel(
+            name='VersionDonnees',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nom', models.CharField(max_length=50, unique=True, verbose_name='Nom')),
+                ('version', models.PositiveBigIntegerField(default=0, verbose_name='Version')),
+                ('date_modification', models.DateTimeField(auto_now=True, verbose_name='Date de modification')),
+            ],
+            options={
+                'verbose_name': 'Version des données',
+                'verbose_name_plural': 'Versions des données',
+            },
+        ),
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fichier', models.FileField(upload_to='imports/%Y/%m/', verbose_name='Fichier')),
+                ('nom_fichier', models.CharField(max_length=255, verbose_name='Nom du fichier')),
+                ('statut', models.CharField(choices=[('en_attente', 'En attente'), ('en_cours', 'En cours'), ('termine', 'Terminé'), ('echoue', 'Échoué')], db_index=True, default='en_attente', max_length=20, verbose_name='Statut')),
+                ('date_creation', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+                ('date_debut', models.DateTimeField(blank=True, null=True, verbose_name='Début')),
+                ('date_fin', models.DateTimeField(blank=True, null=True, verbose_name='Fin')),
+                ('date_maj', models.DateTimeField(auto_now=True, verbose_name='Dernière activité')),
+                ('lignes_traitees', models.PositiveIntegerField(default=0, verbose_name='Lignes traitées')),
+                ('nb_importes', models.PositiveIntegerField(default=0, verbose_name='Résultats importés')),
+                ('nb_mis_a_jour', models.PositiveIntegerField(default=0, verbose_name='Résultats mis à jour')),
+                ('nb_inchanges', models.PositiveIntegerField(default=0, verbose_name='Résultats inchangés')),
+                ('nb_erreurs', models.PositiveIntegerField(default=0, verbose_name='Erreurs')),
+                ('fichier_erreurs', models.CharField(blank=True, max_length=255, verbose_name='Fichier de log des erreurs')),
+                ('message', models.TextField(blank=True, verbose_name='Message')),
+                ('profiler', models.BooleanField(default=False, verbose_name='Profilage cProfile')),
+                ('cree_par', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='import_jobs', to=settings.AUTH_USER_MODEL, verbose_name='Créé par')),
+            ],
+            options={
+                'verbose_name': 'Import',
+                'verbose_name_plural': 'Imports',
+                'ordering': ['-date_creation'],
+            },
+        ),
+        migrations.CreateModel(
+            name='JournalErreurs',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nom_fichier', models.CharField(max_length=255, unique=True, verbose_name='Nom du fichier')),
+                ('nom_import', models.CharField(blank=True, max_length=255, verbose_name='Fichier importé')),
+                ('chemin', models.CharField(max_length=255, verbose_name='Chemin (relatif à MEDIA_ROOT)')),
+                ('date_creation', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Date')),
+                ('nb_lignes', models.PositiveIntegerField(default=0, verbose_name='Lignes traitées')),
+                ('nb_erreurs', models.PositiveIntegerField(default=0, verbose_name='Erreurs')),
+                ('taille_octets', models.PositiveBigIntegerField(default=0, verbose_name='Taille (octets, compressé)')),
+                ('job', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='journaux_erreurs', to='palmares_app.importjob', verbose_name='Import')),
+            ],
+            options={
+                'verbose_name': "Log d'erreurs d'import",
+                'verbose_name_plural': "Logs d'erreurs d'import",
+                'ordering': ['-date_creation'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MetriquesImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_creation', models.DateTimeField(auto_now_add=True, verbose_name='Date')),
+                ('lignes', models.PositiveIntegerField(default=0, verbose_name='Lignes traitées')),
+                ('duree_totale', models.FloatField(default=0, verbose_name='Durée totale (s)')),
+                ('lignes_par_seconde', models.FloatField(default=0, verbose_name='Lignes par seconde')),
+                ('nb_requetes', models.PositiveIntegerField(default=0, verbose_name='Requêtes SQL')),
+                ('memoire_pic_octets', models.PositiveBigIntegerField(default=0, help_text="Hausse de la mémoire résidente du worker au plus fort de l'import, par rapport à son début", verbose_name='Pic mémoire (octets)')),
+                ('phases', models.JSONField(default=dict, verbose_name='Phases')),
+                ('fichier_profil', models.CharField(blank=True, max_length=255, verbose_name='Profil cProfile')),
+                ('job', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='metriques', to='palmares_app.importjob', verbose_name='Import')),
+            ],
+            options={
+                'verbose_name': "Mesures d'import",
+                'verbose_name_plural': "Mesures d'import",
+                'ordering': ['-date_creation'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Resultat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pourcentage', models.DecimalField(blank=True, decimal_places=2, help_text='Pourcentage obtenu', max_digits=5, null=True, verbose_name='Pourcentage')),
+                ('date_import', models.DateTimeField(auto_now_add=True, verbose_name="Date d'import")),
+                ('empreinte', models.CharField(blank=True, editable=False, help_text="Empreinte des champs importés, pour ignorer les lignes inchangées lors d'un ré-import", max_length=40, verbose_name='Empreinte')),
+                ('recherche', models.TextField(blank=True, default='', editable=False, help_text='Nom, classe, section et année sans accents, indexés pour la recherche', verbose_name='Texte de recherche')),
+                ('rang_classe', models.PositiveIntegerField(blank=True, editable=False, help_text="Rang dans la classe et la section pour l'année, ex æquo compris", null=True, verbose_name='Rang (classe)')),
+                ('rang_annee', models.PositiveIntegerField(blank=True, editable=False, help_text="Rang parmi tous les résultats de l'année scolaire", null=True, verbose_name='Rang (année)')),
+                ('annee_scolaire', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='resultats', to='palmares_app.anneescolaire', verbose_name='Année scolaire')),
+                ('classe', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='resultats', to='palmares_app.classe', verbose_name='Classe')),
+                ('eleve', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='resultats', to='palmares_app.eleve', verbose_name='Élève')),
+                ('section', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='resultats', to='palmares_app.section', verbose_name='Section')),
+            ],
+            options={
+                'verbose_name': 'Résultat',
+                'verbose_name_plural': 'Résultats',
+                'ordering': [models.OrderBy(models.F('pourcentage'), descending=True, nulls_last=True), 'eleve__nom_complet'],
+                'indexes': [palmares_app.models.IndexPalmares(models.OrderBy(models.F('pourcentage'), descending=True, nulls_last=True), name='resultat_pourcentage_idx'), palmares_app.models.IndexPalmares(models.F('annee_scolaire'), models.F('classe'), models.OrderBy(models.F('pourcentage'), descending=True, nulls_last=True), name='resultat_annee_classe_pct_idx'), palmares_app.models.IndexPalmares(models.F('annee_scolaire'), models.OrderBy(models.F('pourcentage'), descending=True, nulls_last=True), name='resultat_annee_pct_idx'), palmares_app.models.IndexPalmares(models.F('classe'), models.OrderBy(models.F('pourcentage'), descending=True, nulls_last=True), name='resultat_classe_pct_idx')],
+                'unique_together': {('eleve', 'annee_scolaire')},
+            },
+        ),
+        migrations.CreateModel(
+            name='StatistiqueGroupe',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.PositiveIntegerField(default=0, verbose_name='Nombre de résultats')),
+                ('nombre_notes', models.PositiveIntegerField(default=0, verbose_name='Nombre de pourcentages renseignés')),
+                ('somme_pourcentage', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Somme des pourcentages')),
+                ('pourcentage_min', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True, verbose_name='Pourcentage minimum')),
+                ('pourcentage_max', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True, verbose_name='Pourcentage maximum')),
+                ('annee_scolaire', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='statistiques', to='palmares_app.anneescolaire', verbose_name='Année scolaire')),
+                ('classe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='statistiques', to='palmares_app.classe', verbose_name='Classe')),
+                ('section', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='statistiques', to='palmares_app.section', verbose_name='Section')),
+            ],
+            options={
+                'verbose_name': 'Statistique par groupe',
+                'verbose_name_plural': 'Statistiques par groupe',
+                'unique_together': {('annee_scolaire', 'classe', 'section')},
+            },
+        ),
+    ]
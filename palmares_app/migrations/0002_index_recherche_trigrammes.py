@@ -0,0 +1,40 @@
+"""Index GIN ``pg_trgm`` de la colonne ``recherche`` (PostgreSQL uniquement).
+
+Sur les autres bases (SQLite en développement et en test), la recherche reste
+un ``LIKE`` sur la même colonne, sans index : l'opération n'y fait rien.
+"""
+from django.db import migrations
+
+
+class RunSQLPostgreSQL(migrations.RunSQL):
+    """``RunSQL`` exécuté seulement quand la base est PostgreSQL"""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('palmares_app', '0001_initial'),
+    ]
+
+    operations = [
+        RunSQLPostgreSQL(
+            sql="CREATE EXTENSION IF NOT EXISTS pg_trgm",
+            # L'extension peut servir ailleurs : elle n'est pas supprimée
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        RunSQLPostgreSQL(
+            sql=(
+                "CREATE INDEX IF NOT EXISTS palmares_resultat_recherche_trgm "
+                "ON palmares_app_resultat USING gin (recherche gin_trgm_ops)"
+            ),
+            reverse_sql="DROP INDEX IF EXISTS palmares_resultat_recherche_trgm",
+        ),
+    ]
@@ -0,0 +1,25 @@
+"""Texte de recherche des résultats importés avant la colonne ``recherche``.
+
+Ces résultats ont une colonne vide : sans ce remplissage, la recherche ne les
+trouverait pas avant un ``manage.py reindexer_recherche`` manuel. Les rangs et
+les statistiques sont, eux, rattrapés après ``migrate`` (signaux post_migrate).
+"""
+from django.db import migrations
+
+from palmares_app.recherche import reindexer
+
+
+def remplir_recherche(apps, schema_editor):
+    Resultat = apps.get_model('palmares_app', 'Resultat')
+    reindexer(Resultat.objects.using(schema_editor.connection.alias).filter(recherche=''))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('palmares_app', '0002_index_recherche_trigrammes'),
+    ]
+
+    operations = [
+        migrations.RunPython(remplir_recherche, migrations.RunPython.noop),
+    ]
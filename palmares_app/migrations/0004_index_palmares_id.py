@@ -0,0 +1,46 @@
+# Generated by Django 5.2.5 on 2026-10-17 22:26
+
+import palmares_app.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('palmares_app', '0003_remplir_recherche'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='resultat',
+            name='resultat_pourcentage_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='resultat',
+            name='resultat_annee_classe_pct_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='resultat',
+            name='resultat_annee_pct_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='resultat',
+            name='resultat_classe_pct_idx',
+        ),
+        migrations.AddIndex(
+            model_name='resultat',
+            index=palmares_app.models.IndexPalmares(models.OrderBy(models.F('pourcentage'), descending=True, nulls_last=True), models.F('id'), name='resultat_pourcentage_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resultat',
+            index=palmares_app.models.IndexPalmares(models.F('annee_scolaire'), models.F('classe'), models.OrderBy(models.F('pourcentage'), descending=True, nulls_last=True), models.F('id'), name='resultat_annee_classe_pct_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resultat',
+            index=palmares_app.models.IndexPalmares(models.F('annee_scolaire'), models.OrderBy(models.F('pourcentage'), descending=True, nulls_last=True), models.F('id'), name='resultat_annee_pct_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resultat',
+            index=palmares_app.models.IndexPalmares(models.F('classe'), models.OrderBy(models.F('pourcentage'), descending=True, nulls_last=True), models.F('id'), name='resultat_classe_pct_idx'),
+        ),
+    ]
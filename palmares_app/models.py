@@ -1,4 +1,39 @@
+import hashlib
+from decimal import ROUND_HALF_EVEN, Decimal
+
+from django.conf import settings
 from django.db import models
+from django.db.models import F, OrderBy
+from django.urls import reverse
+from django.utils import timezone
+
+from .recherche import texte_recherche
+
+
+# Ordre du palmarès : pourcentage décroissant, élèves sans note en dernier
+PALMARES = F('pourcentage').desc(nulls_last=True)
+
+
+class IndexPalmares(models.Index):
+    """Index dont les colonnes ``F(...).desc(nulls_last=True)`` suivent l'ordre du palmarès.
+
+    SQLite refuse ``NULLS LAST`` dans un index, mais y place déjà les NULL en
+    dernier dans un tri décroissant : le modificateur n'y est pas écrit.
+    """
+
+    def create_sql(self, model, schema_editor, using='', **kwargs):
+        if schema_editor.connection.vendor == 'sqlite':
+            index = self.clone()
+            index.expressions = tuple(_sans_nulls(expression) for expression in self.expressions)
+            return super(IndexPalmares, index).create_sql(model, schema_editor, using=using, **kwargs)
+        return super().create_sql(model, schema_editor, using=using, **kwargs)
+
+
+def _sans_nulls(expression):
+    if isinstance(expression, OrderBy) and (expression.nulls_first or expression.nulls_last):
+        expression = expression.copy()
+        expression.nulls_first = expression.nulls_last = None
+    return expression
 
 
 class AnneeScolaire(models.Model):
@@ -64,6 +99,12 @@ class Eleve(models.Model):
         help_text="Nom et prénom complet de l'élève",
         db_index=True
     )
+    version_historique = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Version de l'historique",
+        help_text="Incrémentée à chaque écriture qui change l'historique de l'élève (clé de son cache)"
+    )
 
     class Meta:
         verbose_name = "Élève"
@@ -73,6 +114,19 @@ class Eleve(models.Model):
     def __str__(self):
         return self.nom_complet
 
+    def get_absolute_url(self):
+        return reverse('palmares_app:historique_eleve', args=[self.pk])
+
+    def save(self, *args, **kwargs):
+        # La version n'avance que par UPDATE (historiques.invalider) : une instance lue
+        # plus tôt ne doit pas la ramener à une valeur dont l'historique est encore en cache
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                champ.attname for champ in self._meta.concrete_fields
+                if not champ.primary_key and champ.attname != 'version_historique'
+            ]
+        super().save(*args, **kwargs)
+
 
 class Resultat(models.Model):
     """Modèle pour les résultats des élèves"""
@@ -80,18 +134,21 @@ class Resultat(models.Model):
         Eleve,
         on_delete=models.CASCADE,
         verbose_name="Élève",
+        db_index=False,
         related_name='resultats'
     )
     annee_scolaire = models.ForeignKey(
         AnneeScolaire,
         on_delete=models.PROTECT,
         verbose_name="Année scolaire",
+        db_index=False,
         related_name='resultats'
     )
     classe = models.ForeignKey(
         Classe,
         on_delete=models.PROTECT,
         verbose_name="Classe",
+        db_index=False,
         related_name='resultats'
     )
     section = models.ForeignKey(
@@ -112,12 +169,346 @@ class Resultat(models.Model):
         auto_now_add=True,
         verbose_name="Date d'import"
     )
+    empreinte = models.CharField(
+        max_length=40,
+        blank=True,
+        editable=False,
+        verbose_name="Empreinte",
+        help_text="Empreinte des champs importés, pour ignorer les lignes inchangées lors d'un ré-import"
+    )
+    recherche = models.TextField(
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name="Texte de recherche",
+        help_text="Nom, classe, section et année sans accents, indexés pour la recherche"
+    )
+    rang_classe = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="Rang (classe)",
+        help_text="Rang dans la classe et la section pour l'année, ex æquo compris"
+    )
+    rang_annee = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="Rang (année)",
+        help_text="Rang parmi tous les résultats de l'année scolaire"
+    )
 
     class Meta:
         verbose_name = "Résultat"
         verbose_name_plural = "Résultats"
-        ordering = ['-pourcentage', 'eleve__nom_complet']
+        ordering = [PALMARES, 'eleve__nom_complet']
         unique_together = ['eleve', 'annee_scolaire']
+        # Index taillés pour les listes et exports : filtres année/classe/section
+        # puis tri par pourcentage, et id pour la pagination par curseur (voir
+        # pagination.ORDRE). Les index simples des clés étrangères eleve,
+        # annee_scolaire et classe seraient des préfixes de ceux-ci (ou de
+        # unique_together) et sont désactivés.
+        indexes = [
+            IndexPalmares(PALMARES, 'id', name='resultat_pourcentage_idx'),
+            IndexPalmares('annee_scolaire', 'classe', PALMARES, 'id', name='resultat_annee_classe_pct_idx'),
+            IndexPalmares('annee_scolaire', PALMARES, 'id', name='resultat_annee_pct_idx'),
+            IndexPalmares('classe', PALMARES, 'id', name='resultat_classe_pct_idx'),
+        ]
 
     def __str__(self):
         return f"{self.eleve.nom_complet} - {self.pourcentage}% - {self.classe.nom}"
+
+    def save(self, *args, **kwargs):
+        self.empreinte = self.calculer_empreinte()
+        self.recherche = self.calculer_recherche()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'empreinte', 'recherche'}
+        super().save(*args, **kwargs)
+
+    def calculer_recherche(self):
+        """Texte normalisé indexé pour la recherche"""
+        return texte_recherche(
+            self.eleve.nom_complet, self.classe.nom, self.section.nom, self.annee_scolaire.annee
+        )
+
+    @property
+    def groupe(self):
+        """Clé ``(annee_id, classe_id, section_id)`` du groupe statistique du résultat"""
+        return (self.annee_scolaire_id, self.classe_id, self.section_id)
+
+    def calculer_empreinte(self):
+        """Empreinte des champs importés (classe, section, pourcentage)"""
+        return empreinte_resultat(self.classe_id, self.section_id, self.pourcentage)
+
+
+def arrondir_pourcentage(valeur):
+    """Pourcentage tel qu'il est enregistré : Decimal à deux décimales, arrondi au pair
+    comme ``Resultat.pourcentage`` (85.555 -> 85.56, 85.545 -> 85.54)"""
+    if valeur is None:
+        return None
+    return Decimal(str(valeur)).quantize(Decimal('0.01'), rounding=ROUND_HALF_EVEN)
+
+
+def empreinte_resultat(classe_id, section_id, pourcentage):
+    """Empreinte SHA-1 des champs importés d'un résultat"""
+    pourcentage = arrondir_pourcentage(pourcentage)
+    contenu = f"{classe_id}|{section_id}|{pourcentage}"
+    return hashlib.sha1(contenu.encode()).hexdigest()
+
+
+class ImportJob(models.Model):
+    """Modèle pour les imports exécutés en arrière-plan par le worker"""
+    EN_ATTENTE = 'en_attente'
+    EN_COURS = 'en_cours'
+    TERMINE = 'termine'
+    ECHOUE = 'echoue'
+    STATUTS = [
+        (EN_ATTENTE, 'En attente'),
+        (EN_COURS, 'En cours'),
+        (TERMINE, 'Terminé'),
+        (ECHOUE, 'Échoué'),
+    ]
+
+    fichier = models.FileField(
+        upload_to='imports/%Y/%m/',
+        verbose_name="Fichier"
+    )
+    nom_fichier = models.CharField(
+        max_length=255,
+        verbose_name="Nom du fichier"
+    )
+    statut = models.CharField(
+        max_length=20,
+        choices=STATUTS,
+        default=EN_ATTENTE,
+        verbose_name="Statut",
+        db_index=True
+    )
+    cree_par = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name="Créé par",
+        related_name='import_jobs'
+    )
+    date_creation = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Date de création"
+    )
+    date_debut = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Début"
+    )
+    date_fin = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Fin"
+    )
+    date_maj = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Dernière activité"
+    )
+    lignes_traitees = models.PositiveIntegerField(default=0, verbose_name="Lignes traitées")
+    nb_importes = models.PositiveIntegerField(default=0, verbose_name="Résultats importés")
+    nb_mis_a_jour = models.PositiveIntegerField(default=0, verbose_name="Résultats mis à jour")
+    nb_inchanges = models.PositiveIntegerField(default=0, verbose_name="Résultats inchangés")
+    nb_erreurs = models.PositiveIntegerField(default=0, verbose_name="Erreurs")
+    fichier_erreurs = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name="Fichier de log des erreurs"
+    )
+    message = models.TextField(
+        blank=True,
+        verbose_name="Message"
+    )
+    profiler = models.BooleanField(
+        default=False,
+        verbose_name="Profilage cProfile"
+    )
+
+    class Meta:
+        verbose_name = "Import"
+        verbose_name_plural = "Imports"
+        ordering = ['-date_creation']
+
+    def __str__(self):
+        return f"{self.nom_fichier} ({self.get_statut_display()})"
+
+    @property
+    def termine(self):
+        return self.statut in (self.TERMINE, self.ECHOUE)
+
+    @property
+    def lignes_par_seconde(self):
+        """Débit moyen depuis le début du traitement"""
+        if not self.date_debut:
+            return 0.0
+        fin = self.date_fin or timezone.now()
+        duree = (fin - self.date_debut).total_seconds()
+        return round(self.lignes_traitees / duree, 1) if duree > 0 else 0.0
+
+
+class JournalErreurs(models.Model):
+    """Log des erreurs d'un import : CSV compressé en gzip sous MEDIA_ROOT, voir journaux.py"""
+    job = models.ForeignKey(
+        ImportJob,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='journaux_erreurs',
+        verbose_name="Import"
+    )
+    nom_fichier = models.CharField(
+        max_length=255,
+        unique=True,
+        verbose_name="Nom du fichier"
+    )
+    nom_import = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name="Fichier importé"
+    )
+    chemin = models.CharField(
+        max_length=255,
+        verbose_name="Chemin (relatif à MEDIA_ROOT)"
+    )
+    date_creation = models.DateTimeField(
+        default=timezone.now,
+        db_index=True,
+        verbose_name="Date"
+    )
+    nb_lignes = models.PositiveIntegerField(default=0, verbose_name="Lignes traitées")
+    nb_erreurs = models.PositiveIntegerField(default=0, verbose_name="Erreurs")
+    taille_octets = models.PositiveBigIntegerField(default=0, verbose_name="Taille (octets, compressé)")
+
+    class Meta:
+        verbose_name = "Log d'erreurs d'import"
+        verbose_name_plural = "Logs d'erreurs d'import"
+        ordering = ['-date_creation']
+
+    def __str__(self):
+        return self.nom_fichier
+
+
+class MetriquesImport(models.Model):
+    """Mesures d'exécution d'un import, par phase (suivi des performances dans le temps)"""
+    job = models.OneToOneField(
+        ImportJob,
+        on_delete=models.CASCADE,
+        related_name='metriques',
+        verbose_name="Import"
+    )
+    date_creation = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Date"
+    )
+    lignes = models.PositiveIntegerField(default=0, verbose_name="Lignes traitées")
+    duree_totale = models.FloatField(default=0, verbose_name="Durée totale (s)")
+    lignes_par_seconde = models.FloatField(default=0, verbose_name="Lignes par seconde")
+    nb_requetes = models.PositiveIntegerField(default=0, verbose_name="Requêtes SQL")
+    memoire_pic_octets = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name="Pic mémoire (octets)",
+        help_text="Hausse de la mémoire résidente du worker au plus fort de l'import, par rapport à son début"
+    )
+    # {phase: {"duree_s": float, "requetes": int}}, voir profilage.PHASES
+    phases = models.JSONField(default=dict, verbose_name="Phases")
+    fichier_profil = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name="Profil cProfile"
+    )
+
+    class Meta:
+        verbose_name = "Mesures d'import"
+        verbose_name_plural = "Mesures d'import"
+        ordering = ['-date_creation']
+
+    def __str__(self):
+        return f"{self.job.nom_fichier} : {self.duree_totale:.1f} s"
+
+
+class VersionDonnees(models.Model):
+    """Compteur incrémenté à chaque modification d'un jeu de données (invalide les caches)"""
+    nom = models.CharField(
+        max_length=50,
+        unique=True,
+        verbose_name="Nom"
+    )
+    version = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name="Version"
+    )
+    date_modification = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Date de modification"
+    )
+
+    class Meta:
+        verbose_name = "Version des données"
+        verbose_name_plural = "Versions des données"
+
+    def __str__(self):
+        return f"{self.nom} v{self.version}"
+
+
+class StatistiqueGroupe(models.Model):
+    """Effectifs et pourcentages agrégés par année, classe et section (tenus à jour à l'écriture)"""
+    annee_scolaire = models.ForeignKey(
+        AnneeScolaire,
+        on_delete=models.CASCADE,
+        verbose_name="Année scolaire",
+        related_name='statistiques'
+    )
+    classe = models.ForeignKey(
+        Classe,
+        on_delete=models.CASCADE,
+        verbose_name="Classe",
+        related_name='statistiques'
+    )
+    section = models.ForeignKey(
+        Section,
+        on_delete=models.CASCADE,
+        verbose_name="Section",
+        related_name='statistiques'
+    )
+    nombre = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Nombre de résultats"
+    )
+    nombre_notes = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Nombre de pourcentages renseignés"
+    )
+    somme_pourcentage = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        verbose_name="Somme des pourcentages"
+    )
+    pourcentage_min = models.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        verbose_name="Pourcentage minimum"
+    )
+    pourcentage_max = models.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        verbose_name="Pourcentage maximum"
+    )
+
+    class Meta:
+        verbose_name = "Statistique par groupe"
+        verbose_name_plural = "Statistiques par groupe"
+        unique_together = ['annee_scolaire', 'classe', 'section']
+
+    def __str__(self):
+        return f"{self.annee_scolaire} - {self.classe} - {self.section}: {self.nombre}"
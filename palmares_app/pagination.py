@@ -0,0 +1,149 @@
+"""Pagination par curseur (keyset) de la liste des résultats.
+
+Au lieu d'un ``OFFSET`` qui oblige la base à parcourir toutes les lignes
+précédentes, chaque page part de la dernière ligne affichée. L'ordre est celui
+du palmarès, rendu total par l'id : ``pourcentage`` décroissant (vides en
+dernier), puis ``id``. Ces deux colonnes terminent chaque index ``IndexPalmares``
+de ``Resultat`` : la page est lue dans l'index du filtre, sans jointure ni tri.
+
+La position d'une page est bornée sur ``pourcentage`` (``<=`` ou ``>=``), que
+l'index sait parcourir ; seuls les ex æquo du curseur sont filtrés en plus. Les
+résultats sans pourcentage, placés après tous les autres, sont lus par une
+seconde requête quand la page atteint leur début.
+
+Les curseurs transmis au navigateur sont opaques (JSON encodé en base64). Les
+pages peuvent contenir des instances de ``Resultat`` ou des dictionnaires
+``values()`` comportant ``id`` et ``pourcentage``.
+"""
+import base64
+import binascii
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import F, Q
+
+
+ORDRE = (F('pourcentage').desc(nulls_last=True), 'id')
+ORDRE_INVERSE = (F('pourcentage').asc(nulls_first=True), '-id')
+
+
+class CurseurInvalide(ValueError):
+    """Curseur illisible ou falsifié"""
+
+
+def _position(resultat):
+    if isinstance(resultat, dict):
+        return resultat['pourcentage'], resultat['id']
+    return resultat.pourcentage, resultat.pk
+
+
+def encoder_curseur(resultat):
+    pourcentage, pk = _position(resultat)
+    pourcentage = None if pourcentage is None else str(pourcentage)
+    contenu = json.dumps([pourcentage, pk])
+    return base64.urlsafe_b64encode(contenu.encode()).decode().rstrip('=')
+
+
+def decoder_curseur(curseur):
+    try:
+        contenu = base64.urlsafe_b64decode(curseur + '=' * (-len(curseur) % 4))
+        pourcentage, pk = json.loads(contenu)
+        pourcentage = None if pourcentage is None else Decimal(pourcentage)
+        return pourcentage, int(pk)
+    except (binascii.Error, ValueError, TypeError, InvalidOperation, UnicodeDecodeError) as e:
+        raise CurseurInvalide(curseur) from e
+
+
+def _apres(records, pourcentage, pk):
+    """Requêtes, dans l'ordre du palmarès, des lignes situées après (pourcentage, pk)"""
+    sans_note = records.filter(pourcentage__isnull=True)
+    if pourcentage is None:
+        return [sans_note.filter(pk__gt=pk).order_by(*ORDRE)]
+    notes = records.filter(
+        Q(pourcentage__lt=pourcentage) | Q(pourcentage=pourcentage, pk__gt=pk),
+        pourcentage__lte=pourcentage,
+    )
+    return [notes.order_by(*ORDRE), sans_note.order_by(*ORDRE)]
+
+
+def _avant(records, pourcentage, pk):
+    """Requêtes, dans l'ordre inverse du palmarès, des lignes situées avant (pourcentage, pk)"""
+    notes = records.filter(pourcentage__isnull=False)
+    if pourcentage is None:
+        sans_note = records.filter(pourcentage__isnull=True, pk__lt=pk)
+        return [sans_note.order_by(*ORDRE_INVERSE), notes.order_by(*ORDRE_INVERSE)]
+    notes = notes.filter(
+        Q(pourcentage__gt=pourcentage) | Q(pourcentage=pourcentage, pk__lt=pk),
+        pourcentage__gte=pourcentage,
+    )
+    return [notes.order_by(*ORDRE_INVERSE)]
+
+
+class PageCurseur:
+    """Page de résultats obtenue par curseur"""
+
+    def __init__(self, object_list, has_next, has_previous):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    @property
+    def curseur_suivant(self):
+        return encoder_curseur(self.object_list[-1]) if self.has_next else None
+
+    @property
+    def curseur_precedent(self):
+        return encoder_curseur(self.object_list[0]) if self.has_previous else None
+
+
+def _requetes_page(records, apres, avant):
+    """Requêtes de la page demandée : ``(requetes, inverse, apres)``, ``apres`` vidé si le curseur est invalide"""
+    try:
+        if avant:
+            return _avant(records, *decoder_curseur(avant)), True, apres
+        if apres:
+            return _apres(records, *decoder_curseur(apres)), False, apres
+    except CurseurInvalide:
+        apres = None
+    return [records.order_by(*ORDRE)], False, apres
+
+
+def _page(lignes, inverse, apres, taille):
+    if inverse:
+        return PageCurseur(lignes[:taille][::-1], has_next=True, has_previous=len(lignes) > taille)
+    return PageCurseur(lignes[:taille], has_next=len(lignes) > taille, has_previous=bool(apres))
+
+
+def paginer_par_curseur(records, apres=None, avant=None, taille=25):
+    """Retourne la page suivant le curseur ``apres``, ou précédant le curseur ``avant``.
+
+    Un curseur invalide renvoie à la première page.
+    """
+    requetes, inverse, apres = _requetes_page(records, apres, avant)
+    # Une ligne de plus que la page : elle indique s'il en existe une autre
+    lignes = []
+    for requete in requetes:
+        lignes += requete[:taille + 1 - len(lignes)]
+        if len(lignes) > taille:
+            break
+    return _page(lignes, inverse, apres, taille)
+
+
+async def apaginer_par_curseur(records, apres=None, avant=None, taille=25):
+    """Version asynchrone de ``paginer_par_curseur``"""
+    requetes, inverse, apres = _requetes_page(records, apres, avant)
+    lignes = []
+    for requete in requetes:
+        lignes += [ligne async for ligne in requete[:taille + 1 - len(lignes)]]
+        if len(lignes) > taille:
+            break
+    return _page(lignes, inverse, apres, taille)
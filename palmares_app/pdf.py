@@ -0,0 +1,126 @@
+"""Mise en page PDF des résultats.
+
+Les lignes sont consommées au fil de l'eau : elles sont regroupées en tableaux
+de taille fixe (``LongTable`` dont l'en-tête est répété sur chaque page) que
+reportlab ne demande qu'au moment de les placer. Le document complet n'est
+donc jamais construit en mémoire.
+
+Ce module ne dépend que de reportlab (pas de l'ORM) : il peut être utilisé
+depuis des processus séparés. reportlab n'est importé qu'au premier PDF, et
+les styles ne sont construits qu'une fois par processus.
+"""
+import io
+from functools import lru_cache
+from itertools import islice
+from xml.sax.saxutils import escape
+
+
+ENTETES = ['Rang', 'Nom Complet', 'Pourcentage', 'Classe', 'Section', 'Année Scolaire']
+
+# Largeurs fixes : tous les blocs du document s'alignent (468 pt utiles en letter)
+LARGEURS_COLONNES = [36, 148, 68, 74, 64, 78]
+
+# Nombre de lignes par tableau ; chaque tableau se répartit sur plusieurs pages
+LIGNES_PAR_BLOC = 200
+
+
+@lru_cache(maxsize=None)
+def feuille_styles():
+    """Styles de paragraphe reportlab (titre), en lecture seule"""
+    from reportlab.lib.styles import getSampleStyleSheet
+    return getSampleStyleSheet()
+
+
+@lru_cache(maxsize=None)
+def style_tableau():
+    """Style commun à tous les tableaux, en lecture seule"""
+    from reportlab.lib import colors
+    from reportlab.platypus import TableStyle
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 11),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('FONTSIZE', (0, 1), (-1, -1), 9),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ])
+
+
+class _FlowablesALaDemande(list):
+    """Liste de flowables remplie depuis un générateur à mesure que reportlab la vide.
+
+    ``BaseDocTemplate.build`` boucle sur ``while len(flowables)`` et consomme
+    ``flowables[0]`` : chaque appel à ``len`` sur la liste vide fournit le flowable
+    suivant. Une copie de la liste ne verrait que les flowables déjà fournis
+    (``test_pdf_plusieurs_blocs`` vérifie que toutes les lignes sont placées).
+    """
+
+    def __init__(self, source):
+        super().__init__()
+        self._source = iter(source)
+
+    def __len__(self):
+        if not super().__len__():
+            suivant = next(self._source, None)
+            if suivant is not None:
+                self.append(suivant)
+        return super().__len__()
+
+
+def _blocs(lignes, style):
+    from reportlab.platypus import LongTable
+
+    lignes = iter(lignes)
+    premier = True
+    while True:
+        bloc = list(islice(lignes, LIGNES_PAR_BLOC))
+        if not bloc and not premier:
+            return
+        table = LongTable([ENTETES] + bloc, colWidths=LARGEURS_COLONNES, repeatRows=1)
+        table.setStyle(style)
+        yield table
+        premier = False
+        if len(bloc) < LIGNES_PAR_BLOC:
+            return
+
+
+def ecrire_pdf(destination, lignes, titre="Résultats des Étudiants"):
+    """Écrit dans ``destination`` (fichier binaire) le PDF des lignes à six colonnes (voir ``ENTETES``)"""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer
+
+    doc = SimpleDocTemplate(destination, pagesize=letter, pageCompression=1, title=titre)
+
+    # Styles
+    styles = feuille_styles()
+    style = style_tableau()
+
+    def flowables():
+        # Titre
+        yield Paragraph(escape(titre), styles['Heading1'])
+        yield Spacer(1, 12)
+        yield from _blocs(lignes, style)
+
+    doc.build(_FlowablesALaDemande(flowables()))
+
+
+def rendre_pdf(lignes, titre):
+    """Retourne le PDF des lignes sous forme d'octets (utilisable dans un processus séparé)"""
+    tampon = io.BytesIO()
+    ecrire_pdf(tampon, lignes, titre)
+    return tampon.getvalue()
+
+
+def rendre_fichier(tache):
+    """Tâche d'un processus de rendu : ``(nom_fichier, titre, lignes, chemin)`` -> ``(nom_fichier, chemin)``
+
+    Le PDF est écrit dans ``chemin`` plutôt que renvoyé : il ne repasse pas en
+    mémoire par le processus parent.
+    """
+    nom_fichier, titre, lignes, chemin = tache
+    with open(chemin, 'wb') as fichier:
+        ecrire_pdf(fichier, lignes, titre)
+    return nom_fichier, chemin
@@ -0,0 +1,171 @@
+"""Mesures par phase d'un import : durée, requêtes SQL, mémoire, profil cProfile.
+
+Un ``ProfilImport`` est passé à ``ImportateurResultats`` : chaque phase
+(lecture du fichier, validation, résolution des références, écriture,
+classements) y est chronométrée, et les requêtes SQL sont attribuées à la
+phase en cours via ``connection.execute_wrapper``. La mémoire est la hausse
+de la taille résidente au plus fort de l'import, par rapport à son début : le
+pic du processus (``VmHWM``) est remis à sa taille actuelle au démarrage de
+l'import (``/proc/self/clear_refs``), puis relu à la fin. Le worker étant long
+à vivre, sa mémoire déjà occupée par les imports précédents n'est pas comptée.
+``tracemalloc`` donnerait le même renseignement en ralentissant tout l'import.
+Sans ``/proc``, la mesure retombe sur ``ru_maxrss`` : elle ne compte alors que
+ce qui dépasse le pic atteint avant l'import.
+
+Avec ``profiler=True`` tout l'import s'exécute sous cProfile ; le profil est
+écrit dans ``MEDIA_ROOT/import_profils`` (à ouvrir avec ``pstats`` ou snakeviz).
+"""
+import os
+import resource
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+
+
+REPERTOIRE_PROFILS = 'import_profils'
+
+PHASES = (
+    ('lecture', "Lecture du fichier"),
+    ('validation', "Validation"),
+    ('resolution', "Résolution des références"),
+    ('ecriture', "Écriture"),
+    ('classement', "Classements"),
+)
+# Requêtes émises hors de toute phase (suivi de progression, par exemple)
+AUTRES = 'autres'
+
+
+def _statut(champ):
+    with open('/proc/self/status') as statut:
+        for ligne in statut:
+            if ligne.startswith(f'{champ}:'):
+                # En Kio
+                return int(ligne.split()[1]) * 1024
+    raise ValueError(champ)
+
+
+def memoire_residente():
+    """Taille résidente actuelle du processus, en octets"""
+    try:
+        return _statut('VmRSS')
+    except (OSError, ValueError):
+        return pic_memoire()
+
+
+def pic_memoire():
+    """Pic de la taille résidente du processus, en octets"""
+    try:
+        return _statut('VmHWM')
+    except (OSError, ValueError):
+        # Sans /proc : pic depuis le démarrage du processus (ru_maxrss, en Kio)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def reinitialiser_pic_memoire():
+    """Ramène le pic de la taille résidente à la taille actuelle ; False si le système ne le permet pas"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+    except OSError:
+        return False
+    return True
+
+
+class ProfilImport:
+    """Chronomètre les phases d'un import et compte leurs requêtes SQL"""
+
+    def __init__(self, profiler=False):
+        if profiler:
+            import cProfile
+            self.profiler = cProfile.Profile()
+        else:
+            self.profiler = None
+        self.durees = {}
+        self.requetes = {}
+        self.duree_totale = 0.0
+        self.memoire_pic = 0
+        self._memoire_initiale = 0
+        self._pile = []
+
+    def _crediter(self, nom, duree):
+        self.durees[nom] = self.durees.get(nom, 0.0) + duree
+
+    @contextmanager
+    def phase(self, nom):
+        """Chronomètre le bloc ; une phase imbriquée suspend la phase englobante"""
+        maintenant = time.perf_counter()
+        if self._pile:
+            englobante, depuis = self._pile[-1]
+            self._crediter(englobante, maintenant - depuis)
+        self._pile.append((nom, maintenant))
+        try:
+            yield
+        finally:
+            maintenant = time.perf_counter()
+            _, depuis = self._pile.pop()
+            self._crediter(nom, maintenant - depuis)
+            if self._pile:
+                self._pile[-1] = (self._pile[-1][0], maintenant)
+
+    def iterer(self, nom, iterable):
+        """Produit les éléments de ``iterable`` en créditant à ``nom`` le temps passé à les obtenir"""
+        iterateur = iter(iterable)
+        while True:
+            debut = time.perf_counter()
+            try:
+                element = next(iterateur)
+            except StopIteration:
+                self._crediter(nom, time.perf_counter() - debut)
+                return
+            self._crediter(nom, time.perf_counter() - debut)
+            yield element
+
+    def _executer(self, execute, sql, params, many, context):
+        nom = self._pile[-1][0] if self._pile else AUTRES
+        self.requetes[nom] = self.requetes.get(nom, 0) + 1
+        return execute(sql, params, many, context)
+
+    @contextmanager
+    def mesurer(self):
+        """Mesure l'ensemble de l'import (durée totale, requêtes, profil éventuel)"""
+        if reinitialiser_pic_memoire():
+            self._memoire_initiale = memoire_residente()
+        else:
+            self._memoire_initiale = pic_memoire()
+        debut = time.perf_counter()
+        if self.profiler:
+            self.profiler.enable()
+        try:
+            with connection.execute_wrapper(self._executer):
+                yield self
+        finally:
+            if self.profiler:
+                self.profiler.disable()
+            self.duree_totale = time.perf_counter() - debut
+            self.memoire_pic = max(pic_memoire() - self._memoire_initiale, 0)
+
+    @property
+    def nb_requetes(self):
+        return sum(self.requetes.values())
+
+    def phases(self):
+        """Durée (s) et nombre de requêtes de chaque phase, dans l'ordre du traitement"""
+        phases = {
+            nom: {'duree_s': round(self.durees[nom], 4), 'requetes': self.requetes.get(nom, 0)}
+            for nom, _ in PHASES if nom in self.durees
+        }
+        hors_phases = max(self.duree_totale - sum(self.durees.values()), 0.0)
+        phases[AUTRES] = {'duree_s': round(hors_phases, 4), 'requetes': self.requetes.get(AUTRES, 0)}
+        return phases
+
+    def ecrire_profil(self, nom):
+        """Écrit le profil cProfile sous MEDIA_ROOT et retourne son chemin relatif (ou '')"""
+        if not self.profiler:
+            return ''
+        chemin_relatif = os.path.join(REPERTOIRE_PROFILS, nom)
+        chemin = os.path.join(settings.MEDIA_ROOT, chemin_relatif)
+        os.makedirs(os.path.dirname(chemin), exist_ok=True)
+        self.profiler.dump_stats(chemin)
+        return chemin_relatif
@@ -0,0 +1,73 @@
+"""Recherche indexée dans les résultats.
+
+Chaque résultat porte une colonne ``recherche`` dénormalisée : nom de l'élève,
+classe, section et année, en minuscules et sans accents. La recherche devient
+un simple ``LIKE '%...%'`` sur une seule colonne, sans jointure :
+
+- sur PostgreSQL, un index GIN ``pg_trgm`` (migration 0002) sert ce filtre
+  et les résultats sont classés par similarité de trigrammes ;
+- ailleurs (SQLite en test), le même filtre s'applique et les résultats dont le
+  texte commence par la recherche sont placés en tête.
+"""
+import unicodedata
+
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Value, When
+
+from .utils import par_lots
+
+
+def normaliser(texte):
+    """Minuscules, sans accents ni espaces superflus : « Élève  Ndèye » -> « eleve ndeye »"""
+    decompose = unicodedata.normalize('NFKD', str(texte))
+    sans_accents = ''.join(c for c in decompose if not unicodedata.combining(c))
+    return ' '.join(sans_accents.casefold().split())
+
+
+def texte_recherche(nom_complet, classe, section, annee):
+    """Contenu de la colonne ``recherche`` d'un résultat"""
+    return normaliser(f"{nom_complet} {classe} {section} {annee}")
+
+
+def filtrer_recherche(records, search_query):
+    """Filtre les résultats sur la colonne indexée et les classe par pertinence"""
+    terme = normaliser(search_query)
+    if not terme:
+        return records
+    records = records.filter(recherche__contains=terme)
+
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import TrigramWordSimilarity
+        pertinence = TrigramWordSimilarity(Value(terme), 'recherche')
+    else:
+        pertinence = Case(
+            When(recherche__startswith=terme, then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+
+    # Même ordre que le palmarès à pertinence égale : les résultats sans
+    # pourcentage en dernier (PostgreSQL les place en tête d'un tri décroissant)
+    return records.annotate(pertinence=pertinence).order_by(
+        '-pertinence', F('pourcentage').desc(nulls_last=True), 'eleve__nom_complet'
+    )
+
+
+def reindexer(resultats, taille_lot=1000):
+    """Recalcule la colonne ``recherche`` des résultats donnés ; retourne leur nombre.
+
+    N'utilise que les champs des modèles : convient aussi aux modèles historiques
+    d'une migration (voir 0003_remplir_recherche).
+    """
+    total = 0
+    manager = resultats.model._base_manager.db_manager(resultats.db)
+    resultats = resultats.select_related('eleve', 'classe', 'section', 'annee_scolaire').order_by('pk')
+    for lot in par_lots(resultats.iterator(chunk_size=taille_lot), taille_lot):
+        for resultat in lot:
+            resultat.recherche = texte_recherche(
+                resultat.eleve.nom_complet, resultat.classe.nom,
+                resultat.section.nom, resultat.annee_scolaire.annee,
+            )
+        manager.bulk_update(lot, ['recherche'], batch_size=taille_lot)
+        total += len(lot)
+    return total
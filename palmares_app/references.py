@@ -0,0 +1,70 @@
+"""Cache des données de référence : années scolaires, classes et sections.
+
+Ces tables ne changent que quelques fois par an alors que chaque affichage de
+la liste lit leurs noms (menus de filtres) et que chaque import résout leurs
+noms en identifiants. Les listes et les correspondances nom -> id sont gardées
+dans le cache Django, sous une clé qui inclut une version :
+
+- les signaux (modifications dans l'admin) et l'import (références créées)
+  changent la version après validation de la transaction ;
+- les anciennes entrées ne sont alors plus jamais lues et expirent d'elles-mêmes.
+
+En régime établi, menus et résolutions de noms ne coûtent aucune requête ; un
+cache vide ou invalidé retombe simplement sur la base.
+"""
+import time
+
+from django.core.cache import cache
+
+from .models import AnneeScolaire, Classe, Section
+
+
+CLE_VERSION = 'palmares:references:version'
+
+# Champ portant le nom de chaque table de référence
+CHAMPS_NOM = {
+    AnneeScolaire: 'annee',
+    Classe: 'nom',
+    Section: 'nom',
+}
+
+
+def version():
+    """Version courante des données de référence (créée au premier appel)"""
+    courante = cache.get(CLE_VERSION)
+    if courante is None:
+        cache.add(CLE_VERSION, time.time_ns(), timeout=None)
+        courante = cache.get(CLE_VERSION)
+    return courante
+
+
+def invalider():
+    """Rend caduques toutes les entrées en cache (nouvelle version, jamais réutilisée)"""
+    cache.set(CLE_VERSION, time.time_ns(), timeout=None)
+
+
+def _lire(nom, calculer):
+    cle = f'palmares:references:{version()}:{nom}'
+    valeur = cache.get(cle)
+    if valeur is None:
+        valeur = calculer()
+        cache.set(cle, valeur)
+    return valeur
+
+
+def listes_filtres():
+    """Noms proposés dans les menus de filtres : ``classes``, ``sections``, ``annees``"""
+    return _lire('listes', lambda: {
+        'classes': list(Classe.objects.values_list('nom', flat=True).order_by('nom')),
+        'sections': list(Section.objects.values_list('nom', flat=True).order_by('nom')),
+        'annees': list(AnneeScolaire.objects.values_list('annee', flat=True).order_by('-annee')),
+    })
+
+
+def identifiants(modele):
+    """Correspondance nom -> id pour une table de référence"""
+    champ = CHAMPS_NOM[modele]
+    return _lire(
+        f'ids:{modele._meta.model_name}',
+        lambda: dict(modele.objects.values_list(champ, 'id')),
+    )
@@ -0,0 +1,158 @@
+"""Signaux : invalidation des caches et données dénormalisées après les modifications faites hors import"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+
+from . import historiques, references
+from .classements import rangs_manquants, recalculer_rangs, recalculer_tous_les_rangs
+from .models import AnneeScolaire, Classe, Eleve, Resultat, Section, StatistiqueGroupe
+from .recherche import reindexer
+from .statistiques import rafraichir_groupes, reconstruire
+from .versions import incrementer_version
+
+
+@receiver(post_save, sender=Eleve)
+@receiver(post_delete, sender=Eleve)
+@receiver(post_save, sender=Classe)
+@receiver(post_delete, sender=Classe)
+@receiver(post_save, sender=Section)
+@receiver(post_delete, sender=Section)
+@receiver(post_save, sender=AnneeScolaire)
+@receiver(post_delete, sender=AnneeScolaire)
+def donnees_modifiees(sender, **kwargs):
+    # Version incrémentée une fois, après validation, avec les modifications des résultats
+    _noter((), ())
+
+
+# Nom repris par le texte de recherche et l'historique, et relation depuis Resultat
+NOMS_REFERENCES = {
+    Eleve: ('nom_complet', 'eleve'),
+    Classe: ('nom', 'classe'),
+    Section: ('nom', 'section'),
+    AnneeScolaire: ('annee', 'annee_scolaire'),
+}
+
+
+@receiver(pre_save, sender=Eleve)
+@receiver(pre_save, sender=Classe)
+@receiver(pre_save, sender=Section)
+@receiver(pre_save, sender=AnneeScolaire)
+def comparer_nom(sender, instance, raw, update_fields, **kwargs):
+    # Nom comparé à celui en base : seul un vrai renommage réindexe les résultats
+    champ = NOMS_REFERENCES[sender][0]
+    instance._renommee = False
+    if raw or instance._state.adding or (update_fields is not None and champ not in update_fields):
+        return
+    ancien = sender._base_manager.filter(pk=instance.pk).values_list(champ, flat=True).first()
+    instance._renommee = ancien is not None and ancien != getattr(instance, champ)
+
+
+@receiver(post_save, sender=Eleve)
+@receiver(post_save, sender=Classe)
+@receiver(post_save, sender=Section)
+@receiver(post_save, sender=AnneeScolaire)
+def reference_renommee(sender, instance, created, **kwargs):
+    # Le texte de recherche des résultats reprend le nom de l'élève, de la classe...
+    if not created and getattr(instance, '_renommee', False):
+        resultats = Resultat.objects.filter(**{NOMS_REFERENCES[sender][1]: instance})
+        reindexer(resultats)
+        # L'historique reprend aussi ces noms (celui de l'élève, même sans résultat)
+        eleves = [instance.pk] if sender is Eleve else resultats.values_list('eleve_id', flat=True).distinct()
+        historiques.invalider(eleves)
+
+
+@receiver(post_save, sender=Classe)
+@receiver(post_delete, sender=Classe)
+@receiver(post_save, sender=Section)
+@receiver(post_delete, sender=Section)
+@receiver(post_save, sender=AnneeScolaire)
+@receiver(post_delete, sender=AnneeScolaire)
+def references_modifiees(sender, **kwargs):
+    # Après validation : un autre processus ne doit pas remettre en cache l'état précédent
+    transaction.on_commit(references.invalider)
+
+
+@receiver(post_init, sender=Resultat)
+def memoriser_groupe(sender, instance, **kwargs):
+    # Groupe d'origine : une modification de classe ou section touche deux groupes
+    valeurs = instance.__dict__  # sans déclencher le chargement de champs différés
+    instance._groupe_initial = (
+        valeurs.get('annee_scolaire_id'), valeurs.get('classe_id'), valeurs.get('section_id')
+    )
+    instance._eleve_initial = valeurs.get('eleve_id')
+
+
+class _Modifications:
+    """Groupes et élèves touchés par les résultats enregistrés ou supprimés dans une transaction"""
+
+    def __init__(self):
+        self.groupes = set()
+        self.eleves = set()
+        self.appliquees = False
+
+    def appliquer(self):
+        # Une seule fois par transaction : statistiques, rangs des années touchées,
+        # historiques et version des données, quel que soit le nombre de résultats
+        self.appliquees = True
+        groupes = self.groupes - {(None, None, None)}
+        with transaction.atomic():
+            rafraichir_groupes(groupes)
+            recalculer_rangs(groupes)
+            historiques.invalider(self.eleves - {None})
+            incrementer_version()
+
+
+def _noter(groupes, eleves):
+    """Ajoute aux modifications de la transaction en cours, appliquées après sa validation.
+
+    Une suppression en masse dans l'admin ou en cascade (élève supprimé) ne
+    recalcule ainsi rangs et statistiques qu'une fois, et non pour chaque résultat.
+    """
+    connexion = transaction.get_connection()
+    if not connexion.in_atomic_block:
+        modifications = _Modifications()
+        modifications.groupes.update(groupes)
+        modifications.eleves.update(eleves)
+        modifications.appliquer()
+        return
+
+    modifications = getattr(connexion, 'palmares_modifications', None)
+    # Déjà appliquées, ou rappel annulé avec un point de sauvegarde : nouvelles modifications
+    if modifications is None or modifications.appliquees or not any(
+        fonction == modifications.appliquer for _, fonction, _ in connexion.run_on_commit
+    ):
+        modifications = connexion.palmares_modifications = _Modifications()
+        transaction.on_commit(modifications.appliquer)
+    modifications.groupes.update(groupes)
+    modifications.eleves.update(eleves)
+
+
+@receiver(post_save, sender=Resultat)
+def resultat_enregistre(sender, instance, **kwargs):
+    # Résultat changé de groupe ou d'élève : l'ancien et le nouveau sont touchés
+    _noter({instance._groupe_initial, instance.groupe}, {instance._eleve_initial, instance.eleve_id})
+    instance._groupe_initial = instance.groupe
+    instance._eleve_initial = instance.eleve_id
+
+
+@receiver(post_delete, sender=Resultat)
+def resultat_supprime(sender, instance, **kwargs):
+    _noter({instance.groupe}, {instance.eleve_id})
+
+
+def initialiser_statistiques(sender, using, **kwargs):
+    # Premier déploiement : la table des statistiques est construite une fois
+    if not StatistiqueGroupe.objects.using(using).exists() and Resultat.objects.using(using).exists():
+        reconstruire()
+
+
+def initialiser_rangs(sender, using, **kwargs):
+    # Premier déploiement : les résultats déjà importés reçoivent leurs rangs
+    if rangs_manquants():
+        recalculer_tous_les_rangs()
+        incrementer_version()
+
+
+def vider_cache_references(sender, **kwargs):
+    # Base migrée ou recréée (tests, flush) : les ids en cache ne valent plus rien
+    references.invalider()
@@ -0,0 +1,159 @@
+"""Simulation d'import (dry-run) avec aperçu des changements.
+
+Toute la feuille est validée colonne par colonne avant la moindre écriture :
+les contrôles (champs requis, conversion et bornes du pourcentage, longueurs)
+s'appliquent à des colonnes entières, puis les résultats existants sont lus en
+une seule requête. Les pourcentages sont arrondis comme à l'import
+(``arrondir_pourcentage``) : l'aperçu annonce les valeurs qui seront
+enregistrées. Rien n'est écrit en base.
+"""
+from dataclasses import dataclass, field
+
+from .importer import (
+    CHAMPS_TEXTE,
+    ERREUR_CHAMPS_REQUIS,
+    ERREUR_TROP_LONG,
+    controler_pourcentage,
+)
+from .models import Resultat
+
+
+CREE = 'cree'
+MIS_A_JOUR = 'mis_a_jour'
+INCHANGE = 'inchange'
+REJETE = 'rejete'
+
+
+@dataclass
+class ApercuImport:
+    """Résultat d'une simulation : compteurs et détail par ligne"""
+    crees: int = 0
+    mis_a_jour: int = 0
+    inchanges: int = 0
+    rejetes: int = 0
+    lignes: list = field(default_factory=list)
+
+    @property
+    def total(self):
+        return self.crees + self.mis_a_jour + self.inchanges + self.rejetes
+
+    def ajouter(self, action, numero, nom, raison=''):
+        if action == CREE:
+            self.crees += 1
+        elif action == MIS_A_JOUR:
+            self.mis_a_jour += 1
+        elif action == INCHANGE:
+            self.inchanges += 1
+        else:
+            self.rejetes += 1
+        self.lignes.append({'ligne': numero, 'nom': nom, 'action': action, 'raison': raison})
+
+
+def _texte(valeur):
+    return str(valeur).strip() if valeur else ''
+
+
+def _format_pourcentage(valeur):
+    return '-' if valeur is None else f"{valeur:.2f}%"
+
+
+def simuler_import(lignes):
+    """Valide toutes les LigneFichier et prévoit l'effet de leur import"""
+    lignes = list(lignes)
+    apercu = ApercuImport()
+    if not lignes:
+        return apercu
+
+    numeros = [ligne.numero for ligne in lignes]
+    colonnes = {
+        'nom_complet': [_texte(ligne.nom_complet) for ligne in lignes],
+        'classe': [_texte(ligne.classe) for ligne in lignes],
+        'section': [_texte(ligne.section) for ligne in lignes],
+        'annee': [_texte(ligne.annee_scolaire) for ligne in lignes],
+    }
+
+    # Contrôles par colonne : chaque masque donne le motif de rejet ligne à ligne
+    requis = [all(valeurs) for valeurs in zip(*colonnes.values())]
+    # Même contrôle que l'import : (pourcentage, gabarit d'erreur) par ligne
+    pourcentages, erreurs_pourcentage = zip(*(controler_pourcentage(ligne.pourcentage) for ligne in lignes))
+    trop_longs = [None] * len(lignes)
+    for attribut, modele, champ in reversed(CHAMPS_TEXTE):
+        model_field = modele._meta.get_field(champ)
+        for i, valeur in enumerate(colonnes[attribut]):
+            if len(valeur) > model_field.max_length:
+                trop_longs[i] = (model_field.verbose_name, model_field.max_length)
+
+    raisons = []
+    for i, numero in enumerate(numeros):
+        if not requis[i]:
+            raisons.append(ERREUR_CHAMPS_REQUIS.format(numero))
+        elif erreurs_pourcentage[i]:
+            raisons.append(erreurs_pourcentage[i].format(numero))
+        elif trop_longs[i]:
+            raisons.append(ERREUR_TROP_LONG.format(numero, *trop_longs[i]))
+        else:
+            raisons.append(None)
+
+    # Une seule recherche groupée des résultats existants
+    valides = [i for i, raison in enumerate(raisons) if raison is None]
+    etat = _resultats_existants(
+        {colonnes['nom_complet'][i] for i in valides},
+        {colonnes['annee'][i] for i in valides},
+    )
+
+    for i, numero in enumerate(numeros):
+        nom = colonnes['nom_complet'][i] or lignes[i].nom_complet
+        if raisons[i]:
+            apercu.ajouter(REJETE, numero, nom, raisons[i])
+            continue
+
+        cle = (colonnes['nom_complet'][i], colonnes['annee'][i])
+        pourcentage = pourcentages[i]
+        nouveau = (colonnes['classe'][i], colonnes['section'][i], pourcentage)
+        ancien = etat.get(cle)
+
+        if ancien is None:
+            etat[cle] = nouveau
+            apercu.ajouter(CREE, numero, nom)
+            continue
+
+        # Un pourcentage vide conserve la valeur existante
+        if pourcentage is None:
+            nouveau = nouveau[:2] + (ancien[2],)
+        etat[cle] = nouveau
+        if nouveau == ancien:
+            apercu.ajouter(INCHANGE, numero, nom)
+        else:
+            apercu.ajouter(MIS_A_JOUR, numero, nom, _decrire_changements(ancien, nouveau))
+
+    return apercu
+
+
+def _resultats_existants(noms, annees):
+    """(nom, année) -> (classe, section, pourcentage) des résultats déjà en base.
+
+    Une seule requête, filtrée sur les années du fichier (peu nombreuses) : une
+    liste ``IN`` des noms dépasserait la limite de paramètres de SQLite. Les
+    résultats d'autres élèves de ces années sont écartés à la lecture.
+    """
+    etat = {}
+    if not noms:
+        return etat
+    for nom, annee, classe, section, pourcentage in Resultat.objects.filter(
+        annee_scolaire__annee__in=annees,
+    ).values_list(
+        'eleve__nom_complet', 'annee_scolaire__annee', 'classe__nom', 'section__nom', 'pourcentage'
+    ).order_by().iterator():
+        if nom in noms:
+            etat[(nom, annee)] = (classe, section, pourcentage)
+    return etat
+
+
+def _decrire_changements(ancien, nouveau):
+    changements = []
+    for libelle, avant, apres in zip(('Classe', 'Section'), ancien[:2], nouveau[:2]):
+        if avant != apres:
+            changements.append(f"{libelle}: {avant} → {apres}")
+    if ancien[2] != nouveau[2]:
+        changements.append(f"Pourcentage: {_format_pourcentage(ancien[2])} → {_format_pourcentage(nouveau[2])}")
+    return ", ".join(changements)
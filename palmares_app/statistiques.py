@@ -0,0 +1,110 @@
+"""Statistiques agrégées par (année scolaire, classe, section).
+
+La table ``StatistiqueGroupe`` est mise à jour à chaque écriture, uniquement
+pour les groupes touchés : l'import la rafraîchit après chaque lot et les
+signaux après chaque modification faite dans l'admin. Les comptages qui ne
+dépendent que des filtres classe/section/année se lisent alors dans cette
+petite table au lieu d'un ``COUNT`` sur la jointure des résultats.
+"""
+from django.db.models import Count, Max, Min, Q, Sum
+
+from .models import Resultat, StatistiqueGroupe
+
+
+CHAMPS_AGREGATS = ['nombre', 'nombre_notes', 'somme_pourcentage', 'pourcentage_min', 'pourcentage_max']
+
+
+def _agreger(resultats):
+    """Statistiques (non enregistrées) des groupes présents dans ``resultats``"""
+    return [
+        StatistiqueGroupe(
+            annee_scolaire_id=ligne['annee_scolaire_id'],
+            classe_id=ligne['classe_id'],
+            section_id=ligne['section_id'],
+            nombre=ligne['nombre'],
+            nombre_notes=ligne['nombre_notes'],
+            somme_pourcentage=ligne['somme_pourcentage'] or 0,
+            pourcentage_min=ligne['pourcentage_min'],
+            pourcentage_max=ligne['pourcentage_max'],
+        )
+        for ligne in resultats.order_by().values('annee_scolaire_id', 'classe_id', 'section_id').annotate(
+            nombre=Count('id'),
+            nombre_notes=Count('pourcentage'),
+            somme_pourcentage=Sum('pourcentage'),
+            pourcentage_min=Min('pourcentage'),
+            pourcentage_max=Max('pourcentage'),
+        )
+    ]
+
+
+def rafraichir_groupes(groupes):
+    """Recalcule les statistiques des groupes ``(annee_id, classe_id, section_id)`` donnés"""
+    groupes = set(groupes)
+    if not groupes:
+        return
+
+    filtre = Q()
+    for annee_id, classe_id, section_id in groupes:
+        filtre |= Q(annee_scolaire_id=annee_id, classe_id=classe_id, section_id=section_id)
+
+    statistiques = _agreger(Resultat.objects.filter(filtre))
+    presents = {(s.annee_scolaire_id, s.classe_id, s.section_id) for s in statistiques}
+
+    # Groupes vidés (dernier résultat supprimé ou déplacé)
+    vides = groupes - presents
+    if vides:
+        filtre_vides = Q()
+        for annee_id, classe_id, section_id in vides:
+            filtre_vides |= Q(annee_scolaire_id=annee_id, classe_id=classe_id, section_id=section_id)
+        StatistiqueGroupe.objects.filter(filtre_vides).delete()
+
+    if statistiques:
+        StatistiqueGroupe.objects.bulk_create(
+            statistiques,
+            update_conflicts=True,
+            unique_fields=['annee_scolaire', 'classe', 'section'],
+            update_fields=CHAMPS_AGREGATS,
+        )
+
+
+def reconstruire():
+    """Reconstruit entièrement la table des statistiques ; retourne le nombre de groupes"""
+    statistiques = _agreger(Resultat.objects.all())
+    StatistiqueGroupe.objects.all().delete()
+    StatistiqueGroupe.objects.bulk_create(statistiques, batch_size=1000)
+    return len(statistiques)
+
+
+def _agregats_resume(filtres):
+    return StatistiqueGroupe.objects.filter(**filtres), dict(
+        nombre=Sum('nombre'),
+        nombre_notes=Sum('nombre_notes'),
+        somme=Sum('somme_pourcentage'),
+        minimum=Min('pourcentage_min'),
+        maximum=Max('pourcentage_max'),
+    )
+
+
+def _resume(agregats):
+    nombre_notes = agregats['nombre_notes'] or 0
+    return {
+        'nombre': agregats['nombre'] or 0,
+        'moyenne': round(agregats['somme'] / nombre_notes, 2) if nombre_notes else None,
+        'minimum': agregats['minimum'],
+        'maximum': agregats['maximum'],
+    }
+
+
+def resume(**filtres):
+    """Effectif, moyenne, minimum et maximum pour des filtres sur année/classe/section.
+
+    Les filtres sont des lookups sur ``StatistiqueGroupe`` (ex: ``classe__nom='6ème A'``).
+    """
+    groupes, agregats = _agregats_resume(filtres)
+    return _resume(groupes.aggregate(**agregats))
+
+
+async def aresume(**filtres):
+    """Version asynchrone de ``resume``"""
+    groupes, agregats = _agregats_resume(filtres)
+    return _resume(await groupes.aaggregate(**agregats))
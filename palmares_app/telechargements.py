@@ -0,0 +1,187 @@
+"""Téléchargement des fichiers de MEDIA_ROOT, après authentification par Django.
+
+Toutes les vues de téléchargement (exports, logs d'erreurs, profils d'import)
+passent par ``servir_fichier`` :
+
+- avec ``USE_X_ACCEL_REDIRECT``, la réponse ne contient que l'en-tête
+  ``X-Accel-Redirect`` : nginx envoie le fichier depuis ``/protected-media/``
+  (plages, requêtes conditionnelles et compression gérées par nginx) ;
+- sinon ``FileResponse`` envoie le fichier par blocs (``sendfile`` sous
+  gunicorn), avec prise en charge de ``Range`` et des requêtes conditionnelles
+  (``ETag``, ``Last-Modified``).
+
+En ASGI (``PALMARES_ASGI``), le corps est lu par blocs dans un thread et
+transmis par un itérateur asynchrone : Django lirait sinon le fichier entier
+en mémoire avant de l'envoyer.
+
+Les fichiers stockés compressés (``compresse=True``, logs CSV en ``.csv.gz``)
+sont envoyés tels quels avec ``Content-Encoding: gzip`` aux clients qui
+l'acceptent, et décompressés à la volée pour les autres. Côté nginx,
+``gzip_static`` et ``gunzip`` font de même.
+"""
+import gzip
+import os
+import re
+from urllib.parse import quote
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+
+TAILLE_BLOC = 64 * 1024
+
+PLAGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class Tranche:
+    """Lecture limitée à ``taille`` octets d'un fichier déjà positionné.
+
+    ``fileno`` reste exposé : sous gunicorn, ``sendfile`` part de la position
+    courante et s'arrête au ``Content-Length`` de la réponse.
+    """
+
+    def __init__(self, fichier, taille):
+        self.fichier = fichier
+        self.restant = taille
+        self.name = fichier.name
+
+    def read(self, taille=-1):
+        if taille < 0 or taille > self.restant:
+            taille = self.restant
+        donnees = self.fichier.read(taille)
+        self.restant -= len(donnees)
+        return donnees
+
+    def fileno(self):
+        return self.fichier.fileno()
+
+    def close(self):
+        self.fichier.close()
+
+
+def servir_fichier(request, chemin_media, filename, content_type, compresse=False):
+    """Réponse de téléchargement du fichier ``chemin_media`` (relatif à MEDIA_ROOT)"""
+    try:
+        chemin = safe_join(settings.MEDIA_ROOT, chemin_media)
+    except SuspiciousFileOperation:
+        raise Http404("Fichier non trouvé")
+    if not os.path.isfile(chemin):
+        raise Http404("Fichier non trouvé")
+
+    if settings.USE_X_ACCEL_REDIRECT:
+        # nginx (gzip_static) cherche lui-même la version .gz du fichier demandé
+        cible = chemin_media.removesuffix('.gz') if compresse else chemin_media
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = f"{settings.X_ACCEL_REDIRECT_PREFIX}{quote(cible)}"
+        response['Content-Disposition'] = content_disposition_header(True, filename)
+        return response
+
+    decompresser = compresse and 'gzip' not in request.headers.get('Accept-Encoding', '')
+    stat = os.stat(chemin)
+    # Inode et taille : un fichier remplacé (écriture atomique) change d'inode, même
+    # quand la nouvelle version est écrite dans la même seconde que l'ancienne
+    etag = f'"{stat.st_ino:x}-{stat.st_size:x}{"-csv" if decompresser else ""}"'
+    derniere_modification = int(stat.st_mtime)
+
+    response = get_conditional_response(request, etag=etag, last_modified=derniere_modification)
+    if response is None:
+        if decompresser:
+            response = StreamingHttpResponse(_en_flux(_decompresser(chemin)), content_type=content_type)
+            response['Content-Disposition'] = content_disposition_header(True, filename)
+        else:
+            response = _reponse_plage(request, chemin, stat, etag, filename, content_type)
+            if compresse:
+                response['Content-Encoding'] = 'gzip'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(derniere_modification)
+    response['Cache-Control'] = 'private, no-cache'
+    if compresse:
+        patch_vary_headers(response, ['Accept-Encoding'])
+    return response
+
+
+def _en_flux(blocs):
+    """Itérable des blocs, rendu asynchrone en ASGI"""
+    return _flux_asynchrone(blocs) if settings.PALMARES_ASGI else blocs
+
+
+async def _flux_asynchrone(blocs):
+    iterateur = iter(blocs)
+    suivant = sync_to_async(next, thread_sensitive=False)
+    while (bloc := await suivant(iterateur, None)) is not None:
+        yield bloc
+
+
+def _decompresser(chemin):
+    with gzip.open(chemin, 'rb') as fichier:
+        yield from iter(lambda: fichier.read(TAILLE_BLOC), b'')
+
+
+def _reponse_plage(request, chemin, stat, etag, filename, content_type):
+    """Fichier entier (200) ou plage demandée par ``Range`` (206, 416 si hors du fichier)"""
+    taille, derniere_modification = stat.st_size, int(stat.st_mtime)
+    plage = _lire_plage(request, taille, etag, derniere_modification)
+    if plage is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{taille}'
+        return response
+
+    fichier = open(chemin, 'rb')
+    if plage is None:
+        response = FileResponse(fichier, as_attachment=True, filename=filename, content_type=content_type)
+    else:
+        debut, fin = plage
+        fichier.seek(debut)
+        response = FileResponse(
+            Tranche(fichier, fin - debut + 1),
+            status=206, as_attachment=True, filename=filename, content_type=content_type,
+        )
+        response['Content-Range'] = f'bytes {debut}-{fin}/{taille}'
+        response['Content-Length'] = fin - debut + 1
+    if settings.PALMARES_ASGI:
+        # En-têtes déjà posés par FileResponse, qui garde aussi la fermeture du fichier
+        lecteur = response.file_to_stream
+        response.streaming_content = _en_flux(iter(lambda: lecteur.read(TAILLE_BLOC), b''))
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def _lire_plage(request, taille, etag, derniere_modification):
+    """``(debut, fin)`` de la plage demandée ; None pour tout le fichier, False si hors du fichier.
+
+    Une seule plage est prise en charge : une demande multiple reçoit le fichier entier.
+    """
+    entete = request.headers.get('Range')
+    if not entete or request.method not in ('GET', 'HEAD'):
+        return None
+    si_plage = request.headers.get('If-Range')
+    if si_plage:
+        # La plage ne vaut que si le fichier est resté celui que le client connaît
+        if si_plage.startswith(('"', 'W/')):
+            if si_plage != etag:
+                return None
+        elif parse_http_date_safe(si_plage) != derniere_modification:
+            return None
+
+    correspondance = PLAGE.match(entete.strip())
+    if not correspondance:
+        return None
+    debut, fin = correspondance.groups()
+    if not debut and not fin:
+        return None
+    if not debut:
+        # bytes=-N : les N derniers octets
+        longueur = int(fin)
+        if longueur == 0:
+            return False
+        return max(taille - longueur, 0), taille - 1
+    debut = int(debut)
+    fin = min(int(fin), taille - 1) if fin else taille - 1
+    if debut >= taille or debut > fin:
+        return False
+    return debut, fin
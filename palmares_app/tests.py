@@ -1,3 +1,1590 @@
-from django.test import TestCase
+import base64
+import gzip
+import importlib
+import importlib.util
+import io
+import json
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import types
+import zipfile
+import zlib
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
+from urllib.parse import quote, urlencode
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.migrations.loader import MigrationLoader
+from django.http import Http404
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path, resolve, reverse
+from django.utils import timezone
+from django.utils.http import http_date
+
+from . import views_async
+from .cache_exports import cle_export, preparer_export, repertoire_cache, servir_export
+from .classements import recalculer_rangs, recalculer_tous_les_rangs
+from .demarrage import amorcer, precharger
+from .exports import generer_zip_palmares, groupes_classes
+from .historiques import historique
+from .importer import ImportateurResultats
+from .ingestion import LigneFichier, lire_lignes
+from .instrumentation import lire_journal
+from .jobs import DELAI_ABANDON, Battement, creer_job, remettre_jobs_abandonnes
+from .journaux import ecrire_journal_erreurs, purger
+from .management.commands.mesurer_demarrage import Command as MesurerDemarrage
+from .profilage import ProfilImport
+from .references import listes_filtres
+from .models import (
+    AnneeScolaire, Classe, Eleve, ImportJob, JournalErreurs, Resultat, Section, StatistiqueGroupe,
+)
+from .pagination import ORDRE, encoder_curseur, paginer_par_curseur
+from .pdf import rendre_pdf
+from .recherche import filtrer_recherche
+from .simulation import REJETE, simuler_import
+from .statistiques import CHAMPS_AGREGATS, reconstruire, resume
+from .telechargements import servir_fichier
+from .versions import incrementer_version, version_courante
+
+
+MEDIA_TEST = tempfile.mkdtemp(prefix='palmares_tests_')
+
+# Caches en mémoire : les tests ne touchent pas au cache de fichiers de l'application
+CACHES_TEST = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests'},
+    'historiques': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-historiques'},
+}
+
+
+def urls_asgi():
+    """URLconf du déploiement ASGI : ``palmares_app/urls.py`` lu avec ``PALMARES_ASGI``"""
+    with override_settings(PALMARES_ASGI=True):
+        spec = importlib.util.find_spec('palmares_app.urls')
+        urls = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(urls)
+    racine = types.ModuleType('urls_asgi')
+    racine.urlpatterns = [path('', include(urls))]
+    return racine
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_TEST,
+    USE_X_ACCEL_REDIRECT=False,
+    PERF_JOURNAL=os.path.join(MEDIA_TEST, 'requetes_lentes.log'),
+    CACHES=CACHES_TEST,
+)
+class PlansRequetesTests(TestCase):
+    """Plans d'exécution des requêtes de la liste, de l'export PDF et de l'admin.
+
+    Chaque requête émise sur les résultats passe par ``EXPLAIN`` : le test
+    échoue si une table volumineuse est lue par un parcours séquentiel ou si
+    toute la table des résultats doit être triée. Sur PostgreSQL les parcours
+    séquentiels sont désactivés pour révéler un index manquant ; sur SQLite les
+    plans sont lus sans statistiques ``ANALYZE``, comme en développement.
+    """
+
+    TABLES_VOLUMINEUSES = ('palmares_app_resultat', 'palmares_app_eleve')
+    NOMBRE_ELEVES = 1500
+
+    @classmethod
+    def setUpTestData(cls):
+        aleatoire = random.Random(13)
+        cls.annees = [AnneeScolaire.objects.create(annee=f"{2020 + i}-{2021 + i}") for i in range(4)]
+        cls.classes = [Classe.objects.create(nom=f"{niveau}ème {lettre}") for niveau in (6, 5, 4, 3) for lettre in 'AB']
+        cls.sections = [Section.objects.create(nom=nom) for nom in ('Générale', 'Scientifique', 'Littéraire')]
+        eleves = Eleve.objects.bulk_create(
+            Eleve(nom_complet=f"Élève {numero:05d}") for numero in range(cls.NOMBRE_ELEVES)
+        )
+        Resultat.objects.bulk_create(
+            (
+                Resultat(
+                    eleve=eleve,
+                    annee_scolaire=annee,
+                    classe=aleatoire.choice(cls.classes),
+                    section=aleatoire.choice(cls.sections),
+                    pourcentage=None if aleatoire.random() < 0.05 else Decimal(aleatoire.randint(0, 10000)) / 100,
+                )
+                for eleve in eleves
+                for annee in cls.annees
+            ),
+            batch_size=1000,
+        )
+        reconstruire()
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+        cls.utilisateur = User.objects.create_superuser('admin', 'admin@example.com', 'motdepasse')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_TEST, ignore_errors=True)
+
+    def setUp(self):
+        self.client.force_login(self.utilisateur)
+
+    def requetes_resultats(self, url, params=None):
+        """Requêtes SELECT sur les résultats émises pour afficher ``url``"""
+        if params:
+            url = f"{url}?{urlencode(params)}"
+        with CaptureQueriesContext(connection) as contexte:
+            response = self.client.get(url)
+            if hasattr(response, 'streaming_content'):
+                b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200, url)
+        requetes = [
+            requete['sql'] for requete in contexte.captured_queries
+            if requete['sql'].lstrip().upper().startswith('SELECT') and 'palmares_app_resultat' in requete['sql']
+        ]
+        self.assertTrue(requetes, f"Aucune requête sur les résultats pour {url}")
+        return requetes
+
+    def assertPlansIndexes(self, url, params=None):
+        for sql in self.requetes_resultats(url, params):
+            if connection.vendor == 'postgresql':
+                problemes = self._problemes_postgresql(sql)
+            else:
+                problemes = self._problemes_sqlite(sql)
+            self.assertFalse(problemes, f"{url} {params or ''}\n{sql}\n" + "\n".join(problemes))
+
+    def _problemes_sqlite(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            details = [ligne[3] for ligne in cursor.fetchall()]
+
+        problemes = []
+        for detail in details:
+            parcours = re.match(r'SCAN (\w+)', detail)
+            if parcours and parcours.group(1) in self.TABLES_VOLUMINEUSES and 'INDEX' not in detail:
+                problemes.append(f"Parcours séquentiel : {detail}")
+
+        # Un tri complet n'est acceptable que sur un sous-ensemble lu par index
+        resultats_filtres = any(detail.startswith('SEARCH palmares_app_resultat') for detail in details)
+        if 'USE TEMP B-TREE FOR ORDER BY' in details and not resultats_filtres:
+            problemes.append("Tri de toute la table des résultats")
+        return problemes
+
+    def _problemes_postgresql(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+
+        problemes = []
+
+        def noeuds(noeud):
+            yield noeud
+            for enfant in noeud.get('Plans', []):
+                yield from noeuds(enfant)
+
+        for noeud in noeuds(plan[0]['Plan']):
+            if noeud['Node Type'] == 'Seq Scan' and noeud.get('Relation Name') in self.TABLES_VOLUMINEUSES:
+                problemes.append(f"Parcours séquentiel : {noeud['Relation Name']}")
+            if noeud['Node Type'] == 'Sort':
+                # Tri complet : les résultats triés ne sont restreints par aucun index
+                for enfant in noeuds(noeud):
+                    if enfant.get('Relation Name') == 'palmares_app_resultat' and not (
+                        'Index Cond' in enfant or 'Recheck Cond' in enfant
+                    ):
+                        problemes.append(f"Tri de toute la table des résultats ({enfant['Node Type']})")
+        return problemes
+
+    def test_home_sans_filtre(self):
+        url = reverse('palmares_app:home')
+        self.assertPlansIndexes(url, {'pagination': 'curseur'})
+        self.assertPlansIndexes(url, {'pagination': 'pages', 'page': 3})
+
+    def test_home_filtres(self):
+        url = reverse('palmares_app:home')
+        annee, classe, section = self.annees[1].annee, self.classes[2].nom, self.sections[0].nom
+        for filtres in (
+            {'annee': annee},
+            {'classe': classe},
+            {'annee': annee, 'classe': classe},
+            {'annee': annee, 'classe': classe, 'section': section},
+        ):
+            for pagination in ('curseur', 'pages'):
+                with self.subTest(filtres=filtres, pagination=pagination):
+                    self.assertPlansIndexes(url, {**filtres, 'pagination': pagination})
+
+    def test_home_page_suivante_par_curseur(self):
+        url = reverse('palmares_app:home')
+        resultat = Resultat.objects.select_related('eleve').order_by('pk')[500]
+        curseur = encoder_curseur(resultat)
+        self.assertPlansIndexes(url, {'pagination': 'curseur', 'apres': curseur})
+        self.assertPlansIndexes(url, {'pagination': 'curseur', 'avant': curseur})
+        self.assertPlansIndexes(url, {'pagination': 'curseur', 'apres': curseur, 'annee': self.annees[0].annee})
+        # Curseur parmi les résultats sans pourcentage
+        sans_note = encoder_curseur(Resultat.objects.filter(pourcentage__isnull=True).order_by('pk')[10])
+        self.assertPlansIndexes(url, {'pagination': 'curseur', 'apres': sans_note, 'classe': self.classes[0].nom})
+        self.assertPlansIndexes(url, {'pagination': 'curseur', 'avant': sans_note})
+
+    def test_export_pdf(self):
+        url = reverse('palmares_app:export_pdf')
+        self.assertPlansIndexes(url, {'annee': self.annees[0].annee, 'classe': self.classes[0].nom})
+        self.assertPlansIndexes(url, {'classe': self.classes[3].nom})
+
+    def test_admin_changelist(self):
+        url = reverse('admin:palmares_app_resultat_changelist')
+        self.assertPlansIndexes(url)
+        self.assertPlansIndexes(url, {'classe__id__exact': self.classes[1].pk})
+        self.assertPlansIndexes(url, {'annee_scolaire__id__exact': self.annees[2].pk})
+        self.assertPlansIndexes(url, {
+            'annee_scolaire__id__exact': self.annees[2].pk,
+            'classe__id__exact': self.classes[1].pk,
+        })
+
+    def test_historiques(self):
+        # Élèves différents à chaque appel : l'historique en cache ne relirait pas les résultats
+        eleves = list(Eleve.objects.order_by('pk').values_list('pk', flat=True)[:301])
+        self.assertPlansIndexes(reverse('palmares_app:historique_eleve', args=[eleves[0]]))
+        self.assertPlansIndexes(reverse('palmares_app:api_historiques'), {'eleves': ','.join(map(str, eleves[1:]))})
+
+    @skipUnless(connection.vendor == 'postgresql', "L'index de recherche (pg_trgm) n'existe que sur PostgreSQL")
+    def test_home_recherche(self):
+        self.assertPlansIndexes(reverse('palmares_app:home'), {'q': 'eleve 0042'})
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TEST, USE_X_ACCEL_REDIRECT=False, CACHES=CACHES_TEST)
+class ExportsTests(TestCase):
+    """Contenu des exports"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.annee = AnneeScolaire.objects.create(annee='2023-2024')
+        classe = Classe.objects.create(nom='6ème A')
+        section = Section.objects.create(nom='Générale')
+        for nom, pourcentage in (('Bah Awa', Decimal('80')), ('Camara Ali', None), ('Diallo Binta', Decimal('95'))):
+            Resultat.objects.create(
+                eleve=Eleve.objects.create(nom_complet=nom),
+                annee_scolaire=cls.annee, classe=classe, section=section, pourcentage=pourcentage,
+            )
+        recalculer_tous_les_rangs()
+
+    def test_palmares_par_classe_sans_note_en_dernier(self):
+        groupes = groupes_classes(self.annee.annee)
+        lignes = groupes[('6ème A', 'Générale')]
+        self.assertEqual([ligne[1] for ligne in lignes], ['Diallo Binta', 'Bah Awa', 'Camara Ali'])
+        self.assertEqual([ligne[0] for ligne in lignes], [1, 2, '-'])
+
+    def test_recherche_sans_note_en_dernier(self):
+        resultats = filtrer_recherche(Resultat.objects.all(), '6ème A')
+        self.assertEqual(
+            list(resultats.values_list('eleve__nom_complet', flat=True)),
+            ['Diallo Binta', 'Bah Awa', 'Camara Ali'],
+        )
+
+    def test_pdf_plusieurs_blocs(self):
+        # Plus de trois blocs de LIGNES_PAR_BLOC lignes : tous doivent être demandés et placés par reportlab
+        lignes = [[rang, f'Eleve {rang:04d}', '50.00%', '6ème A', 'Générale', '2023-2024'] for rang in range(1, 651)]
+        pdf = rendre_pdf(iter(lignes), 'Palmarès')
+        # Flux de page compressés (ASCII85 puis Flate)
+        contenu = b''.join(
+            zlib.decompress(base64.a85decode(flux.strip(), adobe=True))
+            for flux in re.findall(rb'\bstream\r?\n(.*?)endstream', pdf, re.S)
+        )
+        self.assertEqual(re.findall(rb'\(Eleve (\d{4})\)', contenu), [f'{rang:04d}'.encode() for rang in range(1, 651)])
+        pages = len(re.findall(rb'/Type /Page\b', pdf))
+        self.assertGreater(pages, 10)
+        self.assertIn(f'/Count {pages}'.encode(), pdf)
+
+    def test_zip_palmares(self):
+        # Rendu dans des processus issus du serveur forkserver, sans Django
+        tampon = io.BytesIO()
+        generer_zip_palmares(self.annee.annee, tampon, processus=2)
+        with zipfile.ZipFile(tampon) as archive:
+            self.assertEqual(archive.namelist(), ['palmares_6ème_A_Générale_2023-2024.pdf'])
+            self.assertTrue(archive.read(archive.namelist()[0]).startswith(b'%PDF'))
+
+    def test_zip_palmares_plusieurs_groupes(self):
+        # Les PDF, écrits dans des fichiers temporaires, sont tous ajoutés à l'archive puis supprimés
+        for nom in ('6ème B', '5ème A'):
+            Resultat.objects.create(
+                eleve=Eleve.objects.create(nom_complet=f'Eleve {nom}'), annee_scolaire=self.annee,
+                classe=Classe.objects.create(nom=nom), section=Section.objects.get(nom='Générale'),
+                pourcentage=Decimal('70'),
+            )
+        tampon = io.BytesIO()
+        repertoire = tempfile.mkdtemp(prefix='palmares_zip_tests_')
+        self.addCleanup(shutil.rmtree, repertoire, ignore_errors=True)
+        with mock.patch('tempfile.tempdir', repertoire):
+            generer_zip_palmares(self.annee.annee, tampon, processus=2)
+            self.assertEqual(os.listdir(repertoire), [])
+        with zipfile.ZipFile(tampon) as archive:
+            self.assertEqual(sorted(archive.namelist()), [
+                'palmares_5ème_A_Générale_2023-2024.pdf',
+                'palmares_6ème_A_Générale_2023-2024.pdf',
+                'palmares_6ème_B_Générale_2023-2024.pdf',
+            ])
+            for nom_fichier in archive.namelist():
+                self.assertTrue(archive.read(nom_fichier).startswith(b'%PDF'))
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TEST, USE_X_ACCEL_REDIRECT=False, CACHES=CACHES_TEST)
+class ExportReimportTests(TestCase):
+    """Un export CSV ou Excel réimporté tel quel ne change rien"""
+
+    @classmethod
+    def setUpTestData(cls):
+        # Ids de référence restés en cache après une autre classe de tests
+        caches['default'].clear()
+        with cls.captureOnCommitCallbacks(execute=True):
+            ImportateurResultats().importer([
+                LigneFichier(2, 'Bah Awa', 85.55, '6ème A', 'Générale', '2023-2024'),
+                # Séparateurs et guillemets dans les cellules
+                LigneFichier(3, 'Camara, Ali "Junior"', 70, '6ème A', 'Générale', '2023-2024'),
+                LigneFichier(4, 'Diallo Binta', None, '5ème B', 'Scientifique', '2023-2024'),
+                LigneFichier(5, 'Sow Fatou', 100, '5ème B', 'Scientifique', '2023-2024'),
+                LigneFichier(6, 'Bah Awa', 60, '6ème A', 'Générale', '2022-2023'),
+            ])
+        cls.utilisateur = User.objects.create_user('lecteur', password='motdepasse')
+
+    def setUp(self):
+        caches['default'].clear()
+        self.client.force_login(self.utilisateur)
+
+    def exporter(self, vue, nom_fichier):
+        response = self.client.get(reverse(vue), {'annee': '2023-2024'})
+        self.assertEqual(response.status_code, 200)
+        contenu = io.BytesIO(b''.join(response.streaming_content))
+        return list(lire_lignes(contenu, nom_fichier))
+
+    def assertReimportInchange(self, lignes):
+        # Export filtré : seule l'année demandée
+        self.assertEqual(len(lignes), 4)
+        with CaptureQueriesContext(connection) as requetes:
+            rapport = ImportateurResultats().importer(lignes)
+        self.assertEqual(rapport.errors, [])
+        self.assertEqual(
+            (rapport.imported_count, rapport.updated_count, rapport.unchanged_count),
+            (0, 0, 4),
+        )
+        self.assertFalse([requete for requete in requetes if requete['sql'].startswith(('INSERT', 'UPDATE'))])
+
+    def test_csv(self):
+        self.assertReimportInchange(self.exporter('palmares_app:export_csv', 'resultats.csv'))
+
+    def test_xlsx(self):
+        self.assertReimportInchange(self.exporter('palmares_app:export_xlsx', 'resultats.xlsx'))
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TEST, USE_X_ACCEL_REDIRECT=True, CACHES=CACHES_TEST)
+class TelechargementsTests(TestCase):
+    """Téléchargements : authentification avant la remise du fichier à nginx"""
+
+    def test_export_pdf_anonyme(self):
+        response = self.client.get(reverse('palmares_app:export_pdf'))
+        self.assertRedirects(
+            response, f"{reverse('palmares_app:login')}?next={reverse('palmares_app:export_pdf')}",
+            fetch_redirect_response=False,
+        )
+        self.assertNotIn('X-Accel-Redirect', response)
+
+    async def test_export_pdf_anonyme_asgi(self):
+        request = AsyncRequestFactory().get(reverse('palmares_app:export_pdf'))
+        async def auser():
+            return AnonymousUser()
+        request.auser = auser
+        response = await views_async.export_pdf(request)
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response['Location'].startswith(reverse('palmares_app:login')))
+        self.assertNotIn('X-Accel-Redirect', response)
+
+
+@override_settings(USE_X_ACCEL_REDIRECT=False, CACHES=CACHES_TEST)
+class CacheExportsTests(TestCase):
+    """Cache disque des exports : clé, invalidation par la version, éviction LRU"""
+
+    def setUp(self):
+        caches['default'].clear()
+        media = tempfile.mkdtemp(prefix='palmares_exports_')
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        reglages = override_settings(MEDIA_ROOT=media, EXPORT_CACHE_MAX_BYTES=250)
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        self.generations = []
+
+    def generer(self, contenu=b'x' * 100):
+        def ecrire(fichier):
+            self.generations.append(contenu)
+            fichier.write(contenu)
+        return ecrire
+
+    def chemin(self, nom_fichier):
+        return os.path.join(repertoire_cache(), nom_fichier)
+
+    def test_cle_ignore_ordre_et_espaces(self):
+        cle = cle_export('csv', {'classe': '6ème A', 'annee': '2023-2024', 'q': ''}, 3)
+        self.assertEqual(cle, cle_export('csv', {'annee': ' 2023-2024 ', 'classe': '6ème A '}, 3))
+        self.assertNotEqual(cle, cle_export('csv', {'classe': '6ème A', 'annee': '2023-2024'}, 4))
+        self.assertNotEqual(cle, cle_export('xlsx', {'classe': '6ème A', 'annee': '2023-2024'}, 3))
+        self.assertNotEqual(cle, cle_export('csv', {'classe': '6ème B', 'annee': '2023-2024'}, 3))
+
+    def test_invalidation_par_la_version(self):
+        premier = preparer_export({'classe': '6ème A'}, 'csv', self.generer())
+        self.assertEqual(preparer_export({'classe': '6ème A'}, 'csv', self.generer()), premier)
+        self.assertEqual(len(self.generations), 1)
+
+        incrementer_version()
+        second = preparer_export({'classe': '6ème A'}, 'csv', self.generer())
+        self.assertNotEqual(second, premier)
+        self.assertEqual(len(self.generations), 2)
+
+    def test_eviction_du_moins_recemment_servi(self):
+        # 250 octets : deux exports de 100 octets tiennent, pas trois
+        ancien = preparer_export({'classe': 'A'}, 'csv', self.generer())
+        recent = preparer_export({'classe': 'B'}, 'csv', self.generer())
+        # « ancien » est resservi : c'est « recent » qui devient le moins récemment servi
+        for nom_fichier, age in ((ancien, 20), (recent, 10)):
+            os.utime(self.chemin(nom_fichier), (time.time() - age, time.time() - age))
+        preparer_export({'classe': 'A'}, 'csv', self.generer())
+
+        troisieme = preparer_export({'classe': 'C'}, 'csv', self.generer())
+        self.assertTrue(os.path.exists(self.chemin(ancien)))
+        self.assertFalse(os.path.exists(self.chemin(recent)))
+        self.assertTrue(os.path.exists(self.chemin(troisieme)))
+        self.assertEqual(len(self.generations), 3)
+
+    def test_export_resservi_non_modifie(self):
+        # L'accès LRU ne doit pas avancer Last-Modified : If-Modified-Since donne un 304
+        nom_fichier = preparer_export({}, 'csv', self.generer())
+        genere = time.time() - 3600
+        os.utime(self.chemin(nom_fichier), (genere, genere))
+
+        request = RequestFactory().get('/export/')
+        response = servir_export(request, {}, 'csv', 'text/csv', 'export.csv', self.generer())
+        response.close()
+        self.assertEqual(response['Last-Modified'], http_date(int(genere)))
+
+        request = RequestFactory().get('/export/', headers={'If-Modified-Since': response['Last-Modified']})
+        response = servir_export(request, {}, 'csv', 'text/csv', 'export.csv', self.generer())
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(self.generations), 1)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TEST, USE_X_ACCEL_REDIRECT=False)
+class PlagesTests(TestCase):
+    """Téléchargement servi par Django : plages (Range, If-Range) et chemins hors de MEDIA_ROOT"""
+
+    CONTENU = bytes(range(256)) * 4
+
+    @classmethod
+    def setUpTestData(cls):
+        os.makedirs(os.path.join(MEDIA_TEST, 'plages'), exist_ok=True)
+        with open(os.path.join(MEDIA_TEST, 'plages', 'fichier.bin'), 'wb') as fichier:
+            fichier.write(cls.CONTENU)
+
+    def servir(self, chemin='plages/fichier.bin', **entetes):
+        request = RequestFactory().get('/telechargement/', headers=entetes)
+        return servir_fichier(request, chemin, 'fichier.bin', 'application/octet-stream')
+
+    @staticmethod
+    def contenu(response):
+        contenu = b''.join(response.streaming_content)
+        response.close()
+        return contenu
+
+    def test_plage(self):
+        response = self.servir(Range='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 100-199/1024')
+        self.assertEqual(response['Content-Length'], '100')
+        self.assertEqual(self.contenu(response), self.CONTENU[100:200])
+
+        response = self.servir(Range='bytes=-24')
+        self.assertEqual(response['Content-Range'], 'bytes 1000-1023/1024')
+        self.assertEqual(self.contenu(response), self.CONTENU[-24:])
+
+    def test_plage_hors_du_fichier(self):
+        response = self.servir(Range='bytes=2000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+
+    def test_if_range(self):
+        response = self.servir()
+        etag = response['ETag']
+        response.close()
+        response = self.servir(Range='bytes=0-9', If_Range=etag)
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.contenu(response), self.CONTENU[:10])
+
+        # Fichier modifié depuis : le fichier entier, pas la plage
+        response = self.servir(Range='bytes=0-9', If_Range='"perime"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.contenu(response), self.CONTENU)
+
+    def test_chemin_hors_media(self):
+        for chemin in ('../../etc/passwd', '/etc/passwd', 'plages/../../fichier.bin'):
+            with self.subTest(chemin=chemin):
+                with self.assertRaises(Http404):
+                    self.servir(chemin)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TEST, CACHES=CACHES_TEST)
+class ImportTests(TestCase):
+    """Moteur d'import : compteurs, erreurs et reprise après une erreur d'écriture"""
+
+    def setUp(self):
+        # Le cache des références n'est invalidé qu'après validation, jamais dans un TestCase
+        caches['default'].clear()
+
+    @staticmethod
+    def lignes(*valeurs):
+        return [LigneFichier(numero, *ligne) for numero, ligne in enumerate(valeurs, start=2)]
+
+    def importer(self, *valeurs, **options):
+        return ImportateurResultats(**options).importer(self.lignes(*valeurs))
+
+    def test_compteurs(self):
+        rapport = self.importer(
+            ('Bah Awa', 80, '6ème A', 'Générale', '2023-2024'),
+            ('Camara Ali', 70, '6ème A', 'Générale', '2023-2024'),
+        )
+        self.assertEqual((rapport.imported_count, rapport.updated_count, rapport.unchanged_count), (2, 0, 0))
+
+        rapport = self.importer(
+            ('Bah Awa', 85, '6ème A', 'Générale', '2023-2024'),
+            ('Diallo Binta', 95, '6ème A', 'Générale', '2023-2024'),
+        )
+        self.assertEqual((rapport.imported_count, rapport.updated_count, rapport.unchanged_count), (1, 1, 0))
+        self.assertEqual(Resultat.objects.get(eleve__nom_complet='Bah Awa').pourcentage, Decimal('85'))
+        self.assertEqual(Resultat.objects.count(), 3)
+
+    def test_fichier_reimporte_inchange(self):
+        lignes = (
+            ('Bah Awa', 80, '6ème A', 'Générale', '2023-2024'),
+            ('Camara Ali', None, '6ème A', 'Générale', '2023-2024'),
+            ('Diallo Binta', 95, '6ème B', 'Scientifique', '2023-2024'),
+        )
+        self.importer(*lignes)
+        version = version_courante()
+        etat = list(Resultat.objects.order_by('pk').values_list('rang_classe', 'rang_annee', 'eleve__version_historique'))
+
+        rapport = self.importer(*lignes)
+        self.assertEqual((rapport.imported_count, rapport.updated_count, rapport.unchanged_count), (0, 0, 3))
+        self.assertEqual(version_courante(), version)
+        self.assertEqual(
+            list(Resultat.objects.order_by('pk').values_list('rang_classe', 'rang_annee', 'eleve__version_historique')),
+            etat,
+        )
+
+    def test_pourcentage_vide_conserve_a_la_mise_a_jour(self):
+        self.importer(('Bah Awa', 80, '6ème A', 'Générale', '2023-2024'))
+        rapport = self.importer(('Bah Awa', None, '6ème B', 'Générale', '2023-2024'))
+        self.assertEqual(rapport.updated_count, 1)
+        resultat = Resultat.objects.select_related('classe').get()
+        self.assertEqual((resultat.classe.nom, resultat.pourcentage), ('6ème B', Decimal('80')))
+
+    def test_pourcentage_vide_conserve_en_conflit(self):
+        # Résultat créé par un import concurrent entre la lecture des existants et l'insertion
+        self.importer(('Bah Awa', 80, '6ème A', 'Générale', '2023-2024'))
+        existant = Resultat.objects.get()
+        importateur = ImportateurResultats()
+        importateur._inserer([
+            Resultat(
+                eleve_id=existant.eleve_id, annee_scolaire_id=existant.annee_scolaire_id,
+                classe_id=existant.classe_id, section_id=existant.section_id, pourcentage=None,
+            )
+        ])
+        self.assertEqual(Resultat.objects.get().pourcentage, Decimal('80'))
+
+    def test_erreurs_de_validation(self):
+        rapport = self.importer(
+            ('Bah Awa', 80, None, 'Générale', '2023-2024'),
+            ('x' * 256, 80, '6ème A', 'Générale', '2023-2024'),
+            ('Camara Ali', 70, '6ème A', 'Générale', '2023-2024'),
+        )
+        self.assertEqual(rapport.errors, [
+            "Ligne 2: Champs requis manquants (Nom complet, Classe, Section, Année scolaire sont obligatoires)",
+            "Ligne 3: Nom complet dépasse 255 caractères",
+        ])
+        self.assertEqual(rapport.imported_count, 1)
+        self.assertEqual(list(Resultat.objects.values_list('eleve__nom_complet', flat=True)), ['Camara Ali'])
+
+    def test_simulation_rejette_comme_l_import(self):
+        valeurs = (
+            ('Bah Awa', 'nan', '6ème A', 'Générale', '2023-2024'),
+            ('Camara Ali', 'abc', '6ème A', 'Générale', '2023-2024'),
+            ('Diallo Binta', 101, '6ème A', 'Générale', '2023-2024'),
+            ('Sow Fatou', None, '6ème A', 'Générale', '2023-2024'),
+        )
+        apercu = simuler_import(self.lignes(*valeurs))
+        rapport = self.importer(*valeurs)
+        attendues = [
+            "Ligne 2: Pourcentage doit être un nombre valide",
+            "Ligne 3: Pourcentage doit être un nombre valide",
+            "Ligne 4: Pourcentage doit être entre 0 et 100",
+        ]
+        self.assertEqual([ligne['raison'] for ligne in apercu.lignes if ligne['action'] == REJETE], attendues)
+        self.assertEqual(rapport.errors, attendues)
+        self.assertEqual((apercu.crees, rapport.imported_count), (1, 1))
+
+    def test_simulation_arrondit_comme_l_import(self):
+        self.importer(
+            ('Bah Awa', 80, '6ème A', 'Générale', '2023-2024'),
+            ('Camara Ali', 80, '6ème A', 'Générale', '2023-2024'),
+        )
+        # Valeurs à mi-chemin : arrondi au pair, et non celui du flottant binaire
+        valeurs = (
+            ('Bah Awa', 85.555, '6ème A', 'Générale', '2023-2024'),
+            ('Camara Ali', '85.545', '6ème A', 'Générale', '2023-2024'),
+        )
+        with self.assertNumQueries(1):
+            apercu = simuler_import(self.lignes(*valeurs))
+        self.assertEqual([ligne['raison'] for ligne in apercu.lignes], [
+            "Pourcentage: 80.00% → 85.56%",
+            "Pourcentage: 80.00% → 85.54%",
+        ])
+
+        rapport = self.importer(*valeurs)
+        self.assertEqual(rapport.updated_count, 2)
+        self.assertEqual(
+            list(Resultat.objects.order_by('eleve__nom_complet').values_list('pourcentage', flat=True)),
+            [Decimal('85.56'), Decimal('85.54')],
+        )
+        # Réimport des mêmes valeurs : inchangé, comme l'annonce l'aperçu
+        self.assertEqual(simuler_import(self.lignes(*valeurs)).inchanges, 2)
+        self.assertEqual(self.importer(*valeurs).unchanged_count, 2)
+
+    def test_lots_successifs(self):
+        progression = []
+        rapport = self.importer(
+            ('Bah Awa', 80, '6ème A', 'Générale', '2023-2024'),
+            ('Camara Ali', 70, '6ème A', 'Générale', '2023-2024'),
+            ('Diallo Binta', 95, '6ème A', 'Générale', '2023-2024'),
+            # Même élève et même année qu'au premier lot : mise à jour
+            ('Bah Awa', 60, '6ème A', 'Générale', '2023-2024'),
+            ('Sow Fatou', 50, '6ème B', 'Scientifique', '2022-2023'),
+            taille_lot=2,
+            progression=lambda rapport: progression.append(rapport.lignes_traitees),
+        )
+        self.assertEqual(progression, [2, 4, 5])
+        self.assertEqual((rapport.imported_count, rapport.updated_count, rapport.errors), (4, 1, []))
+        self.assertEqual(Classe.objects.filter(nom='6ème A').count(), 1)
+        self.assertEqual(
+            list(Resultat.objects.filter(annee_scolaire__annee='2023-2024').values_list(
+                'eleve__nom_complet', 'pourcentage', 'rang_classe'
+            )),
+            [('Diallo Binta', Decimal('95'), 1), ('Camara Ali', Decimal('70'), 2), ('Bah Awa', Decimal('60'), 3)],
+        )
+
+    def test_lot_reessaye_apres_erreur(self):
+        ecrire = ImportateurResultats._ecrire
+        appels = []
+
+        def ecrire_une_erreur(importateur, valides):
+            appels.append(len(valides))
+            if len(appels) == 1:
+                raise IntegrityError("référence disparue")
+            return ecrire(importateur, valides)
+
+        with mock.patch.object(ImportateurResultats, '_ecrire', ecrire_une_erreur):
+            rapport = self.importer(
+                ('Bah Awa', 80, '6ème A', 'Générale', '2023-2024'),
+                ('Camara Ali', 70, '6ème A', 'Générale', '2023-2024'),
+            )
+        self.assertEqual(appels, [2, 2])
+        self.assertEqual(rapport.imported_count, 2)
+        self.assertEqual(rapport.errors, [])
+
+    def test_lignes_fautives_seules_rejetees(self):
+        inserer = ImportateurResultats._inserer
+
+        def inserer_sauf_13(importateur, nouveaux):
+            if any(resultat.pourcentage == 13 for resultat in nouveaux):
+                raise IntegrityError("refusé")
+            return inserer(importateur, nouveaux)
+
+        with mock.patch.object(ImportateurResultats, '_inserer', inserer_sauf_13):
+            rapport = self.importer(
+                ('Bah Awa', 80, '6ème A', 'Générale', '2023-2024'),
+                ('Camara Ali', 13, '6ème A', 'Générale', '2023-2024'),
+                ('Diallo Binta', 95, '6ème B', 'Générale', '2023-2024'),
+            )
+        self.assertEqual(rapport.imported_count, 2)
+        self.assertEqual([detail['ligne'] for detail in rapport.error_details], [3])
+        self.assertIn("Erreur inattendue", rapport.errors[0])
+        self.assertEqual(
+            sorted(Resultat.objects.values_list('eleve__nom_complet', flat=True)), ['Bah Awa', 'Diallo Binta']
+        )
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TEST, CACHES=CACHES_TEST)
+class IngestionFichiersTests(TestCase):
+    """Import de fichiers CSV et Excel lus en flux : plusieurs lots, lignes en erreur mêlées aux valides"""
+
+    # Ligne 5 vide (ignorée) ; lignes 3, 6 et 7 en erreur ; Bah Awa mis à jour au dernier lot
+    LIGNES = [
+        ('Bah Awa', 80, '6ème A', 'Générale', '2023-2024'),
+        ('Camara Ali', 'abc', '6ème A', 'Générale', '2023-2024'),
+        ('Diallo Binta', 12.5, '6ème A', 'Générale', '2023-2024'),
+        (None, None, None, None, None),
+        ('Sow Fatou', 101, '6ème A', 'Générale', '2023-2024'),
+        ('Keita Moussa', 70, None, 'Générale', '2023-2024'),
+        ('Barry Issa', 65, '6ème B', 'Scientifique', '2023-2024'),
+        ('Condé Mariam', 90, '6ème B', 'Scientifique', '2023-2024'),
+        ('Bah Awa', 85, '6ème A', 'Générale', '2023-2024'),
+    ]
+
+    def setUp(self):
+        caches['default'].clear()
+
+    def fichier_csv(self):
+        # Séparateur point-virgule et virgule décimale, comme les CSV d'Excel en français
+        lignes = ['Nom complet;Pourcentage;Classe;Section;Année scolaire']
+        for ligne in self.LIGNES:
+            lignes.append(';'.join(
+                '' if valeur is None else str(valeur).replace('.', ',') for valeur in ligne
+            ))
+        return SimpleUploadedFile('resultats.csv', ('\ufeff' + '\r\n'.join(lignes) + '\r\n').encode())
+
+    def fichier_xlsx(self):
+        import openpyxl
+
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append(['Nom complet', 'Pourcentage', 'Classe', 'Section', 'Année scolaire'])
+        for ligne in self.LIGNES:
+            sheet.append(list(ligne))
+        tampon = io.BytesIO()
+        workbook.save(tampon)
+        return SimpleUploadedFile('resultats.xlsx', tampon.getvalue())
+
+    def verifier_import(self, fichier):
+        progression = []
+        rapport = ImportateurResultats(
+            taille_lot=3, progression=lambda rapport: progression.append(rapport.lignes_traitees),
+        ).importer(lire_lignes(fichier))
+
+        # Huit lignes non vides, traitées en trois lots
+        self.assertEqual(progression, [3, 6, 8])
+        self.assertEqual((rapport.imported_count, rapport.updated_count, rapport.unchanged_count), (4, 1, 0))
+        self.assertEqual(rapport.errors, [
+            "Ligne 3: Pourcentage doit être un nombre valide",
+            "Ligne 6: Pourcentage doit être entre 0 et 100",
+            "Ligne 7: Champs requis manquants (Nom complet, Classe, Section, Année scolaire sont obligatoires)",
+        ])
+        self.assertEqual([(detail['ligne'], detail['donnees']) for detail in rapport.error_details], [
+            (3, ('Camara Ali', 'abc', '6ème A', 'Générale', '2023-2024')),
+            (6, ('Sow Fatou', 101, '6ème A', 'Générale', '2023-2024')),
+            (7, ('Keita Moussa', 70, None, 'Générale', '2023-2024')),
+        ])
+        self.assertEqual(
+            list(Resultat.objects.order_by('eleve__nom_complet').values_list('eleve__nom_complet', 'pourcentage')),
+            [
+                ('Bah Awa', Decimal('85')), ('Barry Issa', Decimal('65')),
+                ('Condé Mariam', Decimal('90')), ('Diallo Binta', Decimal('12.5')),
+            ],
+        )
+
+    def test_csv(self):
+        self.verifier_import(self.fichier_csv())
+
+    def test_xlsx(self):
+        self.verifier_import(self.fichier_xlsx())
+
+    def test_lecture_en_flux(self):
+        # Générateur numérotant les lignes comme le fichier (la ligne vide est sautée)
+        for fichier in (self.fichier_csv(), self.fichier_xlsx()):
+            with self.subTest(fichier.name):
+                lignes = lire_lignes(fichier)
+                self.assertEqual(next(lignes).nom_complet, 'Bah Awa')
+                self.assertEqual([ligne.numero for ligne in lignes], [3, 4, 6, 7, 8, 9, 10])
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TEST, CACHES=CACHES_TEST)
+class SignauxTests(TestCase):
+    """Modifications hors import : rangs et statistiques recalculés une fois par transaction"""
+
+    @classmethod
+    def setUpTestData(cls):
+        # Modifications appliquées ici : aucune n'est en attente au début de chaque test
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.annee = AnneeScolaire.objects.create(annee='2023-2024')
+            classe = Classe.objects.create(nom='6ème A')
+            section = Section.objects.create(nom='Générale')
+            for numero in range(6):
+                Resultat.objects.create(
+                    eleve=Eleve.objects.create(nom_complet=f"Élève {numero}"),
+                    annee_scolaire=cls.annee, classe=classe, section=section, pourcentage=50 + numero,
+                )
+
+    def rangs(self):
+        return list(Resultat.objects.values_list('eleve__nom_complet', 'rang_classe'))
+
+    def test_suppression_en_masse(self):
+        with CaptureQueriesContext(connection) as requetes:
+            with self.captureOnCommitCallbacks(execute=True) as rappels:
+                with transaction.atomic():
+                    Resultat.objects.filter(pourcentage__gte=53).delete()
+                    suppressions = len(requetes)
+        # Un seul passage après validation, aucune requête de rang ou statistique par résultat
+        self.assertEqual(len(rappels), 1)
+        self.assertLess(suppressions, 6)
+        self.assertEqual(self.rangs(), [('Élève 2', 1), ('Élève 1', 2), ('Élève 0', 3)])
+        self.assertEqual(resume(annee_scolaire_id=self.annee.pk)['nombre'], 3)
+
+    def test_suppression_en_cascade(self):
+        with self.captureOnCommitCallbacks(execute=True) as rappels:
+            Eleve.objects.filter(nom_complet__in=['Élève 5', 'Élève 4']).delete()
+        self.assertEqual(len(rappels), 1)
+        self.assertEqual(self.rangs()[0], ('Élève 3', 1))
+
+    def test_point_de_sauvegarde_annule(self):
+        resultat = Resultat.objects.get(eleve__nom_complet='Élève 0')
+        with self.captureOnCommitCallbacks(execute=True) as rappels:
+            with transaction.atomic():
+                try:
+                    with transaction.atomic():
+                        Resultat.objects.filter(eleve__nom_complet='Élève 5').delete()
+                        raise IntegrityError
+                except IntegrityError:
+                    pass
+                resultat.pourcentage = 99
+                resultat.save()
+        self.assertEqual(len(rappels), 1)
+        self.assertEqual(self.rangs()[:2], [('Élève 0', 1), ('Élève 5', 2)])
+
+    @staticmethod
+    def statistiques():
+        """{classe: (nombre, notes, somme, min, max)} lus dans StatistiqueGroupe"""
+        return {
+            ligne[0]: ligne[1:]
+            for ligne in StatistiqueGroupe.objects.values_list('classe__nom', *CHAMPS_AGREGATS)
+        }
+
+    def test_statistiques_insertion(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Resultat.objects.create(
+                eleve=Eleve.objects.create(nom_complet='Élève 6'), annee_scolaire=self.annee,
+                classe=Classe.objects.get(nom='6ème A'), section=Section.objects.get(nom='Générale'),
+                pourcentage=Decimal('90'),
+            )
+            Resultat.objects.create(
+                eleve=Eleve.objects.create(nom_complet='Élève 7'), annee_scolaire=self.annee,
+                classe=Classe.objects.get(nom='6ème A'), section=Section.objects.get(nom='Générale'),
+            )
+        self.assertEqual(self.statistiques(), {'6ème A': (8, 7, Decimal('405'), Decimal('50'), Decimal('90'))})
+        self.assertEqual(resume(classe__nom='6ème A')['moyenne'], Decimal('57.86'))
+
+    def test_statistiques_modification(self):
+        resultat = Resultat.objects.get(eleve__nom_complet='Élève 0')
+        resultat.pourcentage = Decimal('70')
+        with self.captureOnCommitCallbacks(execute=True):
+            resultat.save()
+        self.assertEqual(self.statistiques(), {'6ème A': (6, 6, Decimal('335'), Decimal('51'), Decimal('70'))})
+
+        # Changement de classe : l'ancien groupe et le nouveau sont recalculés
+        with self.captureOnCommitCallbacks(execute=True):
+            resultat.classe = Classe.objects.create(nom='6ème B')
+            resultat.save()
+        self.assertEqual(self.statistiques(), {
+            '6ème A': (5, 5, Decimal('265'), Decimal('51'), Decimal('55')),
+            '6ème B': (1, 1, Decimal('70'), Decimal('70'), Decimal('70')),
+        })
+
+    def test_statistiques_suppression(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Resultat.objects.get(eleve__nom_complet='Élève 5').delete()
+        self.assertEqual(self.statistiques(), {'6ème A': (5, 5, Decimal('260'), Decimal('50'), Decimal('54'))})
+
+        # Dernier résultat du groupe supprimé : sa ligne disparaît
+        with self.captureOnCommitCallbacks(execute=True):
+            Resultat.objects.all().delete()
+        self.assertEqual(self.statistiques(), {})
+        self.assertEqual(resume(classe__nom='6ème A')['nombre'], 0)
+
+    def recherche(self, terme):
+        return sorted(filtrer_recherche(Resultat.objects.all(), terme).values_list('eleve__nom_complet', flat=True))
+
+    def test_renommage_reindexe(self):
+        classe = Classe.objects.get(nom='6ème A')
+        classe.nom = '6ème Bleue'
+        with self.captureOnCommitCallbacks(execute=True):
+            classe.save()
+        self.assertEqual(len(self.recherche('6eme bleue')), 6)
+        self.assertEqual(self.recherche('6eme a'), [])
+
+    def test_enregistrement_sans_renommage(self):
+        classe = Classe.objects.get(nom='6ème A')
+        with CaptureQueriesContext(connection) as requetes:
+            with self.captureOnCommitCallbacks(execute=True):
+                classe.save()
+        # Ni relecture ni réécriture des résultats de la classe
+        self.assertFalse([requete for requete in requetes if 'palmares_app_resultat' in requete['sql']])
+
+    def test_migration_remplit_recherche(self):
+        Resultat.objects.update(recherche='')
+        migration = importlib.import_module('palmares_app.migrations.0003_remplir_recherche')
+        etat = MigrationLoader(connection).project_state(('palmares_app', '0003_remplir_recherche'))
+        migration.remplir_recherche(etat.apps, connection.schema_editor())
+        self.assertEqual(self.recherche('eleve 3'), ['Élève 3'])
+        self.assertFalse(Resultat.objects.filter(recherche='').exists())
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TEST, CACHES=CACHES_TEST)
+class WorkerImportTests(TestCase):
+    """Worker d'import : un job qui échoue ne l'arrête pas, un job abandonné repart de zéro"""
+
+    def test_erreur_hors_import(self):
+        # Une ligne en erreur : l'écriture du journal d'erreurs échoue après l'import
+        jobs = [
+            creer_job(ContentFile(
+                "Nom complet,Pourcentage,Classe,Section,Année scolaire\n"
+                "Bah Awa,80,6ème A,Générale,2023-2024\n"
+                "Camara Ali,150,6ème A,Générale,2023-2024\n",
+                name=f"import_{numero}.csv",
+            ))
+            for numero in range(2)
+        ]
+        with mock.patch('palmares_app.jobs.ecrire_journal_erreurs', side_effect=OSError("disque plein")), \
+                self.assertLogs('palmares_app.management.commands.import_worker', 'ERROR') as journaux:
+            call_command('import_worker', une_fois=True, stdout=StringIO(), stderr=StringIO())
+
+        self.assertEqual(len(journaux.records), 2)
+        for job in jobs:
+            job.refresh_from_db()
+            self.assertEqual(job.statut, ImportJob.ECHOUE)
+            self.assertEqual(job.message, "Erreur lors de l'import: disque plein")
+
+    def job_en_cours(self, depuis):
+        job = creer_job(ContentFile("Nom complet\n", name='import.csv'))
+        # update() : date_maj n'est pas remise à maintenant
+        ImportJob.objects.filter(pk=job.pk).update(
+            statut=ImportJob.EN_COURS, date_maj=timezone.now() - depuis,
+            lignes_traitees=1000, nb_importes=600, nb_mis_a_jour=300, nb_inchanges=90, nb_erreurs=10,
+        )
+        return job
+
+    def test_job_abandonne_remis_a_zero(self):
+        job = self.job_en_cours(DELAI_ABANDON + timedelta(minutes=1))
+        self.assertEqual(remettre_jobs_abandonnes(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.statut, ImportJob.EN_ATTENTE)
+        self.assertEqual(
+            (job.lignes_traitees, job.nb_importes, job.nb_mis_a_jour, job.nb_inchanges, job.nb_erreurs),
+            (0, 0, 0, 0, 0),
+        )
+
+    def test_battement(self):
+        # Aucun lot terminé depuis longtemps, mais le worker est toujours là
+        job = self.job_en_cours(DELAI_ABANDON + timedelta(minutes=1))
+        Battement(job).battre()
+        self.assertEqual(remettre_jobs_abandonnes(), 0)
+
+        battements = threading.Event()
+        with mock.patch.object(Battement, 'battre', side_effect=battements.set):
+            with Battement(job, intervalle=timedelta(milliseconds=10)):
+                self.assertTrue(battements.wait(5))
+
+
+@override_settings(USE_X_ACCEL_REDIRECT=False, CACHES=CACHES_TEST)
+class JournauxTests(TestCase):
+    """Logs des erreurs d'import : rétention, purge et téléchargement compressé"""
+
+    ERREURS = [
+        {'ligne': 2, 'donnees': ('Bah Awa', 'abc', '6ème A', 'Générale', '2023-2024'),
+         'erreur': "Ligne 2: Pourcentage doit être un nombre valide"},
+        {'ligne': 3, 'donnees': ('Camara Ali', 70, None, 'Générale', '2023-2024'),
+         'erreur': "Ligne 3: Champs requis manquants"},
+    ]
+
+    def setUp(self):
+        media = tempfile.mkdtemp(prefix='palmares_journaux_')
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        reglages = override_settings(MEDIA_ROOT=media)
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+
+    def journal(self, age_jours=0):
+        journal = ecrire_journal_erreurs(self.ERREURS)
+        if age_jours:
+            journal.date_creation = timezone.now() - timedelta(days=age_jours)
+            journal.save(update_fields=['date_creation'])
+        return journal
+
+    @staticmethod
+    def existe(journal):
+        return os.path.exists(os.path.join(settings.MEDIA_ROOT, journal.chemin))
+
+    def test_retention_par_age(self):
+        ancien, recent = self.journal(age_jours=400), self.journal(age_jours=10)
+        self.assertEqual(purger(jours=365, taille_max=0), 1)
+        self.assertEqual(list(JournalErreurs.objects.all()), [recent])
+        self.assertFalse(self.existe(ancien))
+        self.assertTrue(self.existe(recent))
+
+    def test_retention_par_taille(self):
+        journaux = [self.journal(age_jours=age) for age in (30, 20, 10)]
+        total = sum(journal.taille_octets for journal in journaux)
+        # Un octet de trop : seul le plus ancien est supprimé
+        self.assertEqual(purger(jours=0, taille_max=total - 1), 1)
+        self.assertEqual(list(JournalErreurs.objects.order_by('date_creation')), journaux[1:])
+        self.assertEqual([self.existe(journal) for journal in journaux], [False, True, True])
+        self.assertEqual(purger(jours=0, taille_max=total), 0)
+
+    def test_fichier_deja_absent(self):
+        journal = self.journal(age_jours=400)
+        os.remove(os.path.join(settings.MEDIA_ROOT, journal.chemin))
+        self.assertEqual(purger(jours=365, taille_max=0), 1)
+        self.assertFalse(JournalErreurs.objects.exists())
+
+    def test_commande_indexe_les_anciens_csv(self):
+        repertoire = os.path.join(settings.MEDIA_ROOT, 'import_errors')
+        os.makedirs(repertoire)
+        contenu = 'Ligne,Nom complet,Pourcentage,Classe,Section,Année scolaire,Erreur\r\n2,Bah Awa,abc,6ème A,Générale,2023-2024,Invalide\r\n'
+        with open(os.path.join(repertoire, 'import_errors_ancien.csv'), 'w', encoding='utf-8', newline='') as fichier:
+            fichier.write(contenu)
+        self.journal(age_jours=400)
+
+        sortie = StringIO()
+        call_command('purger_journaux', '--indexer-anciens', '--jours', '365', stdout=sortie)
+        self.assertIn("1 ancien(s) log(s) indexé(s)", sortie.getvalue())
+        self.assertIn("1 log(s) supprimé(s)", sortie.getvalue())
+
+        journal = JournalErreurs.objects.get()
+        self.assertEqual((journal.nom_fichier, journal.nb_erreurs), ('import_errors_ancien.csv.gz', 1))
+        self.assertEqual(os.listdir(repertoire), ['import_errors_ancien.csv.gz'])
+        with gzip.open(os.path.join(repertoire, journal.nom_fichier), 'rt', encoding='utf-8', newline='') as fichier:
+            self.assertEqual(fichier.read(), contenu)
+
+    def test_telechargement_compresse(self):
+        journal = self.journal()
+        self.client.force_login(User.objects.create_user('administrateur', password='motdepasse', is_staff=True))
+        url = reverse('palmares_app:download_log', args=[journal.nom_fichier])
+
+        # Client acceptant gzip : le fichier stocké est envoyé tel quel
+        response = self.client.get(url, headers={'Accept-Encoding': 'gzip, deflate'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertIn('filename="import_errors_', response['Content-Disposition'])
+        self.assertTrue(response['Content-Disposition'].endswith('.csv"'))
+        compresse = b''.join(response.streaming_content)
+        with open(os.path.join(settings.MEDIA_ROOT, journal.chemin), 'rb') as fichier:
+            self.assertEqual(compresse, fichier.read())
+        csv_attendu = gzip.decompress(compresse).decode('utf-8')
+        self.assertIn("Ligne 2: Pourcentage doit être un nombre valide", csv_attendu)
+
+        # Client sans gzip : décompressé à la volée
+        response = self.client.get(url)
+        self.assertNotIn('Content-Encoding', response)
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(b''.join(response.streaming_content).decode('utf-8'), csv_attendu)
+
+    def test_reserve_au_personnel(self):
+        journal = self.journal()
+        urls = [
+            reverse('palmares_app:import_logs'),
+            reverse('palmares_app:download_log', args=[journal.nom_fichier]),
+            reverse('palmares_app:download_profil', args=[1]),
+        ]
+        self.client.force_login(User.objects.create_user('lecteur', password='motdepasse'))
+        for url in urls:
+            with self.subTest(url):
+                response = self.client.get(url)
+                self.assertRedirects(
+                    response, f"{reverse('palmares_app:login')}?next={quote(url)}", fetch_redirect_response=False,
+                )
+                self.assertNotIn('X-Accel-Redirect', response)
+
+        self.client.force_login(User.objects.create_user('administrateur', password='motdepasse', is_staff=True))
+        self.assertContains(self.client.get(urls[0]), journal.nom_fichier)
+
+    def test_telechargement_inconnu(self):
+        self.client.force_login(User.objects.create_user('administrateur', password='motdepasse', is_staff=True))
+        response = self.client.get(reverse('palmares_app:download_log', args=['inconnu.csv.gz']))
+        self.assertEqual(response.status_code, 404)
+
+
+class ProfilImportTests(TestCase):
+    """Mesures d'un import"""
+
+    @skipUnless(os.path.exists('/proc/self/clear_refs'), "Pic de mémoire résidente réinitialisable sous Linux seulement")
+    def test_pic_memoire_propre_a_l_import(self):
+        taille = 64 * 2 ** 20
+        profil = ProfilImport()
+        with profil.mesurer():
+            occupee = b'x' * taille  # pages écrites : résidentes
+        self.assertGreater(profil.memoire_pic, taille * 0.9)
+
+        # Mémoire gardée d'un import précédent : pas comptée dans le suivant
+        profil = ProfilImport()
+        with profil.mesurer():
+            pass
+        self.assertLess(profil.memoire_pic, taille / 4)
+        del occupee
+
+
+@override_settings(CACHES=CACHES_TEST)
+class PaginationCurseurTests(TestCase):
+    """Pagination par curseur : ni doublon ni ligne sautée, ex æquo et pourcentages vides compris"""
+
+    @classmethod
+    def setUpTestData(cls):
+        annees = AnneeScolaire.objects.bulk_create(AnneeScolaire(annee=f"{2020 + i}-{2021 + i}") for i in range(3))
+        classe = Classe.objects.create(nom='6ème A')
+        section = Section.objects.create(nom='Générale')
+        eleves = Eleve.objects.bulk_create(Eleve(nom_complet=f"Élève {numero}") for numero in range(8))
+        # Ex æquo sur le pourcentage, et sur le nom (un élève, trois années), vides mêlés
+        pourcentages = [Decimal('75'), Decimal('75'), None, Decimal('60'), None, Decimal('75'), Decimal('90'), None]
+        Resultat.objects.bulk_create(
+            Resultat(eleve=eleve, annee_scolaire=annee, classe=classe, section=section, pourcentage=pourcentage)
+            for annee in annees
+            for eleve, pourcentage in zip(eleves, pourcentages)
+        )
+
+    def setUp(self):
+        self.records = Resultat.objects.select_related('eleve')
+        self.attendus = list(self.records.order_by(*ORDRE).values_list('pk', flat=True))
+
+    def test_parcours_dans_les_deux_sens(self):
+        vus, pages, curseur = [], [], None
+        while True:
+            page = paginer_par_curseur(self.records, apres=curseur, taille=5)
+            vus.extend(resultat.pk for resultat in page)
+            pages.append(page)
+            if not page.has_next:
+                break
+            curseur = page.curseur_suivant
+        self.assertEqual(vus, self.attendus)
+        self.assertFalse(pages[0].has_previous)
+
+        # Retour en arrière depuis la dernière page
+        vus_inverse, page = [], pages[-1]
+        vus_inverse[:0] = [resultat.pk for resultat in page]
+        while page.has_previous:
+            page = paginer_par_curseur(self.records, avant=page.curseur_precedent, taille=5)
+            vus_inverse[:0] = [resultat.pk for resultat in page]
+        self.assertEqual(vus_inverse, self.attendus)
+
+    def test_curseur_falsifie(self):
+        premiere = [resultat.pk for resultat in paginer_par_curseur(self.records, taille=5)]
+        for curseur in (
+            'pas-un-curseur!',
+            base64.urlsafe_b64encode(b'{"cle": 1}').decode(),
+            base64.urlsafe_b64encode(b'["abc", "Eleve 1", 3]').decode(),
+            base64.urlsafe_b64encode(b'\xff\xfe').decode(),
+        ):
+            with self.subTest(curseur=curseur):
+                page = paginer_par_curseur(self.records, apres=curseur, taille=5)
+                self.assertEqual([resultat.pk for resultat in page], premiere)
+                self.assertFalse(page.has_previous)
+                page = paginer_par_curseur(self.records, avant=curseur, taille=5)
+                self.assertEqual([resultat.pk for resultat in page], premiere)
+
+        self.client.force_login(User.objects.create_user('lecteur', password='motdepasse'))
+        response = self.client.get(reverse('palmares_app:home'), {'pagination': 'curseur', 'apres': 'pas-un-curseur!'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_requetes_sur_les_seuls_resultats(self):
+        # Ordre et position lus sur les colonnes de Resultat : ni jointure ni lecture des élèves
+        # Avant-dernier résultat noté (15 sur 24) : la page se termine parmi les résultats sans note
+        curseur = encoder_curseur(Resultat.objects.order_by(*ORDRE)[13])
+        with CaptureQueriesContext(connection) as requetes:
+            page = paginer_par_curseur(Resultat.objects.all(), apres=curseur, taille=5)
+        self.assertEqual([resultat.pk for resultat in page], self.attendus[14:19])
+        # Une requête par segment : résultats notés, puis sans note
+        self.assertEqual(len(requetes), 2)
+        self.assertFalse([requete for requete in requetes if 'JOIN' in requete['sql']])
+
+    def test_top_sans_comptage(self):
+        self.client.force_login(User.objects.create_user('lecteur', password='motdepasse'))
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(reverse('palmares_app:home'), {'pagination': 'curseur', 'top': '3'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([requete for requete in requetes if 'COUNT(' in requete['sql'].upper()])
+
+
+@override_settings(CACHES=CACHES_TEST)
+class RequetesConditionnellesTests(TestCase):
+    """API JSON : ETag et 304 selon la version des données et les paramètres"""
+
+    def setUp(self):
+        caches['default'].clear()
+        self.client.force_login(User.objects.create_user('lecteur', password='motdepasse'))
+        self.url = reverse('palmares_app:api_resultats')
+        ImportateurResultats().importer([LigneFichier(2, 'Bah Awa', 80, '6ème A', 'Générale', '2023-2024')])
+
+    def test_etag(self):
+        response = self.client.get(self.url, {'classe': '6ème A'})
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        response = self.client.get(self.url, {'classe': '6ème A'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        # Autres paramètres : autre contenu
+        self.assertNotEqual(self.client.get(self.url, {'classe': '6ème B'})['ETag'], etag)
+
+        # Import : nouvelle version des données
+        ImportateurResultats().importer([LigneFichier(2, 'Camara Ali', 70, '6ème A', 'Générale', '2023-2024')])
+        response = self.client.get(self.url, {'classe': '6ème A'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.json()['resultats']), 2)
+
+
+@override_settings(CACHES=CACHES_TEST)
+class CacheReferencesTests(TestCase):
+    """Liste : menus de filtres lus dans le cache des références, relus après invalidation seulement"""
+
+    # Requêtes servies par les tables de référence elles-mêmes (menus, correspondances nom -> id)
+    REFERENCES = re.compile(r'FROM "palmares_app_(anneescolaire|classe|section)"')
+
+    # Session, utilisateur, statistiques du filtre et page de résultats
+    REQUETES_CACHE_CHAUD = 4
+
+    @classmethod
+    def setUpTestData(cls):
+        caches['default'].clear()
+        with cls.captureOnCommitCallbacks(execute=True):
+            ImportateurResultats().importer([
+                LigneFichier(2, 'Bah Awa', 80, '6ème A', 'Générale', '2023-2024'),
+                LigneFichier(3, 'Camara Ali', 70, '6ème B', 'Scientifique', '2022-2023'),
+            ])
+        cls.utilisateur = User.objects.create_user('lecteur', password='motdepasse')
+
+    def setUp(self):
+        caches['default'].clear()
+        self.client.force_login(self.utilisateur)
+        self.url = reverse('palmares_app:home')
+
+    def afficher(self):
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(self.url, {'classe': '6ème A'})
+        self.assertEqual(response.status_code, 200)
+        return response, [requete['sql'] for requete in requetes if self.REFERENCES.search(requete['sql'])]
+
+    def test_cache_chaud(self):
+        _, lues = self.afficher()
+        self.assertEqual(len(lues), 3)
+
+        with self.assertNumQueries(self.REQUETES_CACHE_CHAUD):
+            response, lues = self.afficher()
+        self.assertEqual(lues, [])
+        self.assertEqual(response.context['classes'], ['6ème A', '6ème B'])
+
+    def test_version_changee(self):
+        self.afficher()
+        # Renommage dans l'admin : le signal change la version après validation
+        classe = Classe.objects.get(nom='6ème B')
+        classe.nom = '6ème Bleue'
+        with self.captureOnCommitCallbacks(execute=True):
+            classe.save()
+
+        # Nouvelle version : les trois listes sont relues une fois, puis resservies par le cache
+        response, lues = self.afficher()
+        self.assertEqual(len(lues), 3)
+        self.assertEqual(response.context['classes'], ['6ème A', '6ème Bleue'])
+
+        with self.assertNumQueries(self.REQUETES_CACHE_CHAUD):
+            _, lues = self.afficher()
+        self.assertEqual(lues, [])
+
+
+@override_settings(CACHES=CACHES_TEST)
+class HistoriqueTests(TestCase):
+    """Historique d'un élève : mis en cache, et à jour après chaque modification qui le touche"""
+
+    @classmethod
+    def setUpTestData(cls):
+        # Ids de référence restés en cache après une autre classe de tests
+        caches['default'].clear()
+        with cls.captureOnCommitCallbacks(execute=True):
+            ImportateurResultats().importer([
+                LigneFichier(2, 'Bah Awa', 70, '5ème A', 'Générale', '2022-2023'),
+                LigneFichier(3, 'Bah Awa', 80, '6ème A', 'Générale', '2023-2024'),
+                LigneFichier(4, 'Camara Ali', 75, '6ème A', 'Générale', '2023-2024'),
+            ])
+        cls.eleve = Eleve.objects.get(nom_complet='Bah Awa')
+
+    def setUp(self):
+        caches['historiques'].clear()
+        self.client.force_login(User.objects.create_user('lecteur', password='motdepasse'))
+        self.url = reverse('palmares_app:historique_eleve', args=[self.eleve.pk])
+
+    def version(self):
+        return Eleve.objects.get(pk=self.eleve.pk).version_historique
+
+    def derniere_annee(self):
+        return self.client.get(reverse('palmares_app:api_historique', args=[self.eleve.pk])).json()['annees'][-1]
+
+    def test_evolution_et_cache(self):
+        annee = self.derniere_annee()
+        self.assertEqual(
+            (annee['pourcentage'], annee['rang_classe'], annee['evolution_pourcentage'], annee['evolution_rang_classe']),
+            (80.0, 1, 10.0, 0),
+        )
+        # En cache : seule la version de l'élève est relue
+        with CaptureQueriesContext(connection) as requetes:
+            self.assertEqual(historique(self.eleve.pk)['annees'][-1]['rang_classe'], 1)
+        self.assertEqual(len(requetes), 1)
+
+    def test_resultat_modifie(self):
+        self.client.get(self.url)
+        version = self.version()
+        resultat = Resultat.objects.get(eleve=self.eleve, annee_scolaire__annee='2023-2024')
+        with self.captureOnCommitCallbacks(execute=True):
+            resultat.pourcentage = Decimal('91.50')
+            resultat.save()
+        self.assertGreater(self.version(), version)
+        self.assertContains(self.client.get(self.url), '91,50%')
+
+    def test_eleve_renomme(self):
+        self.client.get(self.url)
+        version = self.version()
+        eleve = Eleve.objects.get(pk=self.eleve.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            eleve.nom_complet = 'Bah Awa Mariama'
+            eleve.save()
+        self.assertGreater(self.version(), version)
+        self.assertContains(self.client.get(self.url), 'Bah Awa Mariama')
+
+    def test_rang_change_par_un_camarade(self):
+        self.assertEqual(self.derniere_annee()['rang_classe'], 1)
+        version = self.version()
+        # Seul le résultat du camarade change ; recalculer_rangs invalide aussi l'historique de l'élève
+        Resultat.objects.filter(eleve__nom_complet='Camara Ali').update(pourcentage=95)
+        recalculer_rangs({(Resultat.objects.values_list('annee_scolaire_id', flat=True).first(), None, None)})
+        self.assertGreater(self.version(), version)
+        annee = self.derniere_annee()
+        self.assertEqual((annee['rang_classe'], annee['evolution_rang_classe']), (2, -1))
+
+
+@override_settings(CACHES=CACHES_TEST, ROOT_URLCONF=urls_asgi(), PALMARES_ASGI=True)
+class VuesAsynchronesTests(TestCase):
+    """Liste et API servies par les vues asynchrones (déploiement ASGI) : filtres et pagination"""
+
+    @classmethod
+    def setUpTestData(cls):
+        caches['default'].clear()
+        # 30 résultats en 6ème A, ex æquo compris, et 5 en 6ème B
+        with cls.captureOnCommitCallbacks(execute=True):
+            ImportateurResultats().importer([
+                LigneFichier(numero, f'Élève {numero:02d}', 50 + numero % 12, classe, 'Générale', '2023-2024')
+                for numero, classe in enumerate(['6ème A'] * 30 + ['6ème B'] * 5, start=2)
+            ])
+        cls.utilisateur = User.objects.create_user('lecteur', password='motdepasse')
+        cls.attendus = list(
+            Resultat.objects.filter(classe__nom='6ème A').order_by(*ORDRE).values_list('pk', flat=True)
+        )
+
+    def setUp(self):
+        self.async_client.force_login(self.utilisateur)
+
+    def test_vues_asynchrones(self):
+        self.assertIs(resolve(reverse('palmares_app:home')).func, views_async.home)
+        self.assertIs(resolve(reverse('palmares_app:api_resultats')).func, views_async.api_resultats)
+
+    async def test_home_anonyme(self):
+        await self.async_client.alogout()
+        response = await self.async_client.get(reverse('palmares_app:home'))
+        self.assertRedirects(
+            response, f"{reverse('palmares_app:login')}?next={reverse('palmares_app:home')}",
+            fetch_redirect_response=False,
+        )
+
+    async def test_home_par_pages(self):
+        response = await self.async_client.get(
+            reverse('palmares_app:home'), {'classe': '6ème A', 'pagination': 'pages', 'page': 2}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_records'], 30)
+        self.assertEqual(response.context['classe_filter'], '6ème A')
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.number, 2)
+        self.assertEqual([record.pk for record in page_obj.object_list], self.attendus[25:])
+
+    async def test_home_par_curseur(self):
+        url = reverse('palmares_app:home')
+        response = await self.async_client.get(url, {'classe': '6ème A', 'pagination': 'curseur'})
+        page_obj = response.context['page_obj']
+        self.assertEqual(response.context['total_records'], 30)
+        self.assertEqual([record.pk for record in page_obj], self.attendus[:25])
+        self.assertContains(response, f'?apres={page_obj.curseur_suivant}')
+
+        response = await self.async_client.get(
+            url, {'classe': '6ème A', 'pagination': 'curseur', 'apres': page_obj.curseur_suivant}
+        )
+        page_obj = response.context['page_obj']
+        self.assertEqual([record.pk for record in page_obj], self.attendus[25:])
+        self.assertIsNone(page_obj.curseur_suivant)
+
+    async def test_api_filtres_et_pages(self):
+        url = f"{reverse('palmares_app:api_resultats')}?{urlencode({'classe': '6ème A', 'limite': 12})}"
+        lus, pages = [], 0
+        while url:
+            response = await self.async_client.get(url)
+            self.assertEqual(response.status_code, 200)
+            donnees = response.json()
+            self.assertTrue(all(ligne['classe'] == '6ème A' for ligne in donnees['resultats']))
+            lus += [ligne['id'] for ligne in donnees['resultats']]
+            pages += 1
+            url = donnees['suivant']
+        self.assertEqual((lus, pages), (self.attendus, 3))
+
+        # Retour en arrière depuis la dernière page
+        response = await self.async_client.get(donnees['precedent'])
+        self.assertEqual([ligne['id'] for ligne in response.json()['resultats']], self.attendus[12:24])
+
+    async def test_api_non_modifiee(self):
+        url = reverse('palmares_app:api_resultats')
+        response = await self.async_client.get(url, {'classe': '6ème B'})
+        self.assertEqual(len(response.json()['resultats']), 5)
+        response = await self.async_client.get(url, {'classe': '6ème B'}, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+
+@override_settings(CACHES=CACHES_TEST)
+class DemarrageTests(TransactionTestCase):
+    """Préchargement du maître gunicorn, amorçage des workers et mesure du démarrage.
+
+    ``TransactionTestCase`` : ``precharger`` et ``amorcer`` ferment les connexions,
+    ce qu'une transaction de test englobante ne supporterait pas.
+    """
+
+    def setUp(self):
+        caches['default'].clear()
+
+    def test_precharger(self):
+        durees = precharger()
+        self.assertEqual(set(durees), {'urls', 'exports', 'gabarits'})
+        self.assertTrue(all(duree >= 0 for duree in durees.values()))
+        self.assertIn('reportlab.platypus', sys.modules)
+        self.assertIn('openpyxl', sys.modules)
+
+    def test_amorcer(self):
+        ImportateurResultats().importer([LigneFichier(2, 'Bah Awa', 80, '6ème A', 'Générale', '2023-2024')])
+        caches['default'].clear()
+        durees = amorcer()
+        self.assertEqual(set(durees), {'connexion', 'references'})
+        # Menus de filtres déjà en cache : la première requête ne les relit pas
+        with self.assertNumQueries(0):
+            self.assertEqual(listes_filtres()['classes'], ['6ème A'])
+
+    def test_mesurer_demarrage(self):
+        # Interpréteurs de mesure sur une base et un cache à part, migrés pour l'occasion
+        dossier = tempfile.mkdtemp(prefix='palmares_demarrage_')
+        self.addCleanup(shutil.rmtree, dossier, ignore_errors=True)
+        sortie = os.path.join(dossier, 'demarrage.json')
+        environnement = {
+            'DATABASE_URL': f"sqlite:///{os.path.join(dossier, 'palmares.sqlite3')}",
+            'CACHE_DIR': os.path.join(dossier, 'cache'),
+            'DB_POOL': 'False',
+        }
+        with mock.patch.dict(os.environ, environnement):
+            MesurerDemarrage().executer('manage.py', 'migrate', '--noinput', '-v', '0')
+            call_command(
+                'mesurer_demarrage', '--repetitions', '1', '--imports', '5', '--sortie', sortie, stdout=StringIO(),
+            )
+
+        with open(sortie, encoding='utf-8') as fichier:
+            rapport = json.load(fichier)
+        self.assertEqual(rapport['repetitions'], 1)
+        sans, avec = rapport['scenarios']
+        self.assertEqual((sans['nom'], avec['nom']), ('sans_prechargement', 'avec_prechargement'))
+        self.assertLessEqual(
+            {'demarrage_ms', 'premiere_requete_ms', 'deuxieme_requete_ms'}, set(sans),
+        )
+        self.assertLessEqual({'prechargement_ms', 'amorcage_ms'}, set(avec))
+        # Bibliothèques d'export chargées par le seul préchargement
+        self.assertEqual((sans['modules_lourds'], avec['modules_lourds']), ([], ['openpyxl', 'reportlab']))
+        self.assertLessEqual(len(rapport['imports']), 5)
+        self.assertTrue(all(set(entree) == {'module', 'propre_ms'} for entree in rapport['imports']))
+
+
+@override_settings(CACHES=CACHES_TEST, PERF_SERVER_TIMING=True, PERF_SEUIL_LENT_MS=0)
+class InstrumentationTests(TestCase):
+    """En-tête Server-Timing et journal des requêtes lentes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        # Ids de référence restés en cache après une autre classe de tests
+        caches['default'].clear()
+        with cls.captureOnCommitCallbacks(execute=True):
+            ImportateurResultats().importer([
+                LigneFichier(2, 'Bah Awa', 80, '6ème A', 'Générale', '2023-2024'),
+                LigneFichier(3, 'Camara Ali', 70, '6ème A', 'Générale', '2023-2024'),
+            ])
+        cls.utilisateur = User.objects.create_user('lecteur', password='motdepasse')
+
+    def setUp(self):
+        dossier = tempfile.mkdtemp(prefix='palmares_perf_')
+        self.addCleanup(shutil.rmtree, dossier, ignore_errors=True)
+        # Dossier du journal créé au premier usage
+        self.journal = os.path.join(dossier, 'logs', 'requetes_lentes.log')
+        self.client.force_login(self.utilisateur)
+
+    def mesures(self, response):
+        """{nom: (durée en ms, description)} de l'en-tête Server-Timing"""
+        return {
+            nom: (float(duree), description)
+            for nom, duree, description in re.findall(r'(\w+);dur=([\d.]+);desc="([^"]*)"', response['Server-Timing'])
+        }
+
+    def entrees(self):
+        with override_settings(PERF_JOURNAL=self.journal):
+            return list(lire_journal())
+
+    def test_server_timing_et_journal(self):
+        with override_settings(PERF_JOURNAL=self.journal), CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(reverse('palmares_app:home'))
+        self.assertEqual(response.status_code, 200)
+
+        mesures = self.mesures(response)
+        self.assertEqual(set(mesures), {'sql', 'tpl', 'total'})
+        # Requêtes de la session et de l'utilisateur comprises
+        self.assertEqual(mesures['sql'][1], f"SQL ({len(requetes)} requetes)")
+        self.assertGreater(mesures['tpl'][0], 0)
+        self.assertGreaterEqual(mesures['total'][0], mesures['tpl'][0])
+
+        [entree] = self.entrees()
+        self.assertEqual(
+            (entree['vue'], entree['methode'], entree['statut'], entree['sql_nombre']),
+            ('palmares_app:home', 'GET', 200, len(requetes)),
+        )
+        self.assertGreater(entree['gabarits_ms'], 0)
+
+    def test_requete_rapide_non_journalisee(self):
+        with override_settings(PERF_JOURNAL=self.journal, PERF_SEUIL_LENT_MS=60_000):
+            response = self.client.get(reverse('palmares_app:home'))
+        self.assertIn('Server-Timing', response)
+        self.assertEqual(self.entrees(), [])
+
+    def test_journal_inaccessible(self):
+        # Le dossier du journal ne peut pas être créé : la réponse est servie quand même
+        fichier = os.path.join(os.path.dirname(os.path.dirname(self.journal)), 'fichier')
+        with open(fichier, 'w'):
+            pass
+        with override_settings(PERF_JOURNAL=os.path.join(fichier, 'requetes_lentes.log')), \
+                self.assertLogs('palmares_app.instrumentation', 'ERROR'):
+            response = self.client.get(reverse('palmares_app:home'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Server-Timing', response)
+
+    async def test_journal_asgi(self):
+        await self.async_client.aforce_login(self.utilisateur)
+        with override_settings(PERF_JOURNAL=self.journal):
+            response = await self.async_client.get(reverse('palmares_app:api_resultats'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('sql', self.mesures(response))
+        [entree] = self.entrees()
+        self.assertEqual((entree['vue'], entree['statut']), ('palmares_app:api_resultats', 200))
@@ -1,13 +1,28 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# En ASGI (palmares/asgi.py), la liste, l'API et les exports sont servis par les vues asynchrones
+if settings.PALMARES_ASGI:
+    from . import views_async as lectures
+else:
+    lectures = views
+
 app_name = 'palmares_app'
 
 urlpatterns = [
     path('login/', views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
-    path('', views.home, name='home'),
-    path('export-pdf/', views.export_pdf, name='export_pdf'),
+    path('', lectures.home, name='home'),
+    path('export-pdf/', lectures.export_pdf, name='export_pdf'),
+    path('export-csv/', lectures.export_csv, name='export_csv'),
+    path('export-xlsx/', lectures.export_xlsx, name='export_xlsx'),
+    path('export-palmares/', lectures.export_palmares, name='export_palmares'),
+    path('api/resultats/', lectures.api_resultats, name='api_resultats'),
+    path('eleves/<int:pk>/', views.historique_eleve, name='historique_eleve'),
+    path('api/eleves/<int:pk>/historique/', views.api_historique, name='api_historique'),
+    path('api/eleves/historiques/', views.api_historiques, name='api_historiques'),
     path('import-logs/', views.import_logs, name='import_logs'),
     path('download-log/<str:filename>/', views.download_log, name='download_log'),
+    path('download-profil/<int:pk>/', views.download_profil, name='download_profil'),
 ]
\ No newline at end of file
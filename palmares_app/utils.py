@@ -0,0 +1,12 @@
+"""Fonctions utilitaires partagées"""
+from itertools import islice
+
+
+def par_lots(iterable, taille):
+    """Découpe un itérable en listes de ``taille`` éléments au plus"""
+    iterateur = iter(iterable)
+    while True:
+        lot = list(islice(iterateur, taille))
+        if not lot:
+            return
+        yield lot
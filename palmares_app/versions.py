@@ -0,0 +1,36 @@
+"""Version globale des données, incrémentée à chaque écriture sur les résultats.
+
+Les caches (exports, API) incluent cette version dans leurs clés : toute
+modification les rend caduques sans avoir à les parcourir.
+"""
+from django.db.models import F
+from django.utils import timezone
+
+from .models import VersionDonnees
+
+
+RESULTATS = 'resultats'
+
+
+def incrementer_version(nom=RESULTATS):
+    """Incrémente la version ``nom`` (la crée au besoin)"""
+    modifies = VersionDonnees.objects.filter(nom=nom).update(
+        version=F('version') + 1,
+        date_modification=timezone.now(),
+    )
+    if not modifies:
+        VersionDonnees.objects.get_or_create(nom=nom, defaults={'version': 1})
+
+
+def _version(nom):
+    return VersionDonnees.objects.filter(nom=nom).values_list('version', 'date_modification')
+
+
+def version_courante(nom=RESULTATS):
+    """Retourne ``(version, date_modification)`` ; ``(0, None)`` si rien n'a encore été écrit"""
+    return _version(nom).first() or (0, None)
+
+
+async def aversion_courante(nom=RESULTATS):
+    """Version asynchrone de ``version_courante``"""
+    return await _version(nom).afirst() or (0, None)
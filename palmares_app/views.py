@@ -1,21 +1,51 @@
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect
 from django.core.paginator import Paginator
-from django.db.models import Q
-from django.http import HttpResponse, Http404
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.template.loader import get_template
-from django.contrib.auth.decorators import login_required
+from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
-from .models import Resultat, Classe, Section, AnneeScolaire
-import io
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.text import get_valid_filename
+from django.views.decorators.http import condition, require_GET
+from .filtres import filtrer_resultats, lookups_statistiques, parametres_filtres
+from .pagination import paginer_par_curseur
+from .references import listes_filtres
+from .statistiques import resume
+from .historiques import historique, historiques
+from .exports import flux_csv, generer_pdf, generer_xlsx, generer_zip_palmares
+from .cache_exports import servir_export
+from .models import JournalErreurs, MetriquesImport
+from .profilage import AUTRES, PHASES
+from .telechargements import servir_fichier
+from .versions import version_courante
+import hashlib
+import json
 import os
-import csv
-from datetime import datetime
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
-from reportlab.lib import colors
+from datetime import datetime, time, timedelta
+
+
+# Choix proposés pour le filtre « top N par classe »
+CHOIX_TOP = (3, 5, 10)
+
+# Taille des pages de l'API JSON (paramètre ``limite``)
+API_LIMITE_DEFAUT = 100
+API_LIMITE_MAX = 500
+
+# Élèves par appel de l'API des historiques (paramètre ``eleves``)
+API_HISTORIQUES_MAX = 500
+
+# Logs d'erreurs d'import par page
+LOGS_PAR_PAGE = 25
+
+# Imports dont les mesures sont affichées sur la page des logs
+METRIQUES_AFFICHEES = 20
+
+# Logs et profils d'import (noms, erreurs, détails d'exécution) : réservés au personnel
+staff_required = user_passes_test(lambda u: u.is_staff)
 
 
 def login_view(request):
@@ -45,188 +75,308 @@ def logout_view(request):
     return redirect('palmares_app:login')
 
 
-@login_required
-def home(request):
-    """Vue principale affichant tous les résultats avec pagination et recherche"""
-    # Récupération des paramètres de recherche
-    search_query = request.GET.get('q', '')
-    classe_filter = request.GET.get('classe', '')
-    section_filter = request.GET.get('section', '')
-    annee_filter = request.GET.get('annee', '')
+def _mode_pagination(request, filtres):
+    """Pagination par curseur (coût constant) ou par numéro de page.
 
-    # Filtrage des résultats
-    records = Resultat.objects.select_related('eleve', 'classe', 'section', 'annee_scolaire')
-
-    if search_query:
-        records = records.filter(
-            Q(eleve__nom_complet__icontains=search_query) |
-            Q(classe__nom__icontains=search_query) |
-            Q(section__nom__icontains=search_query) |
-            Q(annee_scolaire__annee__icontains=search_query)
-        )
+    Les recherches, classées par pertinence, restent paginées par numéro.
+    """
+    if filtres['search_query']:
+        return 'pages'
+    return request.GET.get('pagination') or settings.PALMARES_PAGINATION
 
-    if classe_filter:
-        records = records.filter(classe__nom=classe_filter)
 
-    if section_filter:
-        records = records.filter(section__nom=section_filter)
+def _contexte_home(request, filtres, page_obj, total_records, statistiques, mode_pagination, listes):
+    # Paramètres à conserver dans les liens de pagination
+    query_filtres = request.GET.copy()
+    for parametre in ('page', 'apres', 'avant'):
+        query_filtres.pop(parametre, None)
 
-    if annee_filter:
-        records = records.filter(annee_scolaire__annee=annee_filter)
+    return {
+        'page_obj': page_obj,
+        **filtres,
+        **listes,
+        'choix_top': CHOIX_TOP,
+        'total_records': total_records,
+        'statistiques': statistiques,
+        'pagination_curseur': mode_pagination == 'curseur',
+        'query_filtres': query_filtres.urlencode(),
+    }
 
-    # Pagination
-    paginator = Paginator(records, 25)  # 25 résultats par page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
 
-    # Récupération des valeurs distinctes pour les filtres
-    classes = Classe.objects.values_list('nom', flat=True).distinct().order_by('nom')
-    sections = Section.objects.values_list('nom', flat=True).distinct().order_by('nom')
-    annees = AnneeScolaire.objects.values_list('annee', flat=True).distinct().order_by('-annee')
+@login_required
+def home(request):
+    """Vue principale affichant tous les résultats avec pagination et recherche"""
+    # Filtrage des résultats
+    filtres = parametres_filtres(request.GET)
+    records = filtrer_resultats(request.GET)
+    mode_pagination = _mode_pagination(request, filtres)
 
-    context = {
-        'page_obj': page_obj,
-        'search_query': search_query,
-        'classe_filter': classe_filter,
-        'section_filter': section_filter,
-        'annee_filter': annee_filter,
-        'classes': classes,
-        'sections': sections,
-        'annees': annees,
-        'total_records': records.count(),
-    }
+    # Sans recherche, l'effectif se lit dans la table des statistiques
+    lookups = lookups_statistiques(filtres)
+    statistiques = resume(**lookups) if lookups is not None else None
 
+    if mode_pagination == 'curseur':
+        page_obj = paginer_par_curseur(
+            records, apres=request.GET.get('apres'), avant=request.GET.get('avant'), taille=25
+        )
+        # Sans statistiques (top N), pas de COUNT : il parcourrait tout le filtre
+        total_records = statistiques['nombre'] if statistiques else None
+    else:
+        paginator = Paginator(records, 25)  # 25 résultats par page
+        if statistiques:
+            paginator.count = statistiques['nombre']
+        page_number = request.GET.get('page')
+        page_obj = paginator.get_page(page_number)
+        total_records = paginator.count
+
+    # Valeurs des filtres, lues dans le cache des données de référence
+    context = _contexte_home(
+        request, filtres, page_obj, total_records, statistiques, mode_pagination, listes_filtres()
+    )
     return render(request, 'palmares_app/home.html', context)
 
 
+@login_required
 def export_pdf(request):
     """Export des résultats filtrés en PDF"""
     # Récupération des mêmes filtres que la vue principale
-    search_query = request.GET.get('q', '')
-    classe_filter = request.GET.get('classe', '')
-    section_filter = request.GET.get('section', '')
-    annee_filter = request.GET.get('annee', '')
-
-    records = Resultat.objects.select_related('eleve', 'classe', 'section', 'annee_scolaire')
-
-    if search_query:
-        records = records.filter(
-            Q(eleve__nom_complet__icontains=search_query) |
-            Q(classe__nom__icontains=search_query) |
-            Q(section__nom__icontains=search_query) |
-            Q(annee_scolaire__annee__icontains=search_query)
-        )
+    records = filtrer_resultats(request.GET)
+    return servir_export(
+        request, request.GET, 'pdf', 'application/pdf', 'resultats_etudiants.pdf',
+        lambda fichier: generer_pdf(records, fichier),
+    )
 
-    if classe_filter:
-        records = records.filter(classe__nom=classe_filter)
-
-    if section_filter:
-        records = records.filter(section__nom=section_filter)
-
-    if annee_filter:
-        records = records.filter(annee_scolaire__annee=annee_filter)
-
-    # Création du PDF
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    elements = []
-
-    # Styles
-    styles = getSampleStyleSheet()
-    title_style = styles['Heading1']
-
-    # Titre
-    title = Paragraph("Résultats des Étudiants", title_style)
-    elements.append(title)
-    elements.append(Paragraph("<br/>", styles['Normal']))
-
-    # Données du tableau
-    data = [['Nom Complet', 'Pourcentage', 'Classe', 'Section', 'Année Scolaire']]
-
-    for record in records:
-        data.append([
-            record.eleve.nom_complet,
-            f"{record.pourcentage}%" if record.pourcentage is not None else "-",
-            record.classe.nom,
-            record.section.nom,
-            record.annee_scolaire.annee
-        ])
-
-    # Création du tableau
-    table = Table(data)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 14),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-
-    elements.append(table)
-
-    # Génération du PDF
-    doc.build(elements)
-    buffer.seek(0)
-
-    response = HttpResponse(buffer, content_type='application/pdf')
-    response['Content-Disposition'] = 'attachment; filename="resultats_etudiants.pdf"'
 
+@login_required
+def export_csv(request):
+    """Export des résultats filtrés en CSV, envoyé en flux"""
+    records = filtrer_resultats(request.GET)
+    response = StreamingHttpResponse(flux_csv(records), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = 'attachment; filename="resultats_etudiants.csv"'
     return response
 
 
 @login_required
+def export_xlsx(request):
+    """Export des résultats filtrés en Excel, au format accepté par l'import"""
+    records = filtrer_resultats(request.GET)
+    return servir_export(
+        request, request.GET, 'xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        'resultats_etudiants.xlsx', lambda fichier: generer_xlsx(records, fichier),
+    )
+
+
+@login_required
+def export_palmares(request):
+    """Export ZIP d'un PDF par classe et section pour une année scolaire"""
+    annee = request.GET.get('annee', '')
+    if not annee:
+        messages.error(request, "Sélectionnez une année scolaire pour exporter les palmarès par classe.")
+        return redirect('palmares_app:home')
+
+    # Seule l'année compte pour cet export
+    params = {'annee': annee}
+    return servir_export(
+        request, params, 'zip', 'application/zip', f"palmares_{get_valid_filename(annee)}.zip",
+        lambda fichier: generer_zip_palmares(annee, fichier),
+    )
+
+
+def _version_donnees(request):
+    """Version des données, lue une seule fois par requête"""
+    if not hasattr(request, '_version_donnees'):
+        request._version_donnees = version_courante()
+    return request._version_donnees
+
+
+def _etag_resultats(request):
+    # Même version et mêmes paramètres (filtres, curseur, limite) : même contenu
+    version, _ = _version_donnees(request)
+    contenu = json.dumps([version, sorted(request.GET.lists())], ensure_ascii=False)
+    return hashlib.sha256(contenu.encode()).hexdigest()
+
+
+def _date_resultats(request):
+    return _version_donnees(request)[1]
+
+
+def _requete_api(request):
+    """Résultats filtrés (colonnes de l'API) et taille de page demandée"""
+    try:
+        limite = min(max(int(request.GET.get('limite', API_LIMITE_DEFAUT)), 1), API_LIMITE_MAX)
+    except ValueError:
+        limite = API_LIMITE_DEFAUT
+
+    records = filtrer_resultats(request.GET).values(
+        'id', 'eleve__nom_complet', 'pourcentage', 'rang_classe', 'rang_annee',
+        'classe__nom', 'section__nom', 'annee_scolaire__annee',
+    )
+    return records, limite
+
+
+def _reponse_api(request, page):
+    def lien(parametre, curseur):
+        if not curseur:
+            return None
+        params = request.GET.copy()
+        for nom in ('apres', 'avant'):
+            params.pop(nom, None)
+        params[parametre] = curseur
+        return request.build_absolute_uri(f"{request.path}?{params.urlencode()}")
+
+    response = JsonResponse({
+        'resultats': [
+            {
+                'id': ligne['id'],
+                'nom_complet': ligne['eleve__nom_complet'],
+                'pourcentage': None if ligne['pourcentage'] is None else float(ligne['pourcentage']),
+                'rang_classe': ligne['rang_classe'],
+                'rang_annee': ligne['rang_annee'],
+                'classe': ligne['classe__nom'],
+                'section': ligne['section__nom'],
+                'annee_scolaire': ligne['annee_scolaire__annee'],
+            }
+            for ligne in page
+        ],
+        'suivant': lien('apres', page.curseur_suivant),
+        'precedent': lien('avant', page.curseur_precedent),
+    })
+    # Le client peut garder la réponse mais doit la revalider (ETag) à chaque appel
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@login_required
+@require_GET
+@condition(etag_func=_etag_resultats, last_modified_func=_date_resultats)
+def api_resultats(request):
+    """API JSON en lecture seule : résultats filtrés comme la liste, paginés par curseur"""
+    records, limite = _requete_api(request)
+    page = paginer_par_curseur(
+        records, apres=request.GET.get('apres'), avant=request.GET.get('avant'), taille=limite
+    )
+    return _reponse_api(request, page)
+
+
+@login_required
+def historique_eleve(request, pk):
+    """Page de l'élève : ses résultats année par année et leur évolution"""
+    donnees = historique(pk)
+    if donnees is None:
+        raise Http404("Élève non trouvé")
+    return render(request, 'palmares_app/historique.html', {'historique': donnees})
+
+
+def _historique_json(donnees):
+    def nombre(valeur):
+        return None if valeur is None else float(valeur)
+
+    return {
+        **donnees,
+        'annees': [
+            {
+                **annee,
+                'pourcentage': nombre(annee['pourcentage']),
+                'evolution_pourcentage': nombre(annee['evolution_pourcentage']),
+            }
+            for annee in donnees['annees']
+        ],
+    }
+
+
+@login_required
+@require_GET
+def api_historique(request, pk):
+    """API JSON : historique d'un élève"""
+    donnees = historique(pk)
+    if donnees is None:
+        raise Http404("Élève non trouvé")
+    return JsonResponse(_historique_json(donnees))
+
+
+@login_required
+@require_GET
+def api_historiques(request):
+    """API JSON : historiques de plusieurs élèves (``?eleves=12,57,...``), dans l'ordre demandé"""
+    try:
+        eleve_ids = [int(valeur) for valeur in request.GET.get('eleves', '').split(',') if valeur.strip()]
+    except ValueError:
+        return JsonResponse(
+            {'erreur': "Le paramètre eleves doit être une liste d'identifiants séparés par des virgules"}, status=400
+        )
+    if len(eleve_ids) > API_HISTORIQUES_MAX:
+        return JsonResponse({'erreur': f"Au plus {API_HISTORIQUES_MAX} élèves par appel"}, status=400)
+    return JsonResponse({'eleves': [_historique_json(donnees) for donnees in historiques(eleve_ids).values()]})
+
+
+@staff_required
 def import_logs(request):
     """Vue pour afficher et gérer les logs d'importation"""
-    logs_dir = os.path.join('media', 'import_errors')
-
-    # Créer le répertoire s'il n'existe pas
-    os.makedirs(logs_dir, exist_ok=True)
-
-    # Lister tous les fichiers de log
-    log_files = []
-    if os.path.exists(logs_dir):
-        for filename in os.listdir(logs_dir):
-            if filename.endswith('.csv'):
-                filepath = os.path.join(logs_dir, filename)
-                stat = os.stat(filepath)
-                log_files.append({
-                    'filename': filename,
-                    'filepath': filepath,
-                    'size': stat.st_size,
-                    'modified': datetime.fromtimestamp(stat.st_mtime),
-                    'url': f'/media/import_errors/{filename}'
-                })
-
-    # Trier par date de modification (plus récent en premier)
-    log_files.sort(key=lambda x: x['modified'], reverse=True)
+    # Logs indexés en base (JournalErreurs) : filtrés et paginés sans parcourir le répertoire
+    journaux = JournalErreurs.objects.all()
+    recherche = request.GET.get('q', '').strip()
+    if recherche:
+        journaux = journaux.filter(Q(nom_import__icontains=recherche) | Q(nom_fichier__icontains=recherche))
+    # Bornes en datetime (et non __date) : l'index sur date_creation reste utilisable
+    depuis = _date_parametre(request, 'depuis')
+    if depuis:
+        journaux = journaux.filter(date_creation__gte=_debut_du_jour(depuis))
+    jusqu_au = _date_parametre(request, 'jusqu_au')
+    if jusqu_au:
+        journaux = journaux.filter(date_creation__lt=_debut_du_jour(jusqu_au + timedelta(days=1)))
+
+    page_obj = Paginator(journaux, LOGS_PAR_PAGE).get_page(request.GET.get('page'))
+    query_filtres = request.GET.copy()
+    query_filtres.pop('page', None)
+
+    # Mesures des derniers imports, phase par phase
+    colonnes_phases = [*PHASES, (AUTRES, "Autres")]
+    metriques = list(MetriquesImport.objects.select_related('job')[:METRIQUES_AFFICHEES])
+    for mesure in metriques:
+        mesure.colonnes = [mesure.phases.get(nom) for nom, _ in colonnes_phases]
 
     context = {
-        'log_files': log_files,
-        'total_logs': len(log_files)
+        'page_obj': page_obj,
+        'total_logs': page_obj.paginator.count,
+        'recherche': recherche,
+        'depuis': depuis,
+        'jusqu_au': jusqu_au,
+        'query_filtres': query_filtres.urlencode(),
+        'metriques': metriques,
+        'colonnes_phases': [libelle for _, libelle in colonnes_phases],
     }
 
     return render(request, 'palmares_app/import_logs.html', context)
 
 
-@login_required
+def _date_parametre(request, nom):
+    """Date AAAA-MM-JJ lue dans les paramètres GET ; None si absente ou invalide"""
+    try:
+        return parse_date(request.GET.get(nom, ''))
+    except ValueError:
+        return None
+
+
+def _debut_du_jour(jour):
+    return timezone.make_aware(datetime.combine(jour, time.min))
+
+
+@staff_required
 def download_log(request, filename):
     """Vue pour télécharger un fichier de log spécifique"""
-    logs_dir = os.path.join('media', 'import_errors')
-    filepath = os.path.join(logs_dir, filename)
-
-    # Vérifier que le fichier existe et est dans le bon répertoire
-    if not os.path.exists(filepath) or not filepath.startswith(logs_dir):
-        raise Http404("Fichier de log non trouvé")
-
-    # Vérifier que c'est bien un fichier CSV
-    if not filename.endswith('.csv'):
-        raise Http404("Type de fichier non autorisé")
-
-    # Lire le fichier et le retourner
-    with open(filepath, 'rb') as f:
-        response = HttpResponse(f.read(), content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        return response
+    journal = get_object_or_404(JournalErreurs, nom_fichier=filename)
+    # Stocké compressé : envoyé en gzip (Content-Encoding) ou décompressé selon le client
+    return servir_fichier(
+        request, journal.chemin, filename.removesuffix('.gz'), 'text/csv; charset=utf-8', compresse=True
+    )
+
+
+@staff_required
+def download_profil(request, pk):
+    """Télécharge le profil cProfile d'un import"""
+    mesure = get_object_or_404(MetriquesImport, job_id=pk)
+    if not mesure.fichier_profil:
+        raise Http404("Aucun profil pour cet import")
+    return servir_fichier(
+        request, mesure.fichier_profil, os.path.basename(mesure.fichier_profil), 'application/octet-stream'
+    )
@@ -0,0 +1,154 @@
+"""Vues asynchrones des lectures (liste, API JSON, exports), servies en ASGI.
+
+Avec ``PALMARES_ASGI`` (posé par ``palmares/asgi.py``), ``urls.py`` route la
+liste, l'API et les exports vers ces vues. Un worker ASGI sert alors de
+nombreuses lectures à la fois au lieu d'une seule :
+
+- les requêtes SQL passent par l'ORM asynchrone (``aaggregate``, ``async for``,
+  ``aiterator``) ; pendant qu'elles attendent la base, la boucle sert les
+  autres requêtes ;
+- le travail CPU (rendu du gabarit, génération PDF/XLSX) part dans un pool de
+  ``PALMARES_THREADS_RENDU`` threads, pour ne jamais bloquer la boucle ; le
+  ZIP des palmarès répartit en plus ses PDF sur des processus ;
+- les connexions viennent du pool psycopg (``DB_POOL``), et chaque tâche
+  déportée rend la sienne en terminant.
+
+Les vues synchrones de ``views.py`` restent celles du déploiement WSGI.
+"""
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.db import close_old_connections
+from django.http import StreamingHttpResponse
+from django.shortcuts import redirect, render
+from django.utils.text import get_valid_filename
+from django.views.decorators.http import condition, require_GET
+
+from .cache_exports import servir_export
+from .exports import aflux_csv, generer_pdf, generer_xlsx, generer_zip_palmares
+from .filtres import filtrer_resultats, lookups_statistiques, parametres_filtres
+from .pagination import apaginer_par_curseur
+from .references import listes_filtres
+from .statistiques import aresume
+from .versions import aversion_courante
+from .views import (
+    _contexte_home, _date_resultats, _etag_resultats, _mode_pagination, _reponse_api, _requete_api,
+)
+
+
+_executeur = ThreadPoolExecutor(max_workers=settings.PALMARES_THREADS_RENDU, thread_name_prefix='palmares-rendu')
+
+
+def _rendre_connexions(fonction):
+    """Rend la connexion du thread en fin de tâche, comme ``request_finished`` pour une requête"""
+    @functools.wraps(fonction)
+    def executer(*args, **kwargs):
+        try:
+            return fonction(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return executer
+
+
+async def hors_boucle(fonction, *args, **kwargs):
+    """Exécute ``fonction`` dans le pool de rendu, sans bloquer la boucle d'événements"""
+    tache = sync_to_async(_rendre_connexions(fonction), thread_sensitive=False, executor=_executeur)
+    return await tache(*args, **kwargs)
+
+
+@login_required
+async def home(request):
+    """Vue principale, version asynchrone"""
+    # Utilisateur déjà chargé par login_required : le gabarit ne le relit pas
+    request.user = await request.auser()
+    filtres = parametres_filtres(request.GET)
+    records = filtrer_resultats(request.GET)
+    mode_pagination = _mode_pagination(request, filtres)
+
+    lookups = lookups_statistiques(filtres)
+    statistiques = await aresume(**lookups) if lookups is not None else None
+
+    if mode_pagination == 'curseur':
+        page_obj = await apaginer_par_curseur(
+            records, apres=request.GET.get('apres'), avant=request.GET.get('avant'), taille=25
+        )
+        # Sans statistiques (top N), pas de COUNT : il parcourrait tout le filtre
+        total_records = statistiques['nombre'] if statistiques else None
+    else:
+        paginator = Paginator(records, 25)
+        # Effectif connu d'avance : le Paginator ne fait pas de COUNT synchrone
+        paginator.count = statistiques['nombre'] if statistiques else await records.acount()
+        page_obj = paginator.get_page(request.GET.get('page'))
+        page_obj.object_list = [record async for record in page_obj.object_list]
+        total_records = paginator.count
+
+    listes = await sync_to_async(listes_filtres)()
+    context = _contexte_home(request, filtres, page_obj, total_records, statistiques, mode_pagination, listes)
+    return await hors_boucle(render, request, 'palmares_app/home.html', context)
+
+
+@login_required
+@require_GET
+async def api_resultats(request):
+    """API JSON, version asynchrone"""
+    # Version lue ici : les fonctions ETag/Last-Modified de ``condition`` n'interrogent plus la base
+    request._version_donnees = await aversion_courante()
+    return await _api_resultats(request)
+
+
+@condition(etag_func=_etag_resultats, last_modified_func=_date_resultats)
+async def _api_resultats(request):
+    records, limite = _requete_api(request)
+    page = await apaginer_par_curseur(
+        records, apres=request.GET.get('apres'), avant=request.GET.get('avant'), taille=limite
+    )
+    return _reponse_api(request, page)
+
+
+@login_required
+async def export_pdf(request):
+    """Export PDF, généré dans le pool de rendu"""
+    records = filtrer_resultats(request.GET)
+    return await hors_boucle(
+        servir_export, request, request.GET, 'pdf', 'application/pdf', 'resultats_etudiants.pdf',
+        lambda fichier: generer_pdf(records, fichier),
+    )
+
+
+@login_required
+async def export_csv(request):
+    """Export CSV en flux asynchrone"""
+    records = filtrer_resultats(request.GET)
+    response = StreamingHttpResponse(aflux_csv(records), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = 'attachment; filename="resultats_etudiants.csv"'
+    return response
+
+
+@login_required
+async def export_xlsx(request):
+    """Export Excel, généré dans le pool de rendu"""
+    records = filtrer_resultats(request.GET)
+    return await hors_boucle(
+        servir_export, request, request.GET, 'xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        'resultats_etudiants.xlsx', lambda fichier: generer_xlsx(records, fichier),
+    )
+
+
+@login_required
+async def export_palmares(request):
+    """Export ZIP des palmarès par classe, généré dans le pool de rendu"""
+    annee = request.GET.get('annee', '')
+    if not annee:
+        messages.error(request, "Sélectionnez une année scolaire pour exporter les palmarès par classe.")
+        return redirect('palmares_app:home')
+
+    params = {'annee': annee}
+    return await hors_boucle(
+        servir_export, request, params, 'zip', 'application/zip', f"palmares_{get_valid_filename(annee)}.zip",
+        lambda fichier: generer_zip_palmares(annee, fichier),
+    )